@@ -105,8 +105,14 @@ class PlotEl(EnumHelper):
     Y2_LEGEND2      = 'Y2_LEGEND2'      # override legend for second temperature sensor trace
     FFT_LEGEND2     = 'FFT_LEGEND2'     # legend for highlighted points in FFT plot
     FFT_COLOR2      = 'FFT_COLOR2'      # color for highlighted points in FFT plot
+    FFT_AVERAGING   = 'FFT_AVERAGING'   # average the spectra of segments (Welch's method) instead of one FFT of the whole series.
+                                        #  value is 'segmentSeconds, overlap, window' like '10, 0.5, hann'.  Window is rect|hann|hamming|blackman
+    FFT_BINNING     = 'FFT_BINNING'     # combine the spectrum to plot into fractional-octave bins.  value is 'binsPerOctave, statistic'
+                                        #  like '24, max'.  Statistic is max (default)|mean|rms.  See Calculate/SpectrumBinning.py
     XRANGE_PLOT     = 'XRANGE_PLOT'     # range of x values to plot, overriding auto defaults:
                                         #  value is 'float, float'. Use for TMin, TMax for stability plots
+    TAU_GRID        = 'TAU_GRID'        # for AMP_STABILITY plots, which intervals to calculate: 'all' (default), 'octave',
+                                        #  'decade' or 'decade, N' for N per decade, or a list of seconds 'float, float, ...'
     XRANGE_WINDOW   = 'XRANGE_WINDOW'   # boundaries X-Y space to display.
     YRANGE_WINDOW   = 'YRANGE_WINDOW'   #  often needs to be larger than the data and spec lines so they are not at the edge.
     X_LINEAR        = 'X_LINEAR'        # force the X axis to be linear when it would normally be log
@@ -125,6 +131,8 @@ class PlotEl(EnumHelper):
     FOOTER4         = 'FOOTER4'         # footer line 4 for overflow of DATASOURCE from line 3 
     IMG_WIDTH       = 'IMG_WIDTH'       # pixels width of output image
     IMG_HEIGHT      = 'IMG_HEIGHT'      # pixels height of output image
+    DECIMATION      = 'DECIMATION'      # for TIME_SERIES plots, how to reduce the data to about two points per pixel of IMG_WIDTH:
+                                        #  'minmax' (default), 'lttb', 'mean', or 'none'.  See Calculate/Decimate.py
     PROCESS_NOTES   = 'PROCESS_NOTES'   # notes about data processing applied to the result (e.g. noise floor subtraction
 
 class Units(EnumHelper):
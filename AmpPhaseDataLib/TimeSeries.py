@@ -1,36 +1,85 @@
 from __future__ import annotations
 from AmpPhaseDataLib.Constants import Units
+from AmpPhaseDataLib.UnitsConversion import convertUnits
 from Calculate.Common import unwrapPhase
 from Utility.ParseTimeStamp import ParseTimeStamp
 from typing import List, Optional, Union, Tuple, Dict
 from datetime import datetime
-from math import log10
 import numpy as np
-from pydantic import BaseModel, validator
-import copy
+from pydantic import BaseModel, PrivateAttr, validator
+
+def toDatetime(timeStamp) -> datetime:
+    '''
+    Convert a single element of timeStamps to datetime
+    :param timeStamp: datetime or numpy.datetime64
+    :return datetime
+    '''
+    if isinstance(timeStamp, np.datetime64):
+        # with microsecond resolution, astype() yields a datetime:
+        return timeStamp.astype('datetime64[us]').astype(datetime)
+    return timeStamp
 
 class TimeSeries(BaseModel):
+    '''
+    In-memory time series.
+    By default dataSeries, temperatures1, temperatures2 are lists of float and timeStamps is a list of datetime.
+    With arrayMode = True they are contiguous numpy arrays of float64 and datetime64[us] instead.
+    Slices, conversions, and calculations then operate on the arrays without boxing each value.
+    The arrays support len(), indexing, slicing, and iteration so they can stand in for the lists.
+    Units conversions made by getDataSeries() are cached until dataSeries, dataUnits, or arrayMode are reassigned
+    or appended to.  Writing to elements in place, like ts.dataSeries[i] = v, is not detected: reassign dataSeries
+    or call clearConvertedCache() afterwards.
+    '''
     tsId: int = 0
-    dataSeries: List[float] = []
-    temperatures1: List[float] = []
-    temperatures2: List[float] = []
-    timeStamps: List[datetime] = []
+    arrayMode: bool = False
+    dataSeries: Union[np.ndarray, List[float]] = []
+    temperatures1: Union[np.ndarray, List[float]] = []
+    temperatures2: Union[np.ndarray, List[float]] = []
+    timeStamps: Union[np.ndarray, List[datetime]] = []
     tau0Seconds: Optional[float] = None
     startTime: Optional[datetime | str] = None
     dataUnits: Optional[Units] = Units.AMPLITUDE
     nextWriteIndex: int = 0
+    # converted series {(requiredUnits, scale, offset, gainRef) : read-only np.ndarray, or list when not arrayMode}:
+    _convertedCache: dict = PrivateAttr(default_factory = dict)
+
+    class Config:
+        arbitrary_types_allowed = True
+        # run the validators on defaults too, so that arrayMode gets empty arrays:
+        validate_all = True
 
     def reset(self):
         self.tsId = 0
-        self.dataSeries = []
-        self.temperatures1 = []
-        self.temperatures2 = []
-        self.timeStamps = []
+        self.dataSeries = self.__emptySeries()
+        self.temperatures1 = self.__emptySeries()
+        self.temperatures2 = self.__emptySeries()
+        self.timeStamps = self.__emptyTimeStamps()
         self.tau0Seconds = None
         self.startTime = None
         self.dataUnits = Units.AMPLITUDE
         self.nextWriteIndex = 0
 
+    @validator('dataSeries', 'temperatures1', 'temperatures2', pre = True)
+    @classmethod
+    def series_validator(cls, series, values):
+        # arrayMode is declared ahead of the series so it has already been validated:
+        if values.get('arrayMode', False):
+            # no per-element validation; np.asarray does not copy a float64 array:
+            return np.asarray(series, dtype = np.float64)
+        elif isinstance(series, np.ndarray):
+            return series.tolist()
+        return series
+
+    @validator('timeStamps', pre = True)
+    @classmethod
+    def timeStamps_validator(cls, timeStamps, values):
+        if values.get('arrayMode', False):
+            return cls.toTimeStampArray(timeStamps)
+        elif isinstance(timeStamps, np.ndarray):
+            # datetime64[us].tolist() yields datetime objects:
+            return timeStamps.astype('datetime64[us]', copy = False).tolist()
+        return timeStamps
+
     @validator('startTime')
     @classmethod
     def startTime_validator(cls, startTime):
@@ -49,6 +98,18 @@ class TimeSeries(BaseModel):
         if isinstance(dataUnits, str):
             return Units.fromStr(dataUnits)
 
+    def __setattr__(self, name, value):
+        # any change to the source of a cached conversion invalidates the cache:
+        if name in ('dataSeries', 'dataUnits', 'arrayMode'):
+            self._convertedCache.clear()
+        super().__setattr__(name, value)
+
+    def clearConvertedCache(self):
+        '''
+        Discard the units conversions cached by getDataSeries(), such as after writing to dataSeries in place
+        '''
+        self._convertedCache.clear()
+
     def __len__(self):
         return len(self.dataSeries)
 
@@ -59,7 +120,7 @@ class TimeSeries(BaseModel):
         '''
         if not self.startTime:
             if len(self.timeStamps) > 0:
-                self.startTime = self.timeStamps[0]
+                self.startTime = toDatetime(self.timeStamps[0])
                 return True
             else:
                 self.startTime = datetime.now()
@@ -73,15 +134,19 @@ class TimeSeries(BaseModel):
         '''
         if not self.tau0Seconds:
             if len(self.timeStamps) >= 2: 
-                duration = (self.timeStamps[-1] - self.timeStamps[0]).total_seconds()
+                duration = (toDatetime(self.timeStamps[-1]) - toDatetime(self.timeStamps[0])).total_seconds()
                 self.tau0Seconds = duration / (len(self.timeStamps) - 1)
                 return True
         return False
 
-    def isValid(self):
+    def isValid(self, checkId = True):
+        '''
+        :param checkId: if False, skip checking tsId, for a time series not yet inserted
+        :return (bool valid, str msg)
+        '''
         valid = True
         msg = ""
-        if not self.tsId > 0:
+        if checkId and not self.tsId > 0:
             valid = False
             msg = "timeSeries.tsId must be a positive integer"
         elif len(self.dataSeries) < 2:
@@ -113,6 +178,11 @@ class TimeSeries(BaseModel):
         :param timeStamps: single or list of timeStamp corresponding to the points in dataSeries
                            several formats supported, YYYY/MM/DD HH:MM:SS.mmm preferred
         '''
+        self._convertedCache.clear()
+        if self.arrayMode:
+            self.__appendArrays(dataSeries, temperatures1, temperatures2, timeStamps)
+            return
+
         def appendOrConcat(target, itemOrList):
             if itemOrList is not None:
                 try:
@@ -134,8 +204,59 @@ class TimeSeries(BaseModel):
                 appendOrConcat(self.timeStamps, [self.parseTimeStamp(ts) for ts in timeStamps])
             self.updateStartTime()
 
+    def __appendArrays(self, dataSeries, temperatures1, temperatures2, timeStamps):
+        '''
+        Private implementation of appendData() for arrayMode
+        '''
+        def concat(target, itemOrList):
+            if itemOrList is None:
+                return target
+            return np.concatenate((target, np.atleast_1d(np.asarray(itemOrList, dtype = np.float64))))
+
+        self.dataSeries = concat(self.dataSeries, dataSeries)
+        self.temperatures1 = concat(self.temperatures1, temperatures1)
+        self.temperatures2 = concat(self.temperatures2, temperatures2)
+
+        if timeStamps is not None:
+            if isinstance(timeStamps, (str, datetime)):
+                timeStamps = [timeStamps]
+            if len(timeStamps):
+                self.timeStamps = np.concatenate((self.timeStamps, self.toTimeStampArray(timeStamps)))
+                self.updateStartTime()
+
+    def toArrays(self) -> TimeSeries:
+        '''
+        Switch to arrayMode, converting the series to numpy arrays in place.
+        :return self
+        '''
+        if not self.arrayMode:
+            self.arrayMode = True
+            self.dataSeries = np.asarray(self.dataSeries, dtype = np.float64)
+            self.temperatures1 = np.asarray(self.temperatures1, dtype = np.float64)
+            self.temperatures2 = np.asarray(self.temperatures2, dtype = np.float64)
+            self.timeStamps = self.toTimeStampArray(self.timeStamps)
+        return self
+
+    def toLists(self) -> TimeSeries:
+        '''
+        Leave arrayMode, converting the series back to Python lists in place.
+        :return self
+        '''
+        if self.arrayMode:
+            self.arrayMode = False
+            self.dataSeries = self.dataSeries.tolist()
+            self.temperatures1 = self.temperatures1.tolist()
+            self.temperatures2 = self.temperatures2.tolist()
+            # datetime64[us].tolist() yields datetime objects:
+            self.timeStamps = self.timeStamps.tolist()
+        return self
+
     def unwrapPhase(self, period = 2 * np.pi):
-        self.dataSeries = unwrapPhase(self.dataSeries, period)
+        self._convertedCache.clear()
+        if self.arrayMode:
+            self.dataSeries = np.unwrap(self.dataSeries, period = period)
+        else:
+            self.dataSeries = unwrapPhase(self.dataSeries, period).tolist()
 
     def select(self,
             first: int = 0, 
@@ -145,10 +266,11 @@ class TimeSeries(BaseModel):
         if latestOnly:
             return TimeSeries(
                 tsId = self.tsId,
-                dataSeries = [self.dataSeries[-1]] if self.dataSeries else [],
-                temperatures1 = [self.temperatures1[-1]] if self.temperatures1 else [],
-                temperatures2 = [self.temperatures2[-1]] if self.temperatures2 else [],
-                timeStamps = [self.timeStamps[-1]] if self.timeStamps else [],
+                arrayMode = self.arrayMode,
+                dataSeries = self.dataSeries[-1:],
+                temperatures1 = self.temperatures1[-1:],
+                temperatures2 = self.temperatures2[-1:],
+                timeStamps = self.timeStamps[-1:],
                 tau0Seconds = self.tau0Seconds,
                 startTime = self.startTime,
                 dataUnits = self.dataUnits
@@ -157,23 +279,28 @@ class TimeSeries(BaseModel):
         else:
             if last is None:
                 last = len(self.dataSeries)
+            # in arrayMode the slices are views on this object's arrays:
             ts = TimeSeries(
                 tsId = self.tsId,
-                dataSeries = self.dataSeries[first:last] if self.dataSeries else [],
-                temperatures1 = self.temperatures1[first:last] if self.temperatures1 else [],
-                temperatures2 = self.temperatures2[first:last] if self.temperatures2 else [],
-                timeStamps = self.timeStamps[first:last] if self.timeStamps else [],
+                arrayMode = self.arrayMode,
+                dataSeries = self.dataSeries[first:last],
+                temperatures1 = self.temperatures1[first:last],
+                temperatures2 = self.temperatures2[first:last],
+                timeStamps = self.timeStamps[first:last],
                 tau0Seconds = self.tau0Seconds,
                 startTime = self.startTime,
                 dataUnits = self.dataUnits
             )
             if averaging > 1:
-                ts.dataSeries = (np.convolve(ts.dataSeries, np.ones(averaging), "valid") / averaging).tolist()
-                if ts.tetemperatures1:
-                    ts.temperatures1 = (np.convolve(ts.temperatures1, np.ones(averaging), "valid") / averaging).tolist()
-                if ts.tetemperatures2:
-                    ts.temperatures1 = (np.convolve(ts.temperatures1, np.ones(averaging), "valid") / averaging).tolist()
-                if ts.timeStamps:
+                def boxcar(series):
+                    result = np.convolve(series, np.ones(averaging), "valid") / averaging
+                    return result if self.arrayMode else result.tolist()
+                ts.dataSeries = boxcar(ts.dataSeries)
+                if len(ts.temperatures1):
+                    ts.temperatures1 = boxcar(ts.temperatures1)
+                if len(ts.temperatures2):
+                    ts.temperatures2 = boxcar(ts.temperatures2)
+                if len(ts.timeStamps):
                     ts.timeStamps = ts.timeStamps[0:-1:averaging]
             return ts
     
@@ -197,7 +324,11 @@ class TimeSeries(BaseModel):
         '''
         Get the dataSeries array, optionally converted to requiredUnits
         :param requiredUnits: enum Units from Constants.py or None
-        :return list derived from self.dataSeries converted, if possible
+        :param scale: if given and a conversion is needed, apply y * scale + offset before converting
+        :param offset: see scale
+        :param gainRef: reference level for conversion to DELTA_GAIN
+        :return list derived from self.dataSeries converted, if possible.  Read-only numpy array in arrayMode.
+                A converted list is cached and returned to every caller, so must not be modified.
         :raise TypeError if unsupported conversion requested
         '''
         if requiredUnits and isinstance(requiredUnits, str):
@@ -205,57 +336,23 @@ class TimeSeries(BaseModel):
         
         if not requiredUnits or self.dataUnits == requiredUnits:
             # no conversion needed:
+            if self.arrayMode:
+                # a read-only view on the stored array:
+                result = self.dataSeries.view()
+                result.flags.writeable = False
+                return result
             return self.dataSeries
         
-        result = copy.copy(self.dataSeries)
-
-        if scale is not None:
-            if offset is None:
-                offset = 0
-            result = [y * scale + offset for y in result]
-        
-        if self.dataUnits == Units.WATTS:
-            if requiredUnits == Units.MW:
-                # convert from watt to mW:
-                result = [y * 1000 for y in result]
-            
-            if requiredUnits == Units.DBM:
-                # convert from watt to dBm:
-                result = [10 * log10(y * 1000) for y in result]
-        
-        elif self.dataUnits == Units.MW:
-            if requiredUnits == Units.WATTS:
-                # convert from mW to watt:
-                result = [y / 1000 for y in result]
-            
-            if requiredUnits == Units.DBM:
-                # convert from mW to dBm:
-                result = [10 * log10(y) for y in result]
-        
-        elif self.dataUnits == Units.DBM:
-            if requiredUnits == Units.WATTS:
-                # convert from dBm to watt:
-                result = [pow(10, y / 10) / 1000 for y in result]
-            
-            if requiredUnits == Units.MW:
-                # convert from dBm to mW:
-                result = [pow(10, y / 10) for y in result]
-
-        elif self.dataUnits == Units.VOLTS:
-            if requiredUnits == Units.MV:
-                # convert from Volt to mV
-                result = [y * 1000 for y in result]
-            if requiredUnits == Units.DELTA_GAIN and gainRef is not None:
-                result = [y / gainRef for y in result]
-
-        elif self.dataUnits == Units.MV:
-            if requiredUnits == Units.VOLTS:
-                # convert from mV to Volt
-                result = [y / 1000 for y in self.dataSeries]        
-        else:
-            # not supported:
-            raise TypeError('Unsupported units conversion from {} to {}'.format(self.dataUnits.value, requiredUnits.value))
-        
+        key = (requiredUnits, scale, offset, gainRef)
+        result = self._convertedCache.get(key, None)
+        if result is None:
+            result = convertUnits(self.dataSeries, self.dataUnits, requiredUnits, scale, offset, gainRef)
+            # shared by all callers so must not be modified:
+            result.flags.writeable = False
+            if not self.arrayMode:
+                # cache the list so that later calls don't copy again:
+                result = result.tolist()
+            self._convertedCache[key] = result
         return result
 
     def getTimeStamps(self, requiredUnits:Optional[Union[str, Units]] = None):
@@ -272,21 +369,41 @@ class TimeSeries(BaseModel):
             # no conversion:
             return self.timeStamps
         
-        if requiredUnits == Units.SECONDS or requiredUnits == Units.MINUTES: 
-            # convert from datetime to seconds or minutes:
-            div = 60 if requiredUnits == Units.MINUTES else 1  
-            x0 = self.timeStamps[0]
-            result = [(x - x0).seconds / div for x in self.timeStamps]
-        elif requiredUnits == Units.MS:
-            # convert from datetime to ms:
-            x0 = self.timeStamps[0]
-            result = [(x - x0).microseconds / 1000 for x in self.timeStamps]
+        if requiredUnits == Units.SECONDS or requiredUnits == Units.MINUTES or requiredUnits == Units.MS:
+            # convert from datetime to elapsed seconds:
+            if self.arrayMode:
+                result = (self.timeStamps - self.timeStamps[0]) / np.timedelta64(1, 's')
+            else:
+                x0 = self.timeStamps[0]
+                result = [(x - x0).total_seconds() for x in self.timeStamps]
+            # then to minutes or ms:
+            if requiredUnits == Units.MINUTES:
+                result = result / 60 if self.arrayMode else [x / 60 for x in result]
+            elif requiredUnits == Units.MS:
+                result = result * 1000 if self.arrayMode else [x * 1000 for x in result]
         else:
             # not supported:
             raise TypeError('Unsupported units conversion from {} to {}'.format(Units.LOCALTIME.value, requiredUnits.value))
         
         return result  
     
+    @classmethod
+    def toTimeStampArray(cls, timeStamps) -> np.ndarray:
+        '''
+        Convert timeStamps to a datetime64[us] array
+        :param timeStamps: array or list of datetime or str
+        :return np.ndarray of datetime64[us]
+        '''
+        if isinstance(timeStamps, np.ndarray):
+            return timeStamps.astype('datetime64[us]', copy = False)
+        return np.array([cls.parseTimeStamp(ts) if isinstance(ts, str) else ts for ts in timeStamps], dtype = 'datetime64[us]')
+
+    def __emptySeries(self):
+        return np.empty(0, dtype = np.float64) if self.arrayMode else []
+
+    def __emptyTimeStamps(self):
+        return np.empty(0, dtype = 'datetime64[us]') if self.arrayMode else []
+
     @classmethod
     def parseTimeStamp(cls, timeStamp:str):
         '''
@@ -306,9 +423,10 @@ class TimeSeries(BaseModel):
 
         if cls.tsFormat:
             # use the cached format string:
-            return cls.tsParser.parseTimeStampWithFormatString(timeStamp, cls.tsFormat)
-        else:
-            # Call the full parser and store the format for next time
-            timeStamp = cls.tsParser.parseTimeStamp(timeStamp)
-            cls.tsFormat = cls.tsParser.lastTimeStampFormat
-            return timeStamp
\ No newline at end of file
+            result = cls.tsParser.parseTimeStampWithFormatString(timeStamp, cls.tsFormat)
+            if result:
+                return result
+        # Call the full parser and store the format for next time
+        result = cls.tsParser.parseTimeStamp(timeStamp)
+        cls.tsFormat = cls.tsParser.lastTimeStampFormat
+        return result
\ No newline at end of file
@@ -26,12 +26,15 @@ Where tags is a collection of name-value pairs, names given in Constants.py
 TimeSeries and its metadata can be inserted all at once using insertTimeSeries()
 Or it can be inserted in chunks or single values using startTimeSeries(), 
   insertTimeSeriesChunk(), finishTimeSeries()
+Or streamed with bounded memory using startTimeSeriesWriter()
 '''
 
 from AmpPhaseDataLib.Constants import DataSource, Units
 from AmpPhaseDataLib.TimeSeries import TimeSeries
+from AmpPhaseDataLib.TimeSeriesWriter import TimeSeriesWriter
 from Database.TimeSeriesDatabase import TimeSeriesDatabase
-from typing import List, Optional, Union, Dict
+from Database.CalcCacheDatabase import CalcCacheDatabase
+from typing import List, Optional, Union, Dict, Tuple
 from Utility import ParseTimeStamp
 from datetime import datetime
 import configparser
@@ -50,8 +53,13 @@ class TimeSeriesAPI(object):
         config = configparser.ConfigParser()
         config.read("AmpPhaseDataLib.ini")
         self.localDatabaseFile = config['Configuration']['localDatabaseFile']
+        self.storageFormat = config['Configuration'].get('storageFormat', TimeSeriesDatabase.STORAGE_BLOBS)
+        # optional SQLite storage profile:
+        pragmas = dict(config['SQLite']) if config.has_section('SQLite') else None
+        # optional size limit for cached calculation results:
+        calcCacheBytes = config.getint('CalcCache', 'maxBytes', fallback = CalcCacheDatabase.DEFAULT_MAX_BYTES)
 
-        self.db = TimeSeriesDatabase(self.localDatabaseFile)
+        self.db = TimeSeriesDatabase(self.localDatabaseFile, self.storageFormat, pragmas, calcCacheBytes)
         self.tsParser = ParseTimeStamp.ParseTimeStamp()
     
     def startTimeSeries(self, 
@@ -75,11 +83,35 @@ class TimeSeriesAPI(object):
         # create a time series header record and return the timeSeriesId:
         timeSeries.tsId = self.db.insertTimeSeriesHeader(timeSeries.startTime, tau0Seconds)
         if timeSeries.tsId:
-            self.setDataSource(timeSeries.tsId, DataSource.UNITS, dataUnits.value)
+            self.setDataSource(timeSeries.tsId, DataSource.UNITS, timeSeries.dataUnits.value)
             return timeSeries
         else:
             return None
 
+    def startTimeSeriesWriter(self,
+            tau0Seconds:Optional[float] = None, 
+            startTime:Optional[Union[str, datetime]] = None,
+            dataUnits:Optional[Union[str, Units]] = Units.AMPLITUDE,
+            bufferSize:int = 65536,
+            flushPoints:Optional[int] = None,
+            flushSeconds:Optional[float] = 60.0) -> TimeSeriesWriter:
+        '''
+        Create the TimeSeriesHeader and return a writer for streaming data points into it.
+        Unlike startTimeSeries(), memory use does not grow with the number of points.
+        :param tau0Seconds:   float: integration time of each reading
+        :param startTime:     datetime or str: when the measurement started.  If None, from the first reading.
+        :param dataUnits:     from Constans.Units enum.
+        :param bufferSize:    number of readings held in memory
+        :param flushPoints:   write when this many readings are pending.  Default and max is bufferSize
+        :param flushSeconds:  write when this many seconds have passed since the last write.  None to disable.
+        :return: TimeSeriesWriter if successful, otherwise None.  Call its close() method when done.
+        '''
+        timeSeries = self.startTimeSeries(tau0Seconds, startTime, dataUnits)
+        if timeSeries is None:
+            return None
+        return TimeSeriesWriter(self.db, timeSeries.tsId, timeSeries.startTime, tau0Seconds, 
+                                bufferSize, flushPoints, flushSeconds)
+
     def finishTimeSeries(self, timeSeries:TimeSeries):
         '''
         Write out the time series data to the database.
@@ -120,47 +152,150 @@ class TimeSeriesAPI(object):
         :raise ValueError:    if any data series is not at least two points.
         Either timeStamps or tau0seconds must be provided.
         If timeStamps is provided, startTime will be set to the first value, else now() if not provided. 
+        The header, UNITS tag, and data are inserted in a single transaction.
         '''
-        timeSeries = self.startTimeSeries(tau0Seconds, startTime, dataUnits)
+        timeSeries = TimeSeries(
+            tau0Seconds = tau0Seconds, 
+            startTime = startTime, 
+            dataUnits = dataUnits
+        )
         timeSeries.appendData(dataSeries, temperatures1, temperatures2, timeStamps)
-        self.finishTimeSeries(timeSeries)
+        # fix up startTime and tau0Seconds, if not provided:
+        timeSeries.updateStartTime()
+        timeSeries.initializeTau0Seconds()
+        # check for validity:
+        valid, msg = timeSeries.isValid(checkId = False)
+        if not valid:
+            raise ValueError(msg)
+        if not self.db.insertTimeSeriesWithHeader(timeSeries, { DataSource.UNITS.value : timeSeries.dataUnits.value }):
+            return None
+        timeSeries.clearDirty()
         return timeSeries.tsId
     
-    def retrieveTimeSeries(self, timeSeriesId):
+    def retrieveTimeSeries(self, 
+            timeSeriesId, 
+            arrayMode = False,
+            first: int = 0,
+            last: Optional[int] = None,
+            timeRange: Optional[Tuple[Optional[Union[str, datetime]], Optional[Union[str, datetime]]]] = None,
+            decimate: Optional[int] = None):
         '''
+        Retrieve a time series, or just part of it.  The selection is done in the database.
         :param timeSeriesId: of time series to retrieve
+        :param arrayMode: if True, the series are returned as numpy arrays rather than lists
+        :param first: index of the first point to retrieve
+        :param last: index after the last point to retrieve, or None for the end
+        :param timeRange: optional (start, end) datetime or str.  Only points with start <= timeStamp <= end are retrieved.
+                          Either may be None for an open range.
+        :param decimate: if given, reduce the selection to a min/max envelope of about this many groups of points.
+                         Each group becomes two points, its min and max, at the timeStamp of its first point.
         :return timeSeries if successful, otherwise None
+                A partial or decimated timeSeries must not be passed to finishTimeSeries().
         '''
         header = self.db.retrieveTimeSeriesHeader(timeSeriesId)
         if not header:
             return None
 
         dataUnits = self.getDataSource(timeSeriesId, DataSource.UNITS, Units.AMPLITUDE)
+        
+        if timeRange:
+            timeRange = tuple(self.tsParser.parseTimeStamp(t) if isinstance(t, str) else t for t in timeRange)
+        
+        # the database may return lists or arrays.  The TimeSeries validators convert them for arrayMode:
+        result = self.db.retrieveTimeSeries(header.timeSeriesId, first, last, timeRange, decimate)
         timeSeries = TimeSeries(
             tsId = header.timeSeriesId, 
+            arrayMode = arrayMode,
+            dataSeries = result.dataSeries if result else [],
+            temperatures1 = result.temperatures1 if result else [],
+            temperatures2 = result.temperatures2 if result else [],
+            timeStamps = result.timeStamps if result else [],
             tau0Seconds = header.tau0Seconds, 
             startTime = header.startTime,
             dataUnits = dataUnits
         )
-        
-        result = self.db.retrieveTimeSeries(timeSeries.tsId)
-        if not result:
-            # header was found but no   Ok.
-            return timeSeries
-            
-        timeSeries.timeStamps = result.timeStamps
-        timeSeries.dataSeries = result.dataSeries
-        timeSeries.temperatures1 = result.temperatures1
-        timeSeries.temperatures2 = result.temperatures2
+        # header found but no data is Ok.
         timeSeries.clearDirty()
         return timeSeries
             
+    def retrieveTimeSeriesMany(self, timeSeriesIds: List[int], arrayMode = False) -> List[Optional[TimeSeries]]:
+        '''
+        Retrieve several complete time series using a fixed number of database queries.
+        :param timeSeriesIds: list of int timeSeriesId to retrieve
+        :param arrayMode: if True, the series are returned as numpy arrays rather than lists
+        :return list of timeSeries corresponding to timeSeriesIds, with None for any not found
+        '''
+        headers = self.db.retrieveTimeSeriesHeaders(timeSeriesIds)
+        units = self.db.getTagsMany(list(headers.keys()), [DataSource.UNITS.value])
+        results = self.db.retrieveTimeSeriesMany(list(headers.keys()))
+        
+        timeSeriesList = []
+        for timeSeriesId in timeSeriesIds:
+            header = headers.get(timeSeriesId, None)
+            if not header:
+                timeSeriesList.append(None)
+                continue
+            result = results.get(timeSeriesId, None)
+            timeSeries = TimeSeries(
+                tsId = header.timeSeriesId, 
+                arrayMode = arrayMode,
+                dataSeries = result.dataSeries if result else [],
+                temperatures1 = result.temperatures1 if result else [],
+                temperatures2 = result.temperatures2 if result else [],
+                timeStamps = result.timeStamps if result else [],
+                tau0Seconds = header.tau0Seconds, 
+                startTime = header.startTime,
+                dataUnits = units[timeSeriesId].get(DataSource.UNITS.value, None) or Units.AMPLITUDE
+            )
+            timeSeries.clearDirty()
+            timeSeriesList.append(timeSeries)
+        return timeSeriesList
+
+    def migrateTimeSeriesStorage(self, timeSeriesId = None) -> List[int]:
+        '''
+        Move time series data from the original one-row-per-sample layout to compressed blobs.
+        :param timeSeriesId: of time series to migrate, or None to migrate all
+        :return list of timeSeriesId migrated
+        '''
+        return self.db.migrateToBlobs(timeSeriesId)
+
     def deleteTimeSeries(self, timeSeriesId):
         '''
         :param timeSeriesId: of time series to delete
         '''
         self.db.deleteTimeSeries(timeSeriesId)
     
+    def getCalcCache(self, cacheKey: str) -> Optional[bytes]:
+        '''
+        Get a cached calculation result
+        :param cacheKey: str made by the caller from everything the result depends on
+        :return bytes or None if not cached
+        '''
+        return self.db.calcCacheDb.get(cacheKey)
+
+    def setCalcCache(self, cacheKey: str, result: bytes, timeSeriesId: Optional[int] = None):
+        '''
+        Cache a calculation result.  It is discarded when the time series is modified or deleted.
+        :param cacheKey: str made by the caller from everything the result depends on
+        :param result: bytes
+        :param timeSeriesId: of the time series it was calculated from, if stored in the database
+        '''
+        self.db.calcCacheDb.put(cacheKey, result, timeSeriesId)
+
+    def clearCalcCache(self, timeSeriesId: Optional[int] = None):
+        '''
+        Discard cached calculation results
+        :param timeSeriesId: of the time series to discard results for, or None for all
+        '''
+        self.db.calcCacheDb.invalidate(timeSeriesId)
+
+    def countCalcCache(self, timeSeriesId: Optional[int] = None) -> int:
+        '''
+        :param timeSeriesId: of the time series to count results for, or None for all
+        :return number of calculation results cached
+        '''
+        return self.db.calcCacheDb.count(timeSeriesId)
+
     def setDataSource(self, timeSeriesId:int, dataSource:Union[str, DataSource], value):
         '''
         Set a DataSource tag for a TimeSeries.
@@ -198,6 +333,19 @@ class TimeSeriesAPI(object):
         '''
         self.setDataSource(timeSeriesId, dataSource, None)
     
+    def getAllDataSourceMany(self, timeSeriesIds: List[int]) -> Dict[int, Dict[DataSource, str]]:
+        '''
+        Get all DataSource tags for several TimeSeries in one query
+        :param timeSeriesIds: list of int
+        :return dict of {timeSeriesId : {DataSource : str}}
+        '''
+        retrieved = self.db.getTagsMany(timeSeriesIds, [el.value for el in DataSource])
+        result = {}
+        # replace key str values with DataSource enum values:
+        for timeSeriesId, tags in retrieved.items():
+            result[timeSeriesId] = {DataSource(tag) : value for tag, value in tags.items()}
+        return result
+
     def getAllDataSource(self, timeSeriesId: int) -> Dict[DataSource, str]:
         '''
         Get all DataSource tags for a TimeSeries
@@ -0,0 +1,215 @@
+'''
+Streaming writer for long TimeSeries measurements, with bounded memory.
+Create using TimeSeriesAPI.startTimeSeriesWriter()
+'''
+from AmpPhaseDataLib.TimeSeries import TimeSeries
+from Database.TimeSeriesDatabase import TimeSeriesDatabase
+from typing import List, Optional, Union
+from datetime import datetime
+import numpy as np
+import time
+
+class TimeSeriesWriter(object):
+    '''
+    Accumulates readings in a fixed-size ring buffer and writes them to the database
+    when flushPoints readings are pending or flushSeconds have elapsed since the last write.
+    Readings already written are only kept until overwritten in the ring, so memory use
+    does not grow with the length of the measurement.
+
+    Readings appended without timeStamps are stamped startTime + index * tau0Seconds,
+    or with now() if tau0Seconds is not known.
+    Once any reading has temperatures, readings without them are stored as NaN so that the columns stay aligned
+    with dataSeries.  If no reading has temperatures the columns are stored empty.
+
+    If a write to the database fails the readings stay pending and are written by the next flush.
+    '''
+
+    def __init__(self,
+            db: TimeSeriesDatabase,
+            timeSeriesId: int,
+            startTime: Optional[datetime] = None,
+            tau0Seconds: Optional[float] = None,
+            bufferSize: int = 65536,
+            flushPoints: Optional[int] = None,
+            flushSeconds: Optional[float] = 60.0):
+        '''
+        Constructor
+        :param db: TimeSeriesDatabase to write to
+        :param timeSeriesId: of the header already created
+        :param startTime: datetime when the measurement started, or None to take from the first reading
+        :param tau0Seconds: float integration time of each reading, or None to compute from timeStamps
+        :param bufferSize: number of readings held in memory
+        :param flushPoints: write when this many readings are pending.  Default and max is bufferSize
+        :param flushSeconds: write when this many seconds have passed since the last write.  None to disable.
+        '''
+        self.db = db
+        self.tsId = timeSeriesId
+        self.startTime = startTime
+        self.tau0Seconds = tau0Seconds
+        self.bufferSize = max(int(bufferSize), 1)
+        self.flushPoints = min(flushPoints, self.bufferSize) if flushPoints else self.bufferSize
+        self.flushSeconds = flushSeconds
+        self.__reset()
+
+    def __reset(self):
+        '''
+        Reset members to just-constructed state
+        '''
+        self.dataSeries = np.zeros(self.bufferSize, dtype = np.float64)
+        self.temperatures1 = np.full(self.bufferSize, np.nan)
+        self.temperatures2 = np.full(self.bufferSize, np.nan)
+        # epoch-microseconds:
+        self.timeStamps = np.zeros(self.bufferSize, dtype = np.int64)
+        # total number of readings appended and written:
+        self.numPoints = 0
+        self.numWritten = 0
+        self.haveTemperatures1 = False
+        self.haveTemperatures2 = False
+        self.headerDirty = False
+        self.lastFlushTime = time.monotonic()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def append(self,
+            dataSeries: Union[float, List[float]],
+            temperatures1: Optional[Union[float, List[float]]] = None,
+            temperatures2: Optional[Union[float, List[float]]] = None,
+            timeStamps: Optional[Union[str, datetime, List[str], List[datetime]]] = None):
+        '''
+        Append one or more readings, writing to the database when a threshold is reached
+        :param dataSeries: single or list of float
+        :param temperatures1: single or list of float corresponding to dataSeries
+        :param temperatures2: single or list of float corresponding to dataSeries
+        :param timeStamps: single or list of timestamp corresponding to dataSeries
+        :raise RuntimeError: if the buffer is full of pending readings and they can't be written.
+                             Readings from this call which were not yet buffered are discarded.
+        '''
+        dataSeries = np.atleast_1d(np.asarray(dataSeries, dtype = np.float64))
+        count = len(dataSeries)
+        if not count:
+            return
+
+        temperatures1 = self.__toColumn(temperatures1, count)
+        temperatures2 = self.__toColumn(temperatures2, count)
+        if temperatures1 is not None:
+            self.haveTemperatures1 = True
+        if temperatures2 is not None:
+            self.haveTemperatures2 = True
+
+        if timeStamps is not None:
+            if isinstance(timeStamps, (str, datetime)):
+                timeStamps = [timeStamps]
+            timeStamps = TimeSeries.toTimeStampArray(timeStamps).astype(np.int64)
+
+        if self.startTime is None:
+            self.startTime = timeStamps[0].astype('datetime64[us]').astype(datetime) if timeStamps is not None else datetime.now()
+            self.headerDirty = True
+
+        if timeStamps is None:
+            timeStamps = self.__makeTimeStamps(count)
+
+        # copy into the ring, flushing whenever flushPoints are pending:
+        done = 0
+        while done < count:
+            pending = self.numPoints - self.numWritten
+            if pending >= self.bufferSize:
+                # earlier writes failed.  Never overwrite pending readings:
+                if not self.flush():
+                    raise RuntimeError('TimeSeriesWriter: buffer full and writing to the database failed.')
+                pending = 0
+            # up to the flush threshold, or the rest of the ring while writes are failing:
+            space = (self.flushPoints if pending < self.flushPoints else self.bufferSize) - pending
+            n = min(space, count - done)
+            index = (self.numPoints + np.arange(n)) % self.bufferSize
+            self.dataSeries[index] = dataSeries[done : done + n]
+            self.temperatures1[index] = temperatures1[done : done + n] if temperatures1 is not None else np.nan
+            self.temperatures2[index] = temperatures2[done : done + n] if temperatures2 is not None else np.nan
+            self.timeStamps[index] = timeStamps[done : done + n]
+            self.numPoints += n
+            done += n
+            if self.numPoints - self.numWritten >= self.flushPoints:
+                self.flush()
+
+        if self.flushSeconds is not None and time.monotonic() - self.lastFlushTime >= self.flushSeconds:
+            self.flush()
+
+    def flush(self):
+        '''
+        Write all pending readings to the database
+        :return True if successful.  If False the readings stay pending.
+        '''
+        self.lastFlushTime = time.monotonic()
+        if self.numWritten == self.numPoints:
+            return True
+
+        toWrite = self.__select(self.numWritten, self.numPoints)
+        if self.tau0Seconds is None and toWrite.initializeTau0Seconds():
+            self.tau0Seconds = toWrite.tau0Seconds
+            self.headerDirty = True
+        if self.headerDirty and self.tau0Seconds is not None:
+            self.db.updateTimeSeriesHeader(self.tsId, self.startTime, self.tau0Seconds)
+            self.headerDirty = False
+
+        if not self.db.insertTimeSeries(toWrite):
+            return False
+        self.numWritten = self.numPoints
+        return True
+
+    def close(self):
+        '''
+        Write all pending readings.  The writer should not be used afterward.
+        :return True if successful
+        '''
+        return self.flush()
+
+    def getLatest(self, count: Optional[int] = None) -> TimeSeries:
+        '''
+        Get the most recent readings still held in memory, whether written or not
+        :param count: max number of readings.  Default is all that are available.
+        :return TimeSeries in arrayMode
+        '''
+        available = min(self.numPoints, self.bufferSize)
+        count = available if count is None else min(count, available)
+        return self.__select(self.numPoints - count, self.numPoints)
+
+    def __select(self, first, last) -> TimeSeries:
+        '''
+        Copy readings from the ring by their overall index, first <= index < last
+        :return TimeSeries in arrayMode
+        '''
+        index = np.arange(first, last) % self.bufferSize
+        return TimeSeries(
+            tsId = self.tsId,
+            arrayMode = True,
+            dataSeries = self.dataSeries[index],
+            temperatures1 = self.temperatures1[index] if self.haveTemperatures1 else [],
+            temperatures2 = self.temperatures2[index] if self.haveTemperatures2 else [],
+            timeStamps = self.timeStamps[index].astype('datetime64[us]'),
+            tau0Seconds = self.tau0Seconds,
+            startTime = self.startTime
+        )
+
+    def __toColumn(self, values, count):
+        '''
+        :return values as a float64 array of length count, or None if values is None
+        '''
+        if values is None:
+            return None
+        values = np.atleast_1d(np.asarray(values, dtype = np.float64))
+        if len(values) != count:
+            raise ValueError('temperatures must correspond to dataSeries')
+        return values
+
+    def __makeTimeStamps(self, count):
+        '''
+        :return epoch-microseconds for count readings following those already appended
+        '''
+        if self.tau0Seconds:
+            startTime = np.datetime64(self.startTime, 'us').astype(np.int64)
+            return startTime + np.round((self.numPoints + np.arange(count)) * self.tau0Seconds * 1e6).astype(np.int64)
+        else:
+            return np.full(count, np.datetime64(datetime.now(), 'us').astype(np.int64))
@@ -5,6 +5,7 @@ Validate AmpPhaseDataLib.ParseTimeStamps
 from behave import given, when, then 
 from hamcrest import assert_that, equal_to, is_not, instance_of
 from datetime import datetime
+import numpy as np
 
 @given('dateTime string "{timeStampString}"')
 def step_impl(context, timeStampString):
@@ -21,6 +22,33 @@ def step_impl(context):
     """
     context.result = context.tsParser.parseTimeStamp(context.timeStampString)
 
+@when('the column "{timeStampList}" is parsed')
+def step_impl(context, timeStampList):
+    """
+    :param context: behave.runner.Context
+    :param timeStampList: comma-separated list of dateTime strings
+    """
+    timeStampList = [ts.strip() for ts in timeStampList.split(',')]
+    context.result = context.tsParser.parseTimeStampColumn(timeStampList)
+    context.expected = [context.tsParser.parseTimeStamp(ts) for ts in timeStampList]
+
+@then('the column matches parsing each row')
+def step_impl(context):
+    """
+    :param context: behave.runner.Context
+    """
+    assert_that(context.result.dtype, equal_to(np.dtype('datetime64[us]')))
+    assert_that(context.result.tolist(), equal_to(context.expected))
+
+@then('the column matches the local time of each row')
+def step_impl(context):
+    """
+    :param context: behave.runner.Context
+    """
+    expected = [ts.replace(tzinfo = None) if ts else None for ts in context.expected]
+    assert_that(context.result.dtype, equal_to(np.dtype('datetime64[us]')))
+    assert_that(context.result.tolist(), equal_to(expected))
+
 @then('a valid datetime is returned')
 def step_impl(context):
     """
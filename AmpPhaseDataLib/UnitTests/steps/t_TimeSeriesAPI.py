@@ -6,7 +6,9 @@ from behave import given, when, then
 from datetime import datetime
 from AmpPhaseDataLib.Constants import DataSource, Units
 from Utility import ParseTimeStamp
-from hamcrest import assert_that, equal_to, close_to
+from hamcrest import assert_that, equal_to, close_to, calling, raises
+import numpy as np
+import time
 
 ##### GIVEN #####
         
@@ -28,6 +30,23 @@ def step_impl(context, timeStampList):
     # convert strings to lists: 
     context.timeStamps = timeStampList.strip('][').split(',')
 
+@given('temperatures1 list "{dataList}"')
+def step_impl(context, dataList):
+    """
+    :param context: behave.runner.Context
+    :param dataList: comma-separated list of float strings
+    """
+    # convert strings to lists: 
+    context.temperatures1 = [float(i) for i in dataList.strip('][').split(',')]
+
+@given('the blob chunk size is "{intString}" points')
+def step_impl(context, intString):
+    '''
+    :param context: behave.runner.Context
+    :param intString: max points per blob
+    '''
+    context.API.db.BLOB_CHUNK_POINTS = int(intString)
+
 @given('a sequence of readings "{dataList}" and tau0 of "{floatString}"')
 def step_impl(context, dataList, floatString):
     """
@@ -49,12 +68,22 @@ def step_impl(context, units):
 
 ##### WHEN #####
 
+@given('the storage format is "{storageFormat}"')
+def step_impl(context, storageFormat):
+    '''
+    :param context: behave.runner.Context
+    :param storageFormat: "rows" or "blobs"
+    '''
+    context.API.db.storageFormat = storageFormat
+
 @when('the data is inserted')
 def step_impl(context):
     """
     :param context: behave.runner.Context
     """
-    context.timeSeriesId = context.API.insertTimeSeries(dataSeries = context.dataSeries, timeStamps = context.timeStamps)
+    context.timeSeriesId = context.API.insertTimeSeries(dataSeries = context.dataSeries, 
+                                                        temperatures1 = getattr(context, 'temperatures1', None),
+                                                        timeStamps = context.timeStamps)
     if context.timeSeriesId and hasattr(context, 'units'):
         context.API.setDataSource(context.timeSeriesId, DataSource.UNITS, context.units)
 
@@ -75,6 +104,89 @@ def step_impl(context):
     if hasattr(context, 'units'):
         context.API.setDataSource(context.timeSeriesId, DataSource.UNITS, context.units)
 
+@when('the streaming writer runs with a buffer of "{intString}" readings')
+def step_impl(context, intString):
+    """
+    :param context: behave.runner.Context
+    :param intString: ring buffer size
+    """
+    context.now = datetime.now()
+    
+    writer = context.API.startTimeSeriesWriter(context.tau0Seconds, bufferSize = int(intString))
+    assert_that(writer is not None)
+    context.timeSeriesId = writer.tsId
+    for item in context.dataSeries:
+        writer.append(float(item))
+        assert_that(writer.numPoints - writer.numWritten < int(intString))
+    writer.close()
+    assert_that(writer.numWritten, equal_to(len(context.dataSeries)))
+    if hasattr(context, 'units'):
+        context.API.setDataSource(context.timeSeriesId, DataSource.UNITS, context.units)
+
+@when('a streaming writer is started with a buffer of "{bufferSize}" flushing every "{flushPoints}" readings or "{flushSeconds}" seconds')
+def step_impl(context, bufferSize, flushPoints, flushSeconds):
+    """
+    :param context: behave.runner.Context
+    :param bufferSize: ring buffer size
+    :param flushPoints: number of pending readings to write
+    :param flushSeconds: seconds between writes
+    """
+    context.writer = context.API.startTimeSeriesWriter(context.tau0Seconds, 
+                                                       bufferSize = int(bufferSize), 
+                                                       flushPoints = int(flushPoints), 
+                                                       flushSeconds = float(flushSeconds))
+    assert_that(context.writer is not None)
+    context.timeSeriesId = context.writer.tsId
+    if hasattr(context, 'units'):
+        context.API.setDataSource(context.timeSeriesId, DataSource.UNITS, context.units)
+
+@when('readings are streamed')
+def step_impl(context):
+    """
+    :param context: behave.runner.Context
+    context.table has columns reading and temperature1, which may be blank
+    """
+    for row in context.table:
+        context.writer.append(float(row['reading']), 
+                              temperatures1 = float(row['temperature1']) if row['temperature1'] else None)
+
+@when('the readings "{dataList}" are streamed')
+def step_impl(context, dataList):
+    """
+    :param context: behave.runner.Context
+    :param dataList: comma-separated list of float strings
+    """
+    context.writer.append([float(i) for i in dataList.split(',')])
+
+@when('"{floatString}" seconds pass')
+def step_impl(context, floatString):
+    """
+    :param context: behave.runner.Context
+    :param floatString: seconds to wait
+    """
+    time.sleep(float(floatString))
+
+@when('the database rejects writes')
+def step_impl(context):
+    """
+    :param context: behave.runner.Context
+    """
+    context.API.db.insertTimeSeries = lambda timeSeries, commit = True: False
+
+@when('the database accepts writes again')
+def step_impl(context):
+    """
+    :param context: behave.runner.Context
+    """
+    del context.API.db.insertTimeSeries
+
+@when('the streaming writer is closed')
+def step_impl(context):
+    """
+    :param context: behave.runner.Context
+    """
+    assert_that(context.writer.close())
+
 @when('the time series is retrieved from the database')
 def step_impl(context):
     '''
@@ -83,6 +195,76 @@ def step_impl(context):
     context.timeSeries = context.API.retrieveTimeSeries(context.timeSeriesId) 
     assert_that(context.timeSeries)
 
+@when('the time series is retrieved from the database as arrays')
+def step_impl(context):
+    '''
+    :param context: behave.runner.Context
+    '''
+    context.timeSeries = context.API.retrieveTimeSeries(context.timeSeriesId, arrayMode = True) 
+    assert_that(context.timeSeries)
+
+@when('the time series is retrieved from the database with first "{first}" and last "{last}"')
+def step_impl(context, first, last):
+    '''
+    :param context: behave.runner.Context
+    :param first: index of first point to retrieve
+    :param last: index after last point to retrieve
+    '''
+    context.timeSeries = context.API.retrieveTimeSeries(context.timeSeriesId, first = int(first), last = int(last)) 
+    assert_that(context.timeSeries)
+
+@when('the time series is retrieved from the database between "{start}" and "{end}"')
+def step_impl(context, start, end):
+    '''
+    :param context: behave.runner.Context
+    :param start: timestamp string
+    :param end: timestamp string
+    '''
+    context.timeSeries = context.API.retrieveTimeSeries(context.timeSeriesId, timeRange = (start, end)) 
+    assert_that(context.timeSeries)
+
+@when('the time series is retrieved from the database decimated to "{intString}" groups')
+def step_impl(context, intString):
+    '''
+    :param context: behave.runner.Context
+    :param intString: number of min/max groups
+    '''
+    context.timeSeries = context.API.retrieveTimeSeries(context.timeSeriesId, decimate = int(intString)) 
+    assert_that(context.timeSeries)
+
+@when('the time series is retrieved together with a missing timeSeriesId')
+def step_impl(context):
+    '''
+    :param context: behave.runner.Context
+    '''
+    context.timeSeriesList = context.API.retrieveTimeSeriesMany([context.timeSeriesId, 999999999, context.timeSeriesId])
+
+@when('the reading "{floatString}" is appended')
+def step_impl(context, floatString):
+    '''
+    :param context: behave.runner.Context
+    :param floatString: string representation of a float
+    '''
+    context.timeSeries.appendData(float(floatString))
+
+@when('reading "{intString}" is overwritten in place with "{floatString}" and the cache is cleared')
+def step_impl(context, intString, floatString):
+    '''
+    :param context: behave.runner.Context
+    :param intString: index of the reading to overwrite
+    :param floatString: string representation of a float
+    '''
+    context.timeSeries.dataSeries[int(intString)] = float(floatString)
+    context.timeSeries.clearConvertedCache()
+
+@when('the time series storage is migrated')
+def step_impl(context):
+    '''
+    :param context: behave.runner.Context
+    '''
+    migrated = context.API.migrateTimeSeriesStorage(context.timeSeriesId)
+    assert_that(migrated, equal_to([context.timeSeriesId]))
+
 @when('TimeSeries DataSource tag "{tagName}" is set with value "{tagValue}"')
 def step_impl(context, tagName, tagValue):
     """
@@ -123,6 +305,17 @@ def step_impl(context, intString):
     dataLen = int(intString)
     assert_that(len(context.timeSeries.getDataSeries()), equal_to(dataLen))
     
+@then('dataSeries is an array of "{intString}" elements')
+def step_impl(context, intString):
+    '''
+    :param context: behave.runner.Context
+    :param intString: an int as string
+    '''
+    dataLen = int(intString)
+    dataSeries = context.timeSeries.getDataSeries()
+    assert_that(isinstance(dataSeries, np.ndarray))
+    assert_that(len(dataSeries), equal_to(dataLen))
+    
 @then('timeStamps is a list of "{intString}" elements')
 def step_impl(context, intString):
     '''
@@ -221,7 +414,7 @@ def step_impl(context, dataList, units):
     # convert string to list: 
     dataList = [float(i) for i in dataList.strip('][').split(',')]
     result = context.timeSeries.getTimeStamps(requiredUnits = units)
-    assert_that(result, equal_to(dataList))
+    assert_that(list(result), equal_to(dataList))
 
 @then('we can retrieve the readings as "{dataList}" in units "{units}"')
 def step_impl(context, dataList, units):
@@ -237,3 +430,66 @@ def step_impl(context, dataList, units):
     for a, b in zip(result, dataList):
         assert_that(a, close_to(b, 0.00005))
 
+
+@then('temperatures1 is "{dataList}"')
+def step_impl(context, dataList):
+    """
+    :param context: behave.runner.Context
+    :param dataList: comma-separated list of float strings, 'nan' where missing
+    """
+    dataList = [float(i) for i in dataList.strip('][').split(',')]
+    result = list(context.timeSeries.temperatures1)
+    assert_that(len(result), equal_to(len(dataList)))
+    for a, b in zip(result, dataList):
+        if np.isnan(b):
+            assert_that(np.isnan(a))
+        else:
+            assert_that(a, close_to(b, 0.00005))
+
+@then('the writer has written "{written}" and has "{pending}" readings pending')
+def step_impl(context, written, pending):
+    """
+    :param context: behave.runner.Context
+    :param written: number of readings written to the database
+    :param pending: number of readings not yet written
+    """
+    assert_that(context.writer.numWritten, equal_to(int(written)))
+    assert_that(context.writer.numPoints - context.writer.numWritten, equal_to(int(pending)))
+
+@then('streaming the reading "{floatString}" raises an error without overwriting pending readings')
+def step_impl(context, floatString):
+    """
+    :param context: behave.runner.Context
+    :param floatString: string representation of a float
+    """
+    pending = context.writer.getLatest().dataSeries.copy()
+    assert_that(calling(context.writer.append).with_args(float(floatString)), raises(RuntimeError))
+    assert_that(context.writer.flush(), equal_to(False))
+    assert_that(context.writer.getLatest().dataSeries.tolist(), equal_to(pending.tolist()))
+
+@then('retrieving the readings again in units "{units}" reuses the cached result')
+def step_impl(context, units):
+    """
+    :param context: behave.runner.Context
+    :param units: units as a string
+    """
+    requiredUnits = Units.fromStr(units)
+    first = context.timeSeries.getDataSeries(requiredUnits)
+    second = context.timeSeries.getDataSeries(requiredUnits)
+    assert_that(second is first)
+    if context.timeSeries.arrayMode:
+        assert_that(not first.flags.writeable)
+
+@then('the retrieved list has "{intString}" time series and one missing')
+def step_impl(context, intString):
+    """
+    :param context: behave.runner.Context
+    :param intString: expected number of time series found
+    """
+    found = [ts for ts in context.timeSeriesList if ts is not None]
+    assert_that(len(found), equal_to(int(intString)))
+    assert_that(context.timeSeriesList[1] is None)
+    for ts in found:
+        assert_that(ts.tsId, equal_to(context.timeSeriesId))
+        assert_that(len(ts.dataSeries), equal_to(len(context.dataSeries)))
+        assert_that(len(ts.timeStamps), equal_to(len(context.timeStamps)))
@@ -35,3 +35,25 @@ Feature: Validate parsing time stamps
     When the test is run
     Then a valid datetime will not be returned
     And no matching format string is stored
+
+    @fixture.parseTimeStamp
+    Scenario: Test parsing a column of timestamps in SQL format
+    When the column "2020-05-21 11:15:22.100000, 2020-05-21 11:15:22.150000, 2020-05-21 11:15:23" is parsed
+    Then the column matches parsing each row
+
+    @fixture.parseTimeStamp
+    Scenario: Test parsing a column of timestamps in mixed formats
+    When the column "2020-05-20 2:45:04 PM, 2020-05-20 2:45:05 PM, 5/21/2020 9:45" is parsed
+    Then the column matches parsing each row
+
+    @fixture.parseTimeStamp
+    Scenario Outline: Test parsing a column of timestamps which numpy can't decode as written
+    When the column "<column>" is parsed
+    Then the column matches the local time of each row
+
+    Examples: UTC offsets and unparseable rows
+    | column                                                                     |
+    | 2020-05-21 11:15:22+02:00, 2020-05-21 11:15:23+02:00                       |
+    | 2020-05-21T11:15:22Z, 2020-05-21T11:15:23Z                                 |
+    | 2020-05-21 11:15:22, 2020-05-21 11:15:23-0500                              |
+    | 2020-05-21 11:15:22, NaT, 2020-05-21 11:15:24                              |
@@ -77,6 +77,17 @@ Feature: Validate TimeSeriesAPI
     And we can retrieve the readings as "1, 2, 3, 4, 5, 6" in units "mW"
     And we can retrieve the readings as "0, 3.0103, 4.7712, 6.0206, 6.9897, 7.7815" in units "dBm"
     
+    @fixture.timeSeriesAPI
+    Scenario: Insert time series in Watts and retrieve as arrays in different units
+    Given a sequence of readings "0.001, 0.002, 0.003, 0.004, 0.005, 0.006" and tau0 of "6.0"
+    And the units are "W"
+    When the measurement loop runs
+    And the time series is retrieved from the database as arrays
+    Then dataSeries is an array of "6" elements
+    And we can retrieve the timestamps as "0, 6, 12, 18, 24, 30" in units "seconds"
+    And we can retrieve the readings as "1, 2, 3, 4, 5, 6" in units "mW"
+    And we can retrieve the readings as "0, 3.0103, 4.7712, 6.0206, 6.9897, 7.7815" in units "dBm"
+
     @fixture.timeSeriesAPI
     Scenario: Insert time series in Volts and retrieve in different units
     Given a sequence of readings "0.001, 0.002, 0.003, 0.004, 0.005, 0.006" and tau0 of "6.0"
@@ -85,3 +96,155 @@ Feature: Validate TimeSeriesAPI
     And the time series is retrieved from the database
     Then the units are "V"
     And we can retrieve the readings as "1, 2, 3, 4, 5, 6" in units "mV"
+
+    @fixture.timeSeriesAPI
+    Scenario: Insert time series in dBm and retrieve in chained units
+    Given a sequence of readings "0, 3.0103, 4.7712, 6.0206, 6.9897, 7.7815" and tau0 of "6.0"
+    And the units are "dBm"
+    When the measurement loop runs
+    And the time series is retrieved from the database as arrays
+    Then the units are "dBm"
+    And we can retrieve the readings as "1, 2, 3, 4, 5, 6" in units "mW"
+    And we can retrieve the readings as "0.001, 0.002, 0.003, 0.004, 0.005, 0.006" in units "W"
+
+    @fixture.timeSeriesAPI
+    Scenario: Converted readings are cached until the data changes
+    Given a sequence of readings "0.001, 0.002, 0.003" and tau0 of "6.0"
+    And the units are "W"
+    When the measurement loop runs
+    And the time series is retrieved from the database as arrays
+    Then retrieving the readings again in units "mW" reuses the cached result
+    When the reading "0.004" is appended
+    Then we can retrieve the readings as "1, 2, 3, 4" in units "mW"
+    And dataSeries is an array of "4" elements
+
+    @fixture.timeSeriesAPI
+    Scenario: Converted lists are cached and in-place writes need the cache cleared
+    Given a sequence of readings "0.001, 0.002, 0.003" and tau0 of "6.0"
+    And the units are "W"
+    When the measurement loop runs
+    And the time series is retrieved from the database
+    Then retrieving the readings again in units "mW" reuses the cached result
+    When reading "1" is overwritten in place with "0.005" and the cache is cleared
+    Then we can retrieve the readings as "1, 5, 3" in units "mW"
+    And dataSeries is a list of "3" elements
+
+    @fixture.timeSeriesAPI
+    Scenario: Insert a time series as rows, migrate it to blobs, and retrieve it
+    Given the storage format is "rows"
+    And dataSeries list "2.1, 2.2, 2.3" 
+    And timestamp list "2020:05:21 12:00:00.000, 2020:05:21 12:00:00.050, 2020:05:21 12:00:00.100"
+    And the units are "mW"
+    When the data is inserted 
+    And the time series storage is migrated
+    And the time series is retrieved from the database
+    Then startTime is "2020:05:21 12:00:00.000"
+    And tau0Seconds is "0.05"
+    And dataSeries is a list of "3" elements
+    And timeStamps is a list of "3" elements
+    And we can retrieve the timestamps as "0, 50, 100" in units "ms"
+    And we can retrieve the readings as "2.1, 2.2, 2.3" in units "mW"
+
+    @fixture.timeSeriesAPI
+    Scenario Outline: Retrieve part of a time series or a min/max envelope
+    Given the storage format is "<format>"
+    And dataSeries list "1.0, 5.0, 2.0, 6.0, 3.0, 7.0, 4.0" 
+    And timestamp list "2020-05-28 14:15:00, 2020-05-28 14:15:01, 2020-05-28 14:15:02, 2020-05-28 14:15:03, 2020-05-28 14:15:04, 2020-05-28 14:15:05, 2020-05-28 14:15:06"
+    And the units are "mW"
+    When the data is inserted
+    And the time series is retrieved from the database with first "2" and last "5"
+    Then we can retrieve the readings as "2.0, 6.0, 3.0" in units "mW"
+    And dataSeries is a list of "3" elements
+    When the time series is retrieved from the database between "2020-05-28 14:15:04" and "2020-05-28 14:15:10"
+    Then we can retrieve the readings as "3.0, 7.0, 4.0" in units "mW"
+    And dataSeries is a list of "3" elements
+    When the time series is retrieved from the database decimated to "3" groups
+    Then we can retrieve the readings as "1.0, 5.0, 2.0, 6.0, 3.0, 7.0" in units "mW"
+    And timeStamps is a list of "6" elements
+
+    Examples: Storage formats
+    | format |
+    | rows   |
+    | blobs  |
+
+    @fixture.timeSeriesAPI
+    Scenario: Temperatures shorter than the data stay aligned across blob chunks
+    Given the storage format is "blobs"
+    And the blob chunk size is "2" points
+    And dataSeries list "1.0, 2.0, 3.0, 4.0, 5.0"
+    And temperatures1 list "20.1, 20.2, 20.3"
+    And timestamp list "2020-05-28 14:15:00, 2020-05-28 14:15:01, 2020-05-28 14:15:02, 2020-05-28 14:15:03, 2020-05-28 14:15:04"
+    And the units are "W"
+    When the data is inserted
+    And the time series is retrieved from the database
+    Then temperatures1 is "20.1, 20.2, 20.3, nan, nan"
+    When the time series is retrieved from the database with first "1" and last "4"
+    Then we can retrieve the readings as "2.0, 3.0, 4.0" in units "W"
+    And temperatures1 is "20.2, 20.3, nan"
+
+    @fixture.timeSeriesAPI
+    Scenario: Insert a time series with the streaming writer
+    Given a sequence of readings "4.02, 4.04, 4.03, 4.10, 3.99, 4.03, 4.05" and tau0 of "0.05"
+    And the units are "mW"
+    When the streaming writer runs with a buffer of "3" readings
+    And the time series is retrieved from the database
+    Then startTime is close to now
+    And tau0Seconds is "0.05"
+    And dataSeries is a list of "7" elements
+    And the data has timeStamps starting now with steps of "0.05"
+    And we can retrieve the readings as "4.02, 4.04, 4.03, 4.10, 3.99, 4.03, 4.05" in units "mW"
+
+    @fixture.timeSeriesAPI
+    Scenario: The streaming writer keeps readings pending while the database rejects them
+    Given a sequence of readings "1.0" and tau0 of "0.05"
+    And the units are "W"
+    When a streaming writer is started with a buffer of "4" flushing every "2" readings or "60" seconds
+    And the readings "1.0, 2.0" are streamed
+    Then the writer has written "2" and has "0" readings pending
+    When the database rejects writes
+    And the readings "3.0, 4.0, 5.0" are streamed
+    Then the writer has written "2" and has "3" readings pending
+    When the readings "6.0" are streamed
+    Then the writer has written "2" and has "4" readings pending
+    And streaming the reading "7.0" raises an error without overwriting pending readings
+    When the database accepts writes again
+    And the streaming writer is closed
+    And the time series is retrieved from the database
+    Then we can retrieve the readings as "1.0, 2.0, 3.0, 4.0, 5.0, 6.0" in units "W"
+    And dataSeries is a list of "6" elements
+
+    @fixture.timeSeriesAPI
+    Scenario: The streaming writer stores NaN for readings without temperatures once any have them
+    Given a sequence of readings "1.0" and tau0 of "0.05"
+    And the units are "W"
+    When a streaming writer is started with a buffer of "4" flushing every "2" readings or "60" seconds
+    And readings are streamed
+      | reading | temperature1 |
+      | 1.0     |              |
+      | 2.0     |              |
+      | 3.0     | 20.5         |
+      | 4.0     |              |
+      | 5.0     | 21.0         |
+    And the streaming writer is closed
+    And the time series is retrieved from the database
+    Then dataSeries is a list of "5" elements
+    And temperatures1 is "nan, nan, 20.5, nan, 21.0"
+
+    @fixture.timeSeriesAPI
+    Scenario: The streaming writer flushes when flushSeconds have passed
+    Given a sequence of readings "1.0" and tau0 of "0.05"
+    When a streaming writer is started with a buffer of "100" flushing every "100" readings or "0.2" seconds
+    And the readings "1.0, 2.0" are streamed
+    Then the writer has written "0" and has "2" readings pending
+    When "0.25" seconds pass
+    And the readings "3.0" are streamed
+    Then the writer has written "3" and has "0" readings pending
+
+    @fixture.timeSeriesAPI
+    Scenario: Retrieve several time series together
+    Given dataSeries list "6.0, 6.1, 5.9" 
+    And timestamp list "2020-05-28 14:15:00, 2020-05-28 14:15:01, 2020-05-28 14:15:02"
+    And the units are "mW"
+    When the data is inserted
+    And the time series is retrieved together with a missing timeSeriesId
+    Then the retrieved list has "2" time series and one missing
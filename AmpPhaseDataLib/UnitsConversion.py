@@ -0,0 +1,120 @@
+'''
+Table-driven units conversion for TimeSeries.getDataSeries()
+
+The supported conversions form a graph whose edges are listed in CONVERSIONS.
+A conversion between any two connected Units is found by breadth-first search,
+then consecutive linear steps are folded together, along with any scale and offset,
+so that each array pass does as much work as possible.
+'''
+from AmpPhaseDataLib.Constants import Units
+from collections import deque
+from functools import lru_cache
+from typing import Optional, Tuple
+import numpy as np
+
+# kinds of conversion step:
+LINEAR = 'linear'       # y * factor
+TO_DB = 'toDb'          # 10 * log10(y)
+FROM_DB = 'fromDb'      # pow(10, y / 10)
+
+# placeholder factor, replaced by 1 / gainRef when the conversion is applied:
+GAIN_REF = 'gainRef'
+
+# edges of the conversion graph {(fromUnits, toUnits) : (kind, factor)}:
+CONVERSIONS = {
+    (Units.WATTS, Units.MW)         : (LINEAR, 1000),
+    (Units.MW, Units.WATTS)         : (LINEAR, 1 / 1000),
+    (Units.MW, Units.DBM)           : (TO_DB, None),
+    (Units.DBM, Units.MW)           : (FROM_DB, None),
+    (Units.VOLTS, Units.MV)         : (LINEAR, 1000),
+    (Units.MV, Units.VOLTS)         : (LINEAR, 1 / 1000),
+    (Units.VOLTS, Units.DELTA_GAIN) : (LINEAR, GAIN_REF)
+}
+
+@lru_cache(maxsize = None)
+def findConversion(fromUnits: Units, toUnits: Units, haveGainRef: bool = False) -> Optional[Tuple]:
+    '''
+    Find the shortest chain of steps from fromUnits to toUnits
+    :param fromUnits: Units of the source data
+    :param toUnits:   Units required
+    :param haveGainRef: if False, edges needing a gainRef are not used
+    :return tuple of (kind, factor) steps, empty if fromUnits == toUnits, or None if there is no path
+    '''
+    if fromUnits == toUnits:
+        return ()
+    # breadth-first search, remembering the steps taken to reach each node:
+    paths = {fromUnits : ()}
+    queue = deque([fromUnits])
+    while queue:
+        node = queue.popleft()
+        for (src, dst), step in CONVERSIONS.items():
+            if src != node or dst in paths:
+                continue
+            if step[1] == GAIN_REF and not haveGainRef:
+                continue
+            paths[dst] = paths[node] + (step, )
+            if dst == toUnits:
+                return paths[dst]
+            queue.append(dst)
+    return None
+
+def convertUnits(dataSeries,
+        fromUnits: Units,
+        toUnits: Units,
+        scale: Optional[float] = None,
+        offset: Optional[float] = None,
+        gainRef: Optional[float] = None) -> np.ndarray:
+    '''
+    Convert dataSeries from fromUnits to toUnits, applying y * scale + offset first if scale is given
+    :param dataSeries: list or numpy array of float
+    :param fromUnits:  Units of dataSeries
+    :param toUnits:    Units required
+    :param scale:      optional scale factor applied before conversion
+    :param offset:     optional offset applied with scale
+    :param gainRef:    reference level for conversion to DELTA_GAIN
+    :return new numpy array of float64
+    :raise TypeError if unsupported conversion requested
+    '''
+    steps = findConversion(fromUnits, toUnits, gainRef is not None)
+    if steps is None:
+        raise TypeError('Unsupported units conversion from {} to {}'.format(fromUnits.value, toUnits.value))
+
+    src = np.asarray(dataSeries, dtype = np.float64)
+    out = None
+
+    # pending affine transform y * a + b, folded together until a non-linear step needs the values:
+    a = 1.0
+    b = 0.0
+    if scale is not None:
+        a = scale
+        b = offset if offset is not None else 0.0
+
+    def applyAffine():
+        # the first pass allocates the output array; later passes work in place:
+        nonlocal out
+        if out is None:
+            out = np.multiply(src, a)
+        elif a != 1.0:
+            np.multiply(out, a, out = out)
+        if b != 0.0:
+            np.add(out, b, out = out)
+
+    for kind, factor in steps:
+        if kind == LINEAR:
+            if factor == GAIN_REF:
+                factor = 1 / gainRef
+            a *= factor
+            b *= factor
+        elif kind == TO_DB:
+            applyAffine()
+            np.log10(out, out = out)
+            a, b = 10.0, 0.0
+        elif kind == FROM_DB:
+            a /= 10
+            b /= 10
+            applyAffine()
+            np.power(10.0, out, out = out)
+            a, b = 1.0, 0.0
+
+    applyAffine()
+    return out
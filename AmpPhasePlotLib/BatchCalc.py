@@ -0,0 +1,181 @@
+'''
+Calculate many TimeSeries for an ensemble plot, in parallel worker processes.
+Each worker loads, converts, and calculates one series at a time and hands the result arrays
+back to the parent through shared memory.  Results are returned in the order requested.
+'''
+from AmpPhaseDataLib.TimeSeriesAPI import TimeSeriesAPI
+from AmpPhaseDataLib.TimeSeries import TimeSeries
+from AmpPhaseDataLib.Constants import DataSource, PlotEl, PlotKind, Units
+from Calculate.CalcResult import CalcResult
+from AmpPhasePlotLib import SeriesCalc
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory, resource_tracker
+from typing import Dict, List, Optional, Tuple, Union
+import numpy as np
+import configparser
+import os
+
+class BatchCalc(object):
+    '''
+    Fans out the per-series work of PlotAPI ensemble plots to a pool of processes.
+    With fewer than minParallel series to load, or maxWorkers of 1, everything is done in this process.
+    The pool is started when first needed and kept for later calls until close().
+    '''
+    # arrays of CalcResult passed through shared memory:
+    ARRAYS = ('x', 'y', 'yError', 'N')
+    # other attributes of CalcResult, passed by pickling:
+    SCALARS = ('tau0Seconds', 'xUnits', 'yUnits', 'binSize')
+
+    def __init__(self, tsAPI: Optional[TimeSeriesAPI] = None, maxWorkers: Optional[int] = None, minParallel: Optional[int] = None):
+        '''
+        Constructor
+        :param tsAPI: for loading and caching in this process.  Created if not given.
+        :param maxWorkers: number of worker processes.  Default from the [BatchCalc] section of AmpPhaseDataLib.ini, else the number of CPUs.
+        :param minParallel: fewest series to load for which to use the workers.  Default from AmpPhaseDataLib.ini, else 4.
+        '''
+        config = configparser.ConfigParser()
+        config.read("AmpPhaseDataLib.ini")
+        if maxWorkers is None:
+            maxWorkers = config.getint('BatchCalc', 'maxWorkers', fallback = 0)
+        if minParallel is None:
+            minParallel = config.getint('BatchCalc', 'minParallel', fallback = 4)
+        self.tsAPI = tsAPI if tsAPI is not None else TimeSeriesAPI()
+        self.maxWorkers = maxWorkers if maxWorkers > 0 else (os.cpu_count() or 1)
+        self.minParallel = max(minParallel, 1)
+        self.pool = None
+
+    def close(self):
+        '''
+        Stop the worker processes, if started.
+        '''
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+
+    def calculateMany(self,
+            timeSeries: List[Union[TimeSeries, int]],
+            plotKind: PlotKind,
+            dataSources: Dict[DataSource, str],
+            plotElements: Dict[PlotEl, str],
+            specRanges: Optional[List[Tuple[float, float]]] = None,
+            yUnits = Units.DEG) -> List[Tuple[Optional[TimeSeries], Optional[CalcResult]]]:
+        '''
+        Calculate each of a list of TimeSeries as SeriesCalc.calculate() does
+        :param timeSeries: list of TimeSeries or IDs to load.  Only IDs are sent to the workers.
+        :param plotKind: POWER_STABILITY, VOLT_STABILITY, PHASE_STABILITY, AMP_SPECTRUM or POWER_SPECTRUM
+        :param dataSources: dict of {DataSource : str} applied to all of the series
+        :param plotElements: dict of {PlotEl : str}
+        :param specRanges: for amplitude stability, see SeriesCalc.calcAmplitudeStability()
+        :param yUnits: for phase stability, see SeriesCalc.calcPhaseStability()
+        :return list of (timeSeries, result) in the order given.
+                For IDs calculated by a worker, timeSeries has the header but no data.
+                timeSeries is None if not found, result is None if the calculation failed.
+        '''
+        ids = [item for item in timeSeries if isinstance(item, int)]
+        if len(ids) >= self.minParallel and self.maxWorkers > 1:
+            tasks = [(tsId, plotKind, dataSources, plotElements, specRanges, yUnits) for tsId in ids]
+            calculated = iter(self.__getPool().map(calculateInWorker, tasks))
+            unpack = fromSharedMemory
+        else:
+            # serial fallback, loading all the IDs together:
+            calculated = iter(self.tsAPI.retrieveTimeSeriesMany(ids, arrayMode = True))
+            unpack = None
+
+        results = []
+        for item in timeSeries:
+            if isinstance(item, int):
+                item = next(calculated)
+                if unpack is not None:
+                    results.append(unpack(item) if item is not None else (None, None))
+                    continue
+            if item is None:
+                results.append((None, None))
+            else:
+                results.append((item, SeriesCalc.calculate(plotKind, item, dataSources, plotElements, specRanges, yUnits,
+                                                           tsAPI = self.tsAPI)))
+        return results
+
+    def __getPool(self):
+        '''
+        Private helper to start the workers when first needed
+        '''
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(max_workers = self.maxWorkers, initializer = initWorker)
+        return self.pool
+
+# TimeSeriesAPI opened by each worker process:
+workerAPI = None
+
+def initWorker():
+    '''
+    Open a database connection for this worker process
+    '''
+    global workerAPI
+    workerAPI = TimeSeriesAPI()
+
+def calculateInWorker(task):
+    '''
+    Load, convert, and calculate one TimeSeries in a worker process
+    :param task: tuple of (timeSeriesId, plotKind, dataSources, plotElements, specRanges, yUnits)
+    :return packed result for fromSharedMemory(), or None if not found
+    '''
+    timeSeriesId, plotKind, dataSources, plotElements, specRanges, yUnits = task
+    timeSeries = workerAPI.retrieveTimeSeries(timeSeriesId, arrayMode = True)
+    if timeSeries is None:
+        return None
+    header = (timeSeries.tsId, timeSeries.startTime, timeSeries.tau0Seconds, timeSeries.dataUnits)
+    try:
+        result = SeriesCalc.calculate(plotKind, timeSeries, dataSources, plotElements, specRanges, yUnits, tsAPI = workerAPI)
+    except Exception as e:
+        print("BatchCalc: timeSeriesId {}: {}".format(timeSeriesId, e))
+        result = None
+    return (header, toSharedMemory(result) if result is not None else None)
+
+def toSharedMemory(result: CalcResult):
+    '''
+    Copy the arrays of a CalcResult to a new shared memory block, to be unlinked by fromSharedMemory()
+    :return (name, layout, scalars): layout is a list of (array name, dtype str, length, offset)
+    '''
+    arrays = [(name, np.ascontiguousarray(getattr(result, name))) for name in BatchCalc.ARRAYS if getattr(result, name) is not None]
+    block = shared_memory.SharedMemory(create = True, size = max(sum(array.nbytes for _, array in arrays), 1))
+    layout = []
+    offset = 0
+    for name, array in arrays:
+        target = np.ndarray(array.shape, dtype = array.dtype, buffer = block.buf, offset = offset)
+        target[:] = array
+        del target
+        layout.append((name, array.dtype.str, len(array), offset))
+        offset += array.nbytes
+    scalars = {name : getattr(result, name) for name in BatchCalc.SCALARS}
+    name = block.name
+    if os.name == 'posix':
+        # the block must outlive this process's handle, so leave unlinking to the parent:
+        resource_tracker.unregister(block._name, 'shared_memory')
+        block.close()
+        return (name, layout, scalars)
+    # elsewhere a block is freed with its last handle, so return the arrays by pickling instead:
+    packed = (None, [(n, dtype, np.frombuffer(block.buf, dtype = dtype, count = length, offset = off).copy()) for n, dtype, length, off in layout], scalars)
+    block.close()
+    block.unlink()
+    return packed
+
+def fromSharedMemory(packed) -> Tuple[TimeSeries, Optional[CalcResult]]:
+    '''
+    Unpack the return value of calculateInWorker(), copying out of and unlinking its shared memory
+    :return (timeSeries header without data, CalcResult or None)
+    '''
+    header, packedResult = packed
+    timeSeries = TimeSeries(tsId = header[0], arrayMode = True, startTime = header[1], tau0Seconds = header[2], dataUnits = header[3])
+    if packedResult is None:
+        return (timeSeries, None)
+    name, layout, scalars = packedResult
+    if name is None:
+        arrays = {n : array for n, dtype, array in layout}
+    else:
+        block = shared_memory.SharedMemory(name = name)
+        try:
+            arrays = {n : np.frombuffer(block.buf, dtype = dtype, count = length, offset = off).copy() for n, dtype, length, off in layout}
+        finally:
+            block.close()
+            block.unlink()
+    return (timeSeries, CalcResult(arrays['x'], arrays['y'], arrays.get('yError', None), arrays.get('N', None), **scalars))
@@ -0,0 +1,137 @@
+'''
+ComplianceAPI for checking TimeSeries against spec lines without making plots.
+'''
+from AmpPhaseDataLib.TimeSeriesAPI import TimeSeriesAPI
+from AmpPhaseDataLib.TimeSeries import TimeSeries
+from AmpPhaseDataLib.Constants import DataSource, PlotEl, PlotKind
+from Calculate.FFT import FFT
+from Calculate.SpecCompliance import SpecLine, checkCompliance
+from AmpPhasePlotLib import SeriesCalc
+from typing import Dict, List, Optional, Union
+
+class SeriesCompliance(object):
+    '''
+    The outcome of checking one TimeSeries.
+    complies is True/False, or None if the calculation failed or there was nothing to check.
+    checks is a list of SpecCheck, one per spec line.
+    rms and rmsSpec are set for spectra when an RMS_SPEC was given.
+    '''
+    __slots__ = ('timeSeriesId', 'plotKind', 'result', 'complies', 'checks', 'rms', 'rmsSpec')
+
+    def __init__(self, timeSeriesId, plotKind, result = None, complies = None, checks = None, rms = None, rmsSpec = None):
+        '''
+        Constructor
+        '''
+        self.timeSeriesId = timeSeriesId
+        self.plotKind = plotKind
+        self.result = result
+        self.complies = complies
+        self.checks = checks if checks is not None else []
+        self.rms = rms
+        self.rmsSpec = rmsSpec
+
+class ComplianceAPI(object):
+    '''
+    Evaluate TimeSeries against spec lines, calculating as the corresponding PlotAPI method does but without rendering.
+    '''
+    def __init__(self):
+        '''
+        Constructor
+        '''
+        self.tsAPI = TimeSeriesAPI()
+
+    def evaluate(self,
+            timeSeries: Union[TimeSeries, int],
+            plotKind: PlotKind,
+            dataSources: Dict[DataSource, str] = None,
+            plotElements: Dict[PlotEl, str] = None,
+            specLines: Optional[List[Union[SpecLine, str]]] = None) -> Optional[SeriesCompliance]:
+        '''
+        Evaluate a single TimeSeries
+        :param timeSeries: the TimeSeries to check *or* its ID to load via TimeSeriesAPI.
+        :param plotKind: POWER_STABILITY, VOLT_STABILITY, PHASE_STABILITY, AMP_SPECTRUM or POWER_SPECTRUM
+        :param dataSources: dict of {DataSource : str}.  If None, loaded via TimeSeriesAPI.
+        :param plotElements: dict of {PlotEl : str} as would be passed to PlotAPI
+        :param specLines: list of SpecLine or str "x1, y1, x2, y2..." to check.  Default is SPEC_LINE1 and SPEC_LINE2 from plotElements.
+        :return SeriesCompliance or None if the TimeSeries was not found
+        '''
+        if isinstance(timeSeries, int):
+            timeSeries = self.tsAPI.retrieveTimeSeries(timeSeries, arrayMode = True)
+        if timeSeries is None:
+            return None
+        if dataSources is None:
+            dataSources = self.tsAPI.getAllDataSource(timeSeries.tsId) if timeSeries.tsId > 0 else {}
+        return self.__evaluate(timeSeries, plotKind, dataSources, plotElements, specLines)
+
+    def evaluateMany(self,
+            timeSeriesIds: List[int],
+            plotKind: PlotKind,
+            plotElements: Dict[PlotEl, str] = None,
+            specLines: Optional[List[Union[SpecLine, str]]] = None,
+            batchSize: int = 64) -> Dict[int, Optional[SeriesCompliance]]:
+        '''
+        Evaluate many TimeSeries with the same plotElements and spec lines.
+        They are loaded batchSize at a time, so memory use does not depend on how many are requested.
+        :param timeSeriesIds: list of int
+        :param plotKind: as for evaluate()
+        :param plotElements: as for evaluate()
+        :param specLines: as for evaluate()
+        :param batchSize: number of TimeSeries to load per group of database queries
+        :return dict of {timeSeriesId : SeriesCompliance or None if not found}, in the order of timeSeriesIds
+        '''
+        results = {}
+        batchSize = max(int(batchSize), 1)
+        for first in range(0, len(timeSeriesIds), batchSize):
+            ids = timeSeriesIds[first : first + batchSize]
+            allDataSources = self.tsAPI.getAllDataSourceMany(ids)
+            for timeSeriesId, timeSeries in zip(ids, self.tsAPI.retrieveTimeSeriesMany(ids, arrayMode = True)):
+                if timeSeries is None:
+                    results[timeSeriesId] = None
+                else:
+                    results[timeSeriesId] = self.__evaluate(timeSeries, plotKind, allDataSources.get(timeSeriesId, {}),
+                                                            plotElements, specLines)
+        return results
+
+    def __evaluate(self, timeSeries, plotKind, dataSources, plotElements, specLines) -> SeriesCompliance:
+        '''
+        Private implementation of evaluate() for a loaded TimeSeries
+        '''
+        if plotElements is None:
+            plotElements = {}
+        if specLines is None:
+            specLines = SeriesCalc.parseSpecLines(plotElements)
+        else:
+            specLines = [SpecLine.fromStr(s) if isinstance(s, str) else s for s in specLines]
+
+        compliance = SeriesCompliance(timeSeries.tsId, plotKind)
+        # always calculate amplitude stability at every interval the spec lines cover, whatever tau grid is requested:
+        specRanges = [(specLine.xMin, specLine.xMax) for specLine in specLines]
+        calc = FFT() if plotKind in SeriesCalc.SPECTRUM_KINDS else None
+        compliance.result = SeriesCalc.calculate(plotKind, timeSeries, dataSources, plotElements, specRanges,
+                                                 calc = calc, tsAPI = self.tsAPI)
+        if compliance.result is not None and calc is not None:
+            self.__checkRMS(calc, compliance, plotElements)
+
+        if compliance.result is None:
+            return compliance
+
+        complies, compliance.checks = checkCompliance(compliance.result, specLines)
+        if compliance.rms is not None:
+            rmsComplies = compliance.rms <= compliance.rmsSpec
+            complies = rmsComplies if complies is None else complies and rmsComplies
+        compliance.complies = complies
+        return compliance
+
+    def __checkRMS(self, calc: FFT, compliance: SeriesCompliance, plotElements):
+        '''
+        Private helper to calculate the RMS for an RMS_SPEC, as PlotAPI.plotSpectrum does
+        '''
+        rmsSpec = plotElements.get(PlotEl.RMS_SPEC, None)
+        if not rmsSpec:
+            return
+        rmsSpec = rmsSpec.split(',')
+        ignoreHarmonicsOf, ignoreHarmonicsWindow = SeriesCalc.readFFTConfig()
+        compliance.rms = calc.RMSfromFFT(float(rmsSpec[0]), float(rmsSpec[1]),
+                                         ignoreHarmonicsOf = ignoreHarmonicsOf,
+                                         ignoreHarmonicsWindow = ignoreHarmonicsWindow)
+        compliance.rmsSpec = float(rmsSpec[2])
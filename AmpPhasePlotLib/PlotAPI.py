@@ -3,15 +3,20 @@ PlotAPI for calling applications to generate plots.
 '''
 from AmpPhaseDataLib.TimeSeriesAPI import TimeSeriesAPI
 from AmpPhaseDataLib.TimeSeries import TimeSeries
-from AmpPhaseDataLib.Constants import DataKind, DataSource, DataStatus, PlotEl, SpecLines, Units
+from AmpPhaseDataLib.Constants import DataKind, DataSource, DataStatus, PlotEl, PlotKind, Units
 from Calculate.AmplitudeStability import AmplitudeStability
 from Calculate.PhaseStability import PhaseStability
 from Calculate.FFT import FFT
+from Calculate.CalcResult import CalcResult
+from Calculate.SpecCompliance import SpecLine, checkSpecLine
 from Plot.Plotly.PlotTimeSeries import PlotTimeSeries
 from Plot.Plotly.PlotStability import PlotStability
 from Plot.Plotly.PlotSpectrum import PlotSpectrum
+from Plot.Plotly.Renderer import getRenderer
+from Plot.Plotly.ImageCache import getImageCache
+from AmpPhasePlotLib import SeriesCalc
+from AmpPhasePlotLib.BatchCalc import BatchCalc
 from datetime import datetime
-import configparser
 from typing import Dict, List, Optional, Union
 
 class PlotAPI(object):
@@ -24,6 +29,9 @@ class PlotAPI(object):
         Constructor
         '''
         self.tsAPI = TimeSeriesAPI()
+        self.batchCalc = BatchCalc(self.tsAPI)
+        self.renderer = getRenderer()
+        self.imageCache = getImageCache()
         self.__reset()
 
     def __reset(self):
@@ -94,7 +102,7 @@ class PlotAPI(object):
         Create an AMP_SPECTRUM or POWER_SPECTRUM plot
         The resulting image binary data (.png) is stored in self.imageData.
         The applied plotElements are stored in self.plotElementsFinal.
-        The resulting traces ([x], [y], [yError], name) are stored in self.traces 
+        The resulting traces ([x], [y], [yError], name) are stored in self.traces, reduced if FFT_BINNING is given.
         If any spec lines were provided, self.dataStatusFinal will be updated to MEET_SPEC or FAIL_SPEC.
         :param timeSeries: the TimeSeries to plot *or* its ID to load via TimeSeriesAPI.
         :param plotElements: to supplement or replace any defaults or loaded via TimeSeriesAPI
@@ -118,39 +126,14 @@ class PlotAPI(object):
             dataSources = {}
 
         # read FFT_RMS configuration:
-        config = configparser.ConfigParser()
-        config.read("AmpPhaseDataLib.ini")
-        try:
-            ignoreHarmonicsOf = int(config['FFT_RMS']['ignoreHarmonicsOf'])
-        except:
-            ignoreHarmonicsOf = 0
-        try:
-            ignoreHarmonicsWindow = float(config['FFT_RMS']['ignoreHarmonicsWindow'])
-        except:
-            ignoreHarmonicsWindow = 3.0
+        ignoreHarmonicsOf, ignoreHarmonicsWindow = SeriesCalc.readFFTConfig()
         
         # clear anything kept from last plot:
         self.__reset()
 
-        # Get the DataSource tags:
+        # Get the DataSource tags and set the default title:
         srcKind = DataKind.fromStr(dataSources.get(DataSource.DATA_KIND, (DataKind.AMPLITUDE).value))
-        currentUnits = timeSeries.dataUnits
-        
-        # Get the time series and set the default title:
-        if srcKind == DataKind.POWER:
-            dfltTitle = "Power Spectral Density"
-            requiredUnits = currentUnits    # could be W or V
-        elif srcKind == DataKind.PHASE:
-            dfltTitle = "Phase Spectral Density"
-            requiredUnits = Units.DEG
-        elif srcKind == DataKind.VOLTAGE:
-            dfltTitle = "Voltage Spectral Density"
-            requiredUnits = Units.VOLTS
-        else:
-            dfltTitle = "Amplitude Spectral Density"
-            requiredUnits = currentUnits
-
-        dataSeries = timeSeries.getDataSeries(requiredUnits)  
+        dfltTitle, requiredUnits = SeriesCalc.spectrumUnits(srcKind, timeSeries.dataUnits)
     
         # set the plot title.  Priority is: PlotEl.TITLE, DATA_SOURCE, dfltTitle
         dataSource = dataSources.get(DataSource.DATA_SOURCE, False)                     
@@ -160,19 +143,16 @@ class PlotAPI(object):
         # make the plot:
         self.calc = FFT()
         self.plotter = PlotSpectrum()
-            
-        if not self.calc.calculate(dataSeries, timeSeries.tau0Seconds):
+
+        if not SeriesCalc.calcSpectrum(timeSeries, dataSources, plotElements, self.calc, self.tsAPI):
             print("Invalid dataSeries or sampling interval for FFT.")
             return False
 
         # calculate highlight points:
-        x2Array = []
-        y2Array = []
+        x2Array = None
+        y2Array = None
         if ignoreHarmonicsOf:
-            for x, y in zip(self.calc.xResult, self.calc.yResult):
-                if self.calc.isHarmonic(x, ignoreHarmonicsOf, ignoreHarmonicsWindow):
-                    x2Array.append(x)
-                    y2Array.append(y)
+            x2Array, y2Array = self.calc.getHarmonics(ignoreHarmonicsOf, ignoreHarmonicsWindow)
 
         # check for a special RMS spec:
         rmsSpec = plotElements.get(PlotEl.RMS_SPEC, None)
@@ -210,20 +190,15 @@ class PlotAPI(object):
                 compliance += " (ignoring harmonics of {} Hz)".format(ignoreHarmonicsOf)
             plotElements[PlotEl.SPEC_COMPLIANCE] = compliance
             
-        # check whether there is a spec line to compare to the FFT:
+        # check whether there is a spec line to compare to the FFT, "fMin, fMax, specLimit" or "x1, y1, x2, y2":
         fftSpec = plotElements.get(PlotEl.SPEC_LINE1, None)
         if fftSpec:
-            fftSpec = fftSpec.split(',')
-            bwLower = float(fftSpec[0])
-            bwUpper = float(fftSpec[1])
-            specLimit = float(fftSpec[2])  # for now assuming that y2==y1
-            # compare to spec line:
-            if self.calc.checkFFTSpec(bwLower, bwUpper, specLimit):
-                self.__updateDataStatusFinal(True)
-            else:
-                self.__updateDataStatusFinal(True)
+            self.__updateDataStatusFinal(checkSpecLine(self.calc.result, SpecLine.fromStr(fftSpec)).complies)
+
+        # reduce the points to plot, if requested:
+        xArray, yArray = SeriesCalc.binSpectrum(self.calc, plotElements, ignoreHarmonicsOf, ignoreHarmonicsWindow)
 
-        if not self.plotter.plot(timeSeriesId, self.calc.xResult, self.calc.yResult, x2Array, y2Array, 
+        if not self.plotter.plot(timeSeries, dataSources, xArray, yArray, x2Array, y2Array, 
                                  plotElements = plotElements, outputName = outputName, show = show):
             return False
 
@@ -251,8 +226,7 @@ class PlotAPI(object):
         :param show: if True, displays the plot using the default renderer.
         :return True if succesful, False otherwise
         '''
-        # get the TimeSeries data:
-        timeSeriesList = self.__getTimeSeriesList(timeSeries)
+        timeSeriesList = self.__toList(timeSeries)
         if not timeSeriesList:
             return False
     
@@ -277,20 +251,25 @@ class PlotAPI(object):
             specLine = specLine.split(',')
             self.specLines.append((float(specLine[0]), float(specLine[1]), float(specLine[2]), float(specLine[3])))
         
+        # load dataSources:
+        if dataSources is None:
+            dataSources = self.__getDataSources(timeSeriesList[0])
+
+        # calculate all the traces, in worker processes if there are enough.
+        # always calculate every interval within the spec lines, whatever tau grid is requested:
+        specRanges = [(specLine[0], specLine[2]) for specLine in self.specLines]
+        calculated = self.batchCalc.calculateMany(timeSeriesList, PlotKind.POWER_STABILITY, dataSources, plotElements, specRanges)
+
         # suppress error bars for ensemble plot
         plotElements[PlotEl.ERROR_BARS] = "0" if len(timeSeriesList) > 1 else "1"
         startTime = datetime.now()
         self.plotter.startPlot(plotElements)
-        for timeSeries in timeSeriesList:            
-            # load dataSources:
-            if dataSources is None:
-                if timeSeries.tsId > 0:
-                    dataSources = self.tsAPI.getAllDataSource(timeSeries.tsId)
-                else:
-                    dataSources = {}
+        for timeSeries, result in calculated:
+            if timeSeries is None:
+                continue
             if timeSeries.startTime < startTime:
                 startTime = timeSeries.startTime
-            self.__plotAmplitudeStabilitySingle(timeSeries, dataSources, plotElements)
+            self.__addStabilityTrace(timeSeries, dataSources, result, plotElements, plotElements.get(PlotEl.TAU_GRID, None))
 
         # set a generic title:
         if not plotElements.get(PlotEl.TITLE, None):
@@ -305,71 +284,39 @@ class PlotAPI(object):
         else:
             return False
         
-    def __plotAmplitudeStabilitySingle(self, 
+    def __addStabilityTrace(self, 
             timeSeries: TimeSeries,
             dataSources: Dict[DataSource, str],
-            plotElements: Dict[PlotEl, str] = None) -> bool:
+            result: Optional[CalcResult],
+            plotElements: Dict[PlotEl, str],
+            tauGrid: Optional[str] = None) -> bool:
         '''
-        :param timeSeries:
+        Private helper to check a calculated stability result against the spec lines and add its trace
+        :param timeSeries: the result was calculated from
+        :param dataSources:
+        :param result: from self.calc or BatchCalc, or None if the calculation failed
         :param plotElements:
+        :param tauGrid: for amplitude stability, the TAU_GRID to plot.  The spec lines are checked on the whole result.
         :return True/False
         '''
-        freqLOGHz = self.tsAPI.getDataSource(timeSeries.tsId, DataSource.LO_GHZ)
-        if freqLOGHz:
-            freqLOGHz = float(freqLOGHz)
-                    
-        # calculate Amplitude stability plot traces:
-        xRangePlot = plotElements.get(PlotEl.XRANGE_PLOT, SpecLines.XRANGE_PLOT_AMP_STABILITY).split(',')
-        TMin = float(xRangePlot[0])
-        TMax = float(xRangePlot[1])
-        
-        # Get the DataSource tags:
-        srcKind = dataSources.get(DataSource.DATA_KIND, DataKind.AMPLITUDE.value)
-        currentUnits = timeSeries.dataUnits
-        
-        # Depending on srcKind, get the dataSeries in the proper units:
-        if srcKind == (DataKind.VOLTAGE).value:
-            dataSeries = timeSeries.getDataSeries(Units.VOLTS)
-            normalize = False   # for pure voltage time series: don't normalize, calculate ADEV
-            calcAdev = True     # this would be typical for a bias or power supply where absolute
-                                # deviations from nominal are more of interest than relative level drifts.
-        elif srcKind == (DataKind.GAIN).value:
-            # for IFP gain stability normalized ADEV
-            dataSeries = timeSeries.getDataSeries(currentUnits)
-            normalize = True
-            calcAdev = True
-        else:
-            # for POWER and AMPLITUDE, use the source units, if any:
-            dataSeries = timeSeries.getDataSeries(currentUnits)
-            normalize = True    # for power or unknown amplitude time series, normalize and calculate AVAR.
-            calcAdev = False    # units might still be VOLTS in the case of a crystal detector having 
-                                # square-law output characteristic.
-
-        if not dataSeries:
-            return False
-
-        if not self.calc or not isinstance(self.calc, AmplitudeStability):
-            self.calc = AmplitudeStability()
-        if not self.calc.calculate(dataSeries, timeSeries.tau0Seconds, TMin, TMax, normalize, calcAdev):
+        if result is None:
             return False
+        self.calc.setResult(result)
 
         # check spec lines:
         for specLine in self.specLines:
             complies = self.calc.checkSpecLine(specLine[0], specLine[2], specLine[1], specLine[3])
             self.__updateDataStatusFinal(complies)
 
+        # plot only the requested tau grid:
+        if tauGrid:
+            result = self.calc.selectTauGrid(result, tauGrid)
+
         # add the trace:
-        if self.plotter.addTrace(timeSeries, dataSources, self.calc.xResult, self.calc.yResult, self.calc.yError, plotElements):
-            return timeSeries
-        else:
-            return False
+        return self.plotter.addTrace(timeSeries, dataSources, result.x, result.y, result.yError, plotElements)
     
     def getCalcTrace(self):
-        return {
-            'x': self.calc.xResult,
-            'y': self.calc.yResult,
-            'yError': self.calc.yError
-        }
+        return self.calc.result.toDict()
     
     def plotPhaseStability(self, 
             timeSeries: Union[TimeSeries, int, List[Union[TimeSeries, int]]],
@@ -391,7 +338,7 @@ class PlotAPI(object):
         :param show: if True, displays the plot using the default renderer.
         :return True if succesful, False otherwise
         '''
-        timeSeriesList = self.__getTimeSeriesList(timeSeries)
+        timeSeriesList = self.__toList(timeSeries)
         if not timeSeriesList:
             return False
         
@@ -416,20 +363,28 @@ class PlotAPI(object):
             specLine = specLine.split(',')
             self.specLines.append((float(specLine[0]), float(specLine[1]), float(specLine[2]), float(specLine[3])))
 
+        # load dataSources:
+        if dataSources is None:
+            dataSources = self.__getDataSources(timeSeriesList[0])
+
+        # If we have freqRFGHz then can plot in FS instead of DEG:        
+        freqRFGHz = dataSources.get(DataSource.RF_GHZ, None)
+        if not plotElements.get(PlotEl.YUNITS, None):
+            plotElements[PlotEl.YUNITS] = (Units.FS if freqRFGHz and float(freqRFGHz) > 0 else yUnits).value
+
+        # calculate all the traces, in worker processes if there are enough:
+        calculated = self.batchCalc.calculateMany(timeSeriesList, PlotKind.PHASE_STABILITY, dataSources, plotElements, yUnits = yUnits)
+
         # suppress error bars for ensemble plot
         plotElements[PlotEl.ERROR_BARS] = "0" if len(timeSeriesList) > 1 else "1"
         startTime = datetime.now()
         self.plotter.startPlot(plotElements)
-        for timeSeries in timeSeriesList:
-            # load dataSources:
-            if dataSources is None:
-                if timeSeries.tsId > 0:
-                    dataSources = self.tsAPI.getAllDataSource(timeSeries.tsId)
-                else:
-                    dataSources = {}
+        for timeSeries, result in calculated:
+            if timeSeries is None:
+                continue
             if timeSeries.startTime < startTime:
                 startTime = timeSeries.startTime
-            self.__plotPhaseStabilitySingle(timeSeries, dataSources, plotElements, yUnits)
+            self.__addStabilityTrace(timeSeries, dataSources, result, plotElements)
 
         # set a generic title:
         if not plotElements.get(PlotEl.TITLE, None):
@@ -444,72 +399,23 @@ class PlotAPI(object):
         else:
             return False
     
-    def __plotPhaseStabilitySingle(self, 
-            timeSeries: TimeSeries,
-            dataSources: Dict[DataSource, str] = None,
-            plotElements: Dict[PlotEl, str] = None,
-            yUnits = Units.DEG) -> bool:
-        '''
-        :param timeSeries:
-        :param plotElements:
-        :param yUnits:
-        :return the retrieved TimeSeries object if successful, else None
-        '''
-        # get the raw data:
-        dataSeries = timeSeries.getDataSeries(yUnits)
-        
-        # If we have freqRFGHz then can plot in FS instead of DEG:        
-        freqRFGHz = dataSources.get(DataSource.RF_GHZ, None)
-        if freqRFGHz:
-            freqRFGHz = float(freqRFGHz)
-            if freqRFGHz > 0:
-                yUnits = Units.FS
-
-        # set YUNITS on the first trace:
-        if not plotElements.get(PlotEl.YUNITS, None):
-            plotElements[PlotEl.YUNITS] = yUnits.value
-        
-        # calculate Amplitude stability plot traces:
-        xRangePlot = plotElements.get(PlotEl.XRANGE_PLOT, SpecLines.XRANGE_PLOT_PHASE_STABILITY).split(',')
-        TMin = float(xRangePlot[0])
-        TMax = float(xRangePlot[1])
-        
-        if not self.calc.calculate(dataSeries, timeSeries.tau0Seconds, TMin, TMax, freqRFGHz):
-            return None
-
-        # check spec lines:
-        for specLine in self.specLines:
-            complies = self.calc.checkSpecLine(specLine[0], specLine[2], specLine[1], specLine[3])
-            self.__updateDataStatusFinal(complies)
-
-        # add the trace:
-        if self.plotter.addTrace(timeSeries, dataSources, self.calc.xResult, self.calc.yResult, self.calc.yError, plotElements):
-            return timeSeries
-        else:
-            return None
-    
     def __getTimeSeries(self, timeSeries: Union[TimeSeries, int]) -> Optional[TimeSeries]:
         if isinstance(timeSeries, int):
-            return self.tsAPI.retrieveTimeSeries(timeSeries)
+            return self.tsAPI.retrieveTimeSeries(timeSeries, arrayMode = True)
         else:
             assert(isinstance(timeSeries, TimeSeries))
             return timeSeries
     
-    def __getTimeSeriesList(self, timeSeries: Union[TimeSeries, int, List[Union[TimeSeries, int]]]) -> List[TimeSeries]:
-        if isinstance(timeSeries, int): 
-            return [self.tsAPI.retrieveTimeSeries(timeSeries)]
-        elif isinstance(timeSeries, TimeSeries):
+    def __toList(self, timeSeries: Union[TimeSeries, int, List[Union[TimeSeries, int]]]) -> List[Union[TimeSeries, int]]:
+        if isinstance(timeSeries, (int, TimeSeries)):
             return [timeSeries]
         else:
             assert(isinstance(timeSeries, list))
-            result = []
-            for item in timeSeries:
-                if isinstance(item, int):
-                    result.append(self.tsAPI.retrieveTimeSeries(item))
-                else:
-                    assert(isinstance(item, TimeSeries))
-                    result.append(item)
-            return result
+            return timeSeries
+
+    def __getDataSources(self, timeSeries: Union[TimeSeries, int]) -> Dict[DataSource, str]:
+        tsId = timeSeries if isinstance(timeSeries, int) else timeSeries.tsId
+        return self.tsAPI.getAllDataSource(tsId) if tsId > 0 else {}
                 
     def __updateDataStatusFinal(self, passFail):
         '''
@@ -0,0 +1,275 @@
+'''
+Calculations on a single TimeSeries as done for each kind of plot, without plotting.
+Shared by PlotAPI and ComplianceAPI so that both choose units and parameters the same way.
+If a TimeSeriesAPI is given, results are cached in its local database, keyed by a hash of the
+data in the units used, the calculator, and its parameters.
+'''
+from AmpPhaseDataLib.TimeSeries import TimeSeries
+from AmpPhaseDataLib.Constants import DataKind, DataSource, PlotEl, PlotKind, SpecLines, Units
+from Calculate.AmplitudeStability import AmplitudeStability
+from Calculate.PhaseStability import PhaseStability
+from Calculate.FFT import FFT
+from Calculate.CalcResult import CalcResult
+from Calculate.SpecCompliance import SpecLine
+from Calculate import SpectrumBinning
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import configparser
+import hashlib
+
+# change to invalidate cached results when a calculation changes:
+CACHE_VERSION = 1
+
+STABILITY_KINDS = (PlotKind.POWER_STABILITY, PlotKind.VOLT_STABILITY)
+SPECTRUM_KINDS = (PlotKind.AMP_SPECTRUM, PlotKind.POWER_SPECTRUM)
+
+def readFFTConfig():
+    '''
+    Read the FFT_RMS section of AmpPhaseDataLib.ini
+    :return (ignoreHarmonicsOf, ignoreHarmonicsWindow)
+    '''
+    config = configparser.ConfigParser()
+    config.read("AmpPhaseDataLib.ini")
+    try:
+        ignoreHarmonicsOf = int(config['FFT_RMS']['ignoreHarmonicsOf'])
+    except:
+        ignoreHarmonicsOf = 0
+    try:
+        ignoreHarmonicsWindow = float(config['FFT_RMS']['ignoreHarmonicsWindow'])
+    except:
+        ignoreHarmonicsWindow = 3.0
+    return (ignoreHarmonicsOf, ignoreHarmonicsWindow)
+
+def parseSpecLines(plotElements: Dict[PlotEl, str]) -> List[SpecLine]:
+    '''
+    Parse SPEC_LINE1 and SPEC_LINE2, named by SPEC1_NAME and SPEC2_NAME
+    :param plotElements: dict of {PlotEl : str}
+    :return list of SpecLine
+    '''
+    specLines = []
+    for specEl, nameEl in ((PlotEl.SPEC_LINE1, PlotEl.SPEC1_NAME), (PlotEl.SPEC_LINE2, PlotEl.SPEC2_NAME)):
+        spec = plotElements.get(specEl, None)
+        if spec:
+            specLines.append(SpecLine.fromStr(spec, name = plotElements.get(nameEl, None)))
+    return specLines
+
+def getXRange(plotElements: Dict[PlotEl, str], default: str):
+    '''
+    :return (TMin, TMax) from XRANGE_PLOT or the default
+    '''
+    xRangePlot = plotElements.get(PlotEl.XRANGE_PLOT, default).split(',')
+    return (float(xRangePlot[0]), float(xRangePlot[1]))
+
+def spectrumUnits(srcKind: DataKind, currentUnits: Units):
+    '''
+    :return (dfltTitle, requiredUnits) for a spectrum of the given DATA_KIND
+    '''
+    if srcKind == DataKind.POWER:
+        return ("Power Spectral Density", currentUnits)    # could be W or V
+    elif srcKind == DataKind.PHASE:
+        return ("Phase Spectral Density", Units.DEG)
+    elif srcKind == DataKind.VOLTAGE:
+        return ("Voltage Spectral Density", Units.VOLTS)
+    else:
+        return ("Amplitude Spectral Density", currentUnits)
+
+def makeCacheKey(calcName: str, dataSeries, params: tuple) -> str:
+    '''
+    :param calcName: name of the calculator class
+    :param dataSeries: list or numpy array of float, in the units passed to the calculator
+    :param params: tuple of the other parameters passed to calculate()
+    :return str hash of everything the result depends on
+    '''
+    digest = hashlib.blake2b(digest_size = 20)
+    digest.update("{}:{}:{!r}:".format(CACHE_VERSION, calcName, params).encode())
+    digest.update(np.ascontiguousarray(dataSeries, dtype = np.float64).data)
+    return digest.hexdigest()
+
+def calculateCached(calc, timeSeries: TimeSeries, dataSeries, params: tuple, tsAPI = None) -> Optional[CalcResult]:
+    '''
+    calc.calculate(dataSeries, *params), using a result cached by tsAPI if there is one
+    :param calc: AmplitudeStability, PhaseStability, or FFT
+    :param timeSeries: the dataSeries came from.  If stored, its cached results are discarded when it is modified.
+    :param dataSeries: list or numpy array of float
+    :param params: tuple of the other parameters to calculate()
+    :param tsAPI: TimeSeriesAPI holding the cache, or None to always calculate
+    :return CalcResult or None if failed
+    '''
+    if tsAPI is None:
+        return calc.calculate(dataSeries, *params)
+    cacheKey = makeCacheKey(type(calc).__name__, dataSeries, params)
+    cached = tsAPI.getCalcCache(cacheKey)
+    if cached is not None:
+        result = CalcResult.fromBytes(cached)
+        calc.setResult(result)
+        return result
+    result = calc.calculate(dataSeries, *params)
+    if result is not None:
+        tsAPI.setCalcCache(cacheKey, result.toBytes(), timeSeries.tsId if timeSeries.tsId > 0 else None)
+    return result
+
+def calcAmplitudeStability(timeSeries: TimeSeries,
+        dataSources: Dict[DataSource, str],
+        plotElements: Dict[PlotEl, str],
+        specRanges: Optional[List[Tuple[float, float]]] = None,
+        calc: Optional[AmplitudeStability] = None,
+        tsAPI = None) -> Optional[CalcResult]:
+    '''
+    Calculate amplitude stability as for a POWER_STABILITY or VOLT_STABILITY plot
+    :param timeSeries: to calculate
+    :param dataSources: dict of {DataSource : str} for the timeSeries
+    :param plotElements: dict of {PlotEl : str}.  Uses XRANGE_PLOT and TAU_GRID.
+    :param specRanges: list of (TMin, TMax) in which to calculate every interval whatever the TAU_GRID, such as the spec line x ranges
+    :param calc: AmplitudeStability to use, so that the caller can keep it.
+    :param tsAPI: TimeSeriesAPI to cache the result in, or None
+    :return CalcResult or None if failed
+    '''
+    TMin, TMax = getXRange(plotElements, SpecLines.XRANGE_PLOT_AMP_STABILITY)
+
+    # Get the DataSource tags:
+    srcKind = dataSources.get(DataSource.DATA_KIND, DataKind.AMPLITUDE.value)
+    currentUnits = timeSeries.dataUnits
+
+    # Depending on srcKind, get the dataSeries in the proper units:
+    if srcKind == (DataKind.VOLTAGE).value:
+        dataSeries = timeSeries.getDataSeries(Units.VOLTS)
+        normalize = False   # for pure voltage time series: don't normalize, calculate ADEV
+        calcAdev = True     # this would be typical for a bias or power supply where absolute
+                            # deviations from nominal are more of interest than relative level drifts.
+    elif srcKind == (DataKind.GAIN).value:
+        # for IFP gain stability normalized ADEV
+        dataSeries = timeSeries.getDataSeries(currentUnits)
+        normalize = True
+        calcAdev = True
+    else:
+        # for POWER and AMPLITUDE, use the source units, if any:
+        dataSeries = timeSeries.getDataSeries(currentUnits)
+        normalize = True    # for power or unknown amplitude time series, normalize and calculate AVAR.
+        calcAdev = False    # units might still be VOLTS in the case of a crystal detector having
+                            # square-law output characteristic.
+
+    if not len(dataSeries):
+        return None
+
+    if calc is None:
+        calc = AmplitudeStability()
+    tauGrid = plotElements.get(PlotEl.TAU_GRID, None)
+    specRanges = tuple((float(TMin), float(TMax)) for TMin, TMax in specRanges) if specRanges else None
+    return calculateCached(calc, timeSeries, dataSeries,
+                           (timeSeries.tau0Seconds, TMin, TMax, normalize, calcAdev, tauGrid, specRanges), tsAPI)
+
+def calcPhaseStability(timeSeries: TimeSeries,
+        dataSources: Dict[DataSource, str],
+        plotElements: Dict[PlotEl, str],
+        yUnits = Units.DEG,
+        calc: Optional[PhaseStability] = None,
+        tsAPI = None) -> Optional[CalcResult]:
+    '''
+    Calculate phase stability as for a PHASE_STABILITY plot.
+    The result is in FS if the RF_GHZ DataSource is given, else in yUnits.
+    :param timeSeries: to calculate
+    :param dataSources: dict of {DataSource : str} for the timeSeries
+    :param plotElements: dict of {PlotEl : str}.  Uses XRANGE_PLOT.
+    :param yUnits: units to fetch the phase data in
+    :param calc: PhaseStability to use, so that the caller can keep it.
+    :param tsAPI: TimeSeriesAPI to cache the result in, or None
+    :return CalcResult or None if failed
+    '''
+    dataSeries = timeSeries.getDataSeries(yUnits)
+    freqRFGHz = dataSources.get(DataSource.RF_GHZ, None)
+    if freqRFGHz:
+        freqRFGHz = float(freqRFGHz)
+    TMin, TMax = getXRange(plotElements, SpecLines.XRANGE_PLOT_PHASE_STABILITY)
+    if calc is None:
+        calc = PhaseStability()
+    return calculateCached(calc, timeSeries, dataSeries, (timeSeries.tau0Seconds, TMin, TMax, freqRFGHz), tsAPI)
+
+def calcSpectrum(timeSeries: TimeSeries,
+        dataSources: Dict[DataSource, str],
+        plotElements: Dict[PlotEl, str],
+        calc: Optional[FFT] = None,
+        tsAPI = None) -> Optional[CalcResult]:
+    '''
+    Calculate the amplitude spectrum as for an AMP_SPECTRUM or POWER_SPECTRUM plot
+    :param timeSeries: to calculate
+    :param dataSources: dict of {DataSource : str} for the timeSeries
+    :param plotElements: dict of {PlotEl : str}.  Uses FFT_AVERAGING.
+    :param calc: FFT to use, so that the caller can keep it for RMS and harmonics.
+    :param tsAPI: TimeSeriesAPI to cache the result in, or None
+    :return CalcResult or None if failed
+    '''
+    srcKind = DataKind.fromStr(dataSources.get(DataSource.DATA_KIND, (DataKind.AMPLITUDE).value))
+    requiredUnits = spectrumUnits(srcKind, timeSeries.dataUnits)[1]
+    dataSeries = timeSeries.getDataSeries(requiredUnits)
+
+    # optional segment averaging:
+    averaging = plotElements.get(PlotEl.FFT_AVERAGING, None)
+    segmentSeconds = None
+    overlap = 0.5
+    window = 'hann'
+    if averaging:
+        averaging = [item.strip() for item in averaging.split(',')]
+        segmentSeconds = float(averaging[0])
+        if len(averaging) > 1:
+            overlap = float(averaging[1])
+        if len(averaging) > 2:
+            window = averaging[2].lower()
+
+    if calc is None:
+        calc = FFT()
+    return calculateCached(calc, timeSeries, dataSeries, (timeSeries.tau0Seconds, segmentSeconds, overlap, window), tsAPI)
+
+def binSpectrum(calc: FFT,
+        plotElements: Dict[PlotEl, str],
+        ignoreHarmonicsOf = 0,
+        ignoreHarmonicsWindow = 3.0):
+    '''
+    Reduce a calculated spectrum for plotting, as configured by FFT_BINNING.
+    Harmonics of ignoreHarmonicsOf, as highlighted on the plot, and the x ranges of SPEC_LINE1 and SPEC_LINE2
+    are kept at full resolution.  The calc itself is not changed, so RMS and spec checks still use every bin.
+    :param calc: FFT after calculate()
+    :param plotElements: dict of {PlotEl : str}.  Uses FFT_BINNING, SPEC_LINE1, SPEC_LINE2.
+    :param ignoreHarmonicsOf: int frequency Hz, or 0 for none
+    :param ignoreHarmonicsWindow: offset Hz, as for FFT.getHarmonicMask()
+    :return (xArray, yArray) to plot: the calc result itself if FFT_BINNING is not given
+    '''
+    binning = plotElements.get(PlotEl.FFT_BINNING, None)
+    if not binning:
+        return (calc.xResult, calc.yResult)
+    binning = [item.strip() for item in binning.split(',')]
+    binsPerOctave = float(binning[0])
+    statistic = binning[1] if len(binning) > 1 else SpectrumBinning.DEFAULT_STATISTIC
+
+    x = calc.xResult
+    keepMask = np.zeros(len(x), dtype = bool)
+    if ignoreHarmonicsOf:
+        keepMask |= calc.getHarmonicMask(ignoreHarmonicsOf, ignoreHarmonicsWindow)
+    for specLine in parseSpecLines(plotElements):
+        keepMask |= (specLine.xMin <= x) & (x <= specLine.xMax)
+    return SpectrumBinning.logFrequencyBin(x, calc.yResult, binsPerOctave, statistic, keepMask)
+
+def calculate(plotKind: PlotKind,
+        timeSeries: TimeSeries,
+        dataSources: Dict[DataSource, str],
+        plotElements: Dict[PlotEl, str],
+        specRanges: Optional[List[Tuple[float, float]]] = None,
+        yUnits = Units.DEG,
+        calc = None,
+        tsAPI = None) -> Optional[CalcResult]:
+    '''
+    Calculate as for the given kind of plot
+    :param plotKind: POWER_STABILITY, VOLT_STABILITY, PHASE_STABILITY, AMP_SPECTRUM or POWER_SPECTRUM
+    :param specRanges: for amplitude stability, see calcAmplitudeStability()
+    :param yUnits: for phase stability, see calcPhaseStability()
+    :param calc: AmplitudeStability, PhaseStability, or FFT to use, matching plotKind
+    Other parameters as for calcAmplitudeStability()
+    :return CalcResult or None if failed
+    :raise ValueError if plotKind is not supported
+    '''
+    if plotKind in STABILITY_KINDS:
+        return calcAmplitudeStability(timeSeries, dataSources, plotElements, specRanges, calc, tsAPI)
+    elif plotKind == PlotKind.PHASE_STABILITY:
+        return calcPhaseStability(timeSeries, dataSources, plotElements, yUnits, calc, tsAPI)
+    elif plotKind in SPECTRUM_KINDS:
+        return calcSpectrum(timeSeries, dataSources, plotElements, calc, tsAPI)
+    raise ValueError('unsupported plotKind {}'.format(plotKind))
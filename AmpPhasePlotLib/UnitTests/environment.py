@@ -12,6 +12,7 @@ def plotAPI(context, **kwargs):
     # -- SETUP-FIXTURE PART:
     context.tAPI = TimeSeriesAPI.TimeSeriesAPI()
     context.pAPI = PlotAPI.PlotAPI()
+    context.timeSeriesId = None
     context.outputName = None
     context.show = False
     yield context.pAPI
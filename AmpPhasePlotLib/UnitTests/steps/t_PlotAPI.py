@@ -3,12 +3,50 @@ Implement test cases for t_PlotAPI.feature
 Validate PlotAPI
 '''
 from behave import given, when, then
-from AmpPhaseDataLib.Constants import DataSource
+from AmpPhaseDataLib.Constants import DataSource, DataStatus, PlotEl, PlotKind
+from AmpPhasePlotLib.ComplianceAPI import ComplianceAPI
+from AmpPhasePlotLib.BatchCalc import BatchCalc
+from AmpPhasePlotLib import SeriesCalc
+from Calculate.AmplitudeStability import AmplitudeStability
+from Calculate.PhaseStability import PhaseStability
+from Calculate.StabilityAccumulator import AmplitudeStabilityAccumulator, PhaseStabilityAccumulator
+from Calculate.FFT import FFT
+from Calculate.CalcResult import CalcResult
+from Calculate.SpecCompliance import checkCompliance
+from Plot.Plotly.PlotTimeSeries import decimateTraces
+from Calculate.Common import lagDiffSumSquares, getAveragesArray, getMinMaxArray, getFirstItemArray
+from Calculate import allantools
 from hamcrest import assert_that
 from tempfile import NamedTemporaryFile
+from datetime import datetime
+import numpy as np
+import warnings
 import csv
 import os
 
+def listBlocks(inputArray, K):
+    '''
+    Reference for the block reducers: the groups of K items as list slices, as the list implementations made them
+    '''
+    N = len(inputArray)
+    K = min(max(int(K), 1), N)
+    return [inputArray[i * K : i * K + K] for i in range(N // K)]
+
+def perBinRMS(fft, y2, minFreqHz, maxFreqHz, includeDC):
+    '''
+    Reference for FFT.RMSfromFFT(): the sum over bins as the per-bin implementation made it
+    :param y2: list of fft.yResult with any harmonics set to 0
+    '''
+    iLower, iUpper = fft.result.findRange(minFreqHz, maxFreqHz)
+    f = lambda y, endPoint: (y * (0.5 if endPoint else 1) / np.sqrt(2)) ** 2
+    sumSq = sum([f(y, False) for y in y2[iLower + 1 : iUpper - 1]])
+    sumSq += f(y2[iLower], True) if (iLower > 0) else 0
+    sumSq += f(y2[iUpper - 1], True)
+    RMS = np.sqrt(sumSq)
+    if includeDC and iLower == 0:
+        RMS += fft.yResult[0]
+    return RMS
+
 ##### GIVEN #####
         
 @given('a time series data file on disk')
@@ -50,6 +88,16 @@ def step_impl(context):
     f.close()
     assert_that(not os.path.isfile(context.outputName))
     
+@given('we specify an html output file')
+def step_impl(context):
+    """
+    :param context: behave.runner.Context
+    """
+    f = NamedTemporaryFile(suffix = '.html', delete = True)
+    context.outputName = f.name
+    f.close()
+    assert_that(not os.path.isfile(context.outputName))
+    
 @given('we specify units "{units}"')
 def step_impl(context, units):
     """
@@ -88,6 +136,23 @@ def step_impl(context):
     if hasattr(context, 'units'):
         context.tAPI.setDataSource(context.timeSeriesId, DataSource.UNITS, context.units)
 
+@when('a time series with noise {noise:g} and a {period:g} s oscillation of {amplitude:g} is inserted')
+def step_impl(context, noise, period, amplitude):
+    """
+    :param context: behave.runner.Context
+    :param noise: standard deviation of gaussian noise relative to the mean
+    :param period: seconds
+    :param amplitude: of the oscillation relative to the mean
+    """
+    tau0Seconds = 0.05
+    t = np.arange(int(1200 / tau0Seconds)) * tau0Seconds
+    rng = np.random.default_rng(1)
+    dataSeries = 1 + noise * rng.standard_normal(len(t)) + amplitude * np.sin(2 * np.pi * t / period)
+    context.timeSeriesId = context.tAPI.insertTimeSeries(dataSeries.tolist(), tau0Seconds = tau0Seconds, startTime = datetime.now())
+    assert_that(context.timeSeriesId)
+    context.tAPI.setDataSource(context.timeSeriesId, DataSource.DATA_KIND, "amplitude")
+    context.tAPI.setDataSource(context.timeSeriesId, DataSource.UNITS, context.units)
+
 @when('the time series plot is generated')
 def step_impl(context):
     """
@@ -95,6 +160,34 @@ def step_impl(context):
     """
     assert_that(context.pAPI.plotTimeSeries(context.timeSeriesId, outputName = context.outputName, show = context.show))
     
+@when('the time series is plotted with temperatures and decimation "{method}"')
+def step_impl(context, method):
+    """
+    :param context: behave.runner.Context
+    :param method: PlotEl.DECIMATION value
+    """
+    timeSeries = context.tAPI.retrieveTimeSeries(context.timeSeriesId)
+    N = len(timeSeries.dataSeries)
+    timeSeries.temperatures1 = [290 + (i % 100) / 100 for i in range(N)]
+    timeSeries.temperatures2 = [4 + (i % 7) / 10 for i in range(N)]
+    context.timeSeries = timeSeries
+    context.originalSeries = [list(timeSeries.dataSeries), list(timeSeries.temperatures1), list(timeSeries.temperatures2), list(timeSeries.timeStamps)]
+    plotElements = {PlotEl.DECIMATION: method, PlotEl.IMG_WIDTH: "400"}
+    assert_that(context.pAPI.plotTimeSeries(timeSeries, plotElements = plotElements))
+
+@when('the time series is plotted with a temperature of half its length and decimation "{method}"')
+def step_impl(context, method):
+    """
+    :param context: behave.runner.Context
+    :param method: PlotEl.DECIMATION value
+    """
+    timeSeries = context.tAPI.retrieveTimeSeries(context.timeSeriesId)
+    timeSeries.temperatures1 = [290 + (i % 100) / 100 for i in range(len(timeSeries.dataSeries) // 2)]
+    context.timeSeries = timeSeries
+    context.decimation = method
+    plotElements = {PlotEl.DECIMATION: method, PlotEl.IMG_WIDTH: "400"}
+    assert_that(context.pAPI.plotTimeSeries(timeSeries, plotElements = plotElements))
+
 @when('the power spectrum plot is generated')
 def step_impl(context):
     """
@@ -102,6 +195,30 @@ def step_impl(context):
     """
     assert_that(context.pAPI.plotSpectrum(context.timeSeriesId, outputName = context.outputName, show = context.show))
 
+@when('the power spectrum plot is generated with averaging "{averaging}"')
+def step_impl(context, averaging):
+    """
+    :param context: behave.runner.Context
+    :param averaging: str value for PlotEl.FFT_AVERAGING
+    """
+    context.spectrumPoints = len(context.pAPI.traces[0][0])
+    plotElements = {PlotEl.FFT_AVERAGING: averaging}
+    assert_that(context.pAPI.plotSpectrum(context.timeSeriesId, plotElements = plotElements))
+
+@when('the power spectrum plot is generated with binning "{binning}" and spec line "{specLine}"')
+def step_impl(context, binning, specLine):
+    """
+    :param context: behave.runner.Context
+    :param binning: str value for PlotEl.FFT_BINNING
+    :param specLine: str value for PlotEl.SPEC_LINE1
+    """
+    context.spectrumPoints = len(context.pAPI.traces[0][0])
+    context.fullSpectrum = context.pAPI.traces[0]
+    context.specLine = [float(item) for item in specLine.split(',')]
+    plotElements = {PlotEl.FFT_BINNING: binning, PlotEl.SPEC_LINE1: specLine}
+    assert_that(context.pAPI.plotSpectrum(context.timeSeriesId, plotElements = plotElements))
+    context.spectrumPlotElements = plotElements
+
 @when('the amplitude stability plot is generated')
 def step_impl(context):
     """
@@ -109,6 +226,105 @@ def step_impl(context):
     """
     assert_that(context.pAPI.plotAmplitudeStability(context.timeSeriesId, outputName = context.outputName, show = context.show))
 
+@when('the amplitude stability plot is generated again')
+def step_impl(context):
+    """
+    :param context: behave.runner.Context
+    """
+    context.previousTraces = context.pAPI.traces
+    assert_that(context.pAPI.plotAmplitudeStability(context.timeSeriesId))
+
+@when('the amplitude stability plot is generated twice')
+def step_impl(context):
+    """
+    :param context: behave.runner.Context
+    """
+    assert_that(context.pAPI.plotAmplitudeStability(context.timeSeriesId))
+    context.previousImage = context.pAPI.imageData
+    context.numRendered = len(context.pAPI.renderer.latencies)
+    context.numCacheHits = context.pAPI.imageCache.hits
+    assert_that(context.pAPI.plotAmplitudeStability(context.timeSeriesId))
+
+@when('the time series is deleted')
+def step_impl(context):
+    """
+    :param context: behave.runner.Context
+    """
+    context.tAPI.deleteTimeSeries(context.timeSeriesId)
+
+@when('the amplitude stability plot is generated with tau grid "{tauGrid}" and spec line "{specLine}"')
+def step_impl(context, tauGrid, specLine):
+    """
+    :param context: behave.runner.Context
+    :param tauGrid: str value for PlotEl.TAU_GRID
+    :param specLine: str value for PlotEl.SPEC_LINE1
+    """
+    plotElements = {PlotEl.TAU_GRID: tauGrid, PlotEl.SPEC_LINE1: specLine}
+    assert_that(context.pAPI.plotAmplitudeStability(context.timeSeriesId, plotElements = plotElements))
+    if not hasattr(context, 'stabilityResults'):
+        context.stabilityResults = []
+    context.stabilityResults.append((context.pAPI.dataStatusFinal, len(context.pAPI.traces[0][0])))
+
+@when('the phase stability plot is generated with spec line "{specLine}"')
+def step_impl(context, specLine):
+    """
+    :param context: behave.runner.Context
+    :param specLine: str value for PlotEl.SPEC_LINE1
+    """
+    plotElements = {PlotEl.SPEC_LINE1: specLine}
+    assert_that(context.pAPI.plotPhaseStability(context.timeSeriesId, plotElements = plotElements))
+    if not hasattr(context, 'stabilityResults'):
+        context.stabilityResults = []
+    context.stabilityResults.append((context.pAPI.dataStatusFinal, len(context.pAPI.traces[0][0])))
+
+@when('the {kind} stability compliance is evaluated without plotting for spec line "{specLine}"')
+def step_impl(context, kind, specLine):
+    """
+    :param context: behave.runner.Context
+    :param kind: 'amplitude' or 'phase'
+    :param specLine: str value for PlotEl.SPEC_LINE1
+    """
+    plotKind = PlotKind.POWER_STABILITY if kind == 'amplitude' else PlotKind.PHASE_STABILITY
+    results = ComplianceAPI().evaluateMany([context.timeSeriesId], plotKind, {PlotEl.SPEC_LINE1: specLine})
+    context.compliance = results[context.timeSeriesId]
+    assert_that(context.compliance is not None and len(context.compliance.checks) == 1)
+
+@when('the amplitude stability of {count:d} copies is calculated with {workers:d} worker')
+@when('the amplitude stability of {count:d} copies is calculated with {workers:d} workers')
+def step_impl(context, count, workers):
+    """
+    :param context: behave.runner.Context
+    :param count: number of times to list the time series
+    :param workers: number of worker processes
+    """
+    context.tAPI.clearCalcCache(context.timeSeriesId)
+    batchCalc = BatchCalc(context.tAPI, maxWorkers = workers, minParallel = 1)
+    results = batchCalc.calculateMany([context.timeSeriesId] * count, PlotKind.POWER_STABILITY, {}, {})
+    batchCalc.close()
+    if not hasattr(context, 'batchResults'):
+        context.batchResults = []
+    context.batchResults.append(results)
+
+@when('the time series, spectrum and stability plots are rendered in a batch')
+def step_impl(context):
+    """
+    :param context: behave.runner.Context
+    """
+    context.batchFiles = []
+    for _ in range(3):
+        f = NamedTemporaryFile(suffix = '.png', delete = True)
+        context.batchFiles.append(f.name)
+        f.close()
+    # so that every plot is rendered:
+    context.pAPI.imageCache.clear()
+    with context.pAPI.renderer.batch() as jobs:
+        assert_that(context.pAPI.plotTimeSeries(context.timeSeriesId, outputName = context.batchFiles[0]))
+        assert_that(context.pAPI.plotSpectrum(context.timeSeriesId, outputName = context.batchFiles[1]))
+        assert_that(context.pAPI.plotAmplitudeStability(context.timeSeriesId, outputName = context.batchFiles[2]))
+        # not waiting for the images inside the batch:
+        assert_that(context.pAPI.imageData is None)
+    context.renderJobs = jobs
+
 @when('the phase stability plot is generated')
 def step_impl(context):
     """
@@ -116,6 +332,87 @@ def step_impl(context):
     """
     assert_that(context.pAPI.plotPhaseStability(context.timeSeriesId, outputName = context.outputName, show = context.show))
     
+@when('the phase stability is calculated with method "{method}"')
+def step_impl(context, method):
+    """
+    :param context: behave.runner.Context
+    :param method: 'direct' or 'fft', see Common.lagDiffSumSquares
+    """
+    timeSeries = context.tAPI.retrieveTimeSeries(context.timeSeriesId)
+    context.phaseSeries = timeSeries.getDataSeries()
+    result = PhaseStability().calculate(context.phaseSeries, timeSeries.tau0Seconds, method = method)
+    assert_that(result is not None and len(result.y))
+    if not hasattr(context, 'phaseResults'):
+        context.phaseResults = []
+    context.phaseResults.append(result)
+
+@when('the {function} is calculated with allantools for every tau')
+def step_impl(context, function):
+    """
+    :param context: behave.runner.Context
+    :param function: 'adev' or 'oadev'
+    """
+    timeSeries = context.tAPI.retrieveTimeSeries(context.timeSeriesId)
+    context.allanData = np.asarray(timeSeries.getDataSeries(), dtype = np.float64)
+    context.allanRate = 1 / timeSeries.tau0Seconds
+    context.allanFunction = getattr(allantools, function)
+    taus = np.arange(1, len(context.allanData) // 2) / context.allanRate
+    context.allanResult = context.allanFunction(context.allanData, context.allanRate, data_type = "freq", taus = taus)
+    assert_that(len(context.allanResult[0]) > 1)
+
+@when('the FFT of {seconds:g} seconds of noise sampled at {rate:g} Hz is calculated')
+def step_impl(context, seconds, rate):
+    """
+    :param context: behave.runner.Context
+    :param seconds: duration of the noise
+    :param rate: sampling rate Hz
+    """
+    context.fft = FFT()
+    dataSeries = np.random.default_rng(1).normal(size = int(seconds * rate))
+    assert_that(context.fft.calculate(dataSeries, 1 / rate) is not None)
+
+@when('the {kind} stability is accumulated in {chunks:d} chunks')
+def step_impl(context, kind, chunks):
+    """
+    :param context: behave.runner.Context
+    :param kind: 'amplitude' or 'phase'
+    :param chunks: number of chunks to add the data in
+    """
+    timeSeries = context.tAPI.retrieveTimeSeries(context.timeSeriesId)
+    dataSeries = np.asarray(timeSeries.getDataSeries(), dtype = np.float64)
+    if kind == 'amplitude':
+        accumulator = AmplitudeStabilityAccumulator(timeSeries.tau0Seconds)
+    else:
+        accumulator = PhaseStabilityAccumulator(timeSeries.tau0Seconds)
+    for chunk in np.array_split(dataSeries, chunks):
+        accumulator.add(chunk)
+    context.accumulated = accumulator.calculate()
+    assert_that(context.accumulated is not None and len(context.accumulated.x) > 1)
+    if kind == 'amplitude':
+        context.fullResult = AmplitudeStability().calculate(dataSeries, timeSeries.tau0Seconds, tauGrid = context.accumulated.x.tolist())
+    else:
+        context.fullResult = PhaseStability().calculate(dataSeries, timeSeries.tau0Seconds)
+
+@when('a result with y "{y}" at x "{x}" is checked against spec line "{specLine}"')
+def step_impl(context, y, x, specLine):
+    """
+    :param context: behave.runner.Context
+    :param y: str list of float
+    :param x: str list of float
+    :param specLine: str "x1, y1, x2, y2"
+    """
+    result = CalcResult([float(item) for item in x.split(',')], [float(item) for item in y.split(',')])
+    x1, y1, x2, y2 = [float(item) for item in specLine.split(',')]
+    context.specChecks = []
+    for calc in (AmplitudeStability(), PhaseStability()):
+        calc.setResult(result)
+        context.specChecks.append(calc.checkSpecLine(x1, x2, y1, y2))
+    if y1 == y2:
+        calc = FFT()
+        calc.setResult(result)
+        context.specChecks.append(calc.checkFFTSpec(x1, x2, y1))
+    context.specChecks.append(checkCompliance(result, [specLine])[0])
+
 ##### THEN #####
 
 @then('the output file was created or updated')
@@ -131,3 +428,277 @@ def step_impl(context):
     :param context: behave.runner.Context
     """
     assert_that(context.pAPI.imageData is not None)
+
+@then('the html file has a WebGL overview and the full resolution data')
+def step_impl(context):
+    """
+    :param context: behave.runner.Context
+    """
+    with open(context.outputName, 'r', encoding = 'utf-8') as file:
+        html = file.read()
+    assert_that(html.encode('utf-8') == context.pAPI.imageData)
+    assert_that('"type":"scattergl"' in html)
+    # the zoom script with at least one full resolution trace:
+    assert_that('plotly_relayout' in html and 'var full = {};' not in html)
+
+@then('the spec compliance is the same for both tau grids')
+def step_impl(context):
+    """
+    :param context: behave.runner.Context
+    """
+    assert_that(context.stabilityResults[0][0] == context.stabilityResults[1][0])
+
+@then('the spec compliance is "{status}"')
+def step_impl(context, status):
+    """
+    :param context: behave.runner.Context
+    :param status: DataStatus name
+    """
+    assert_that(context.stabilityResults[-1][0] == DataStatus[status])
+
+@then('the batch compliance matches the plotted compliance')
+def step_impl(context):
+    """
+    :param context: behave.runner.Context
+    """
+    assert_that(context.compliance.complies == (context.stabilityResults[0][0] == DataStatus.ACCEPTED))
+
+@then('both plots have the same traces')
+def step_impl(context):
+    """
+    :param context: behave.runner.Context
+    """
+    assert_that(str(context.previousTraces) == str(context.pAPI.traces))
+
+@then('{count:d} calculation is cached for the time series')
+def step_impl(context, count):
+    """
+    :param context: behave.runner.Context
+    :param count: expected number of cached results
+    """
+    assert_that(context.tAPI.countCalcCache(context.timeSeriesId) == count)
+
+@then('the second image was taken from the image cache without rendering')
+def step_impl(context):
+    """
+    :param context: behave.runner.Context
+    """
+    assert_that(context.pAPI.imageData == context.previousImage)
+    assert_that(len(context.pAPI.renderer.latencies) == context.numRendered)
+    assert_that(context.pAPI.imageCache.hits == context.numCacheHits + 1)
+
+@then('the worker results match the serial results in order')
+def step_impl(context):
+    """
+    :param context: behave.runner.Context
+    """
+    serial, parallel = context.batchResults
+    assert_that(len(serial) == len(parallel))
+    for (ts1, result1), (ts2, result2) in zip(serial, parallel):
+        assert_that(ts1.tsId == ts2.tsId and ts1.startTime == ts2.startTime)
+        assert_that(np.array_equal(result1.x, result2.x) and np.array_equal(result1.y, result2.y))
+        assert_that(np.array_equal(result1.yError, result2.yError))
+
+@then('each batch output file was written with its render time')
+def step_impl(context):
+    """
+    :param context: behave.runner.Context
+    """
+    assert_that(len(context.renderJobs) == len(context.batchFiles))
+    for job, fileName in zip(context.renderJobs, context.batchFiles):
+        assert_that(job.error is None and job.seconds >= 0)
+        with open(fileName, 'rb') as file:
+            assert_that(file.read() == job.imageData)
+        os.remove(fileName)
+    assert_that(job.imageData.startswith(b'\x89PNG'))
+
+@then('the time series and its temperatures are unchanged')
+def step_impl(context):
+    """
+    :param context: behave.runner.Context
+    """
+    timeSeries = context.timeSeries
+    assert_that(context.originalSeries == [timeSeries.dataSeries, timeSeries.temperatures1, timeSeries.temperatures2, timeSeries.timeStamps])
+
+@then('the plot used decimation "{method}"')
+def step_impl(context, method):
+    """
+    :param context: behave.runner.Context
+    :param method: PlotEl.DECIMATION value
+    """
+    assert_that(context.pAPI.plotElementsFinal[PlotEl.DECIMATION] == method)
+    assert_that(context.pAPI.imageData is not None)
+
+@then('the second plot has fewer points')
+def step_impl(context):
+    """
+    :param context: behave.runner.Context
+    """
+    assert_that(context.stabilityResults[1][1] < context.stabilityResults[0][1])
+
+@then('the binned spectrum is unchanged in the spec line range')
+def step_impl(context):
+    """
+    :param context: behave.runner.Context
+    """
+    fMin, fMax = context.specLine[0], context.specLine[2]
+    x, y = np.asarray(context.fullSpectrum[0]), np.asarray(context.fullSpectrum[1])
+    xBinned, yBinned = np.asarray(context.pAPI.traces[0][0]), np.asarray(context.pAPI.traces[0][1])
+    inFull = (fMin <= x) & (x <= fMax)
+    inBinned = (fMin <= xBinned) & (xBinned <= fMax)
+    assert_that(np.any(inFull))
+    assert_that(np.array_equal(x[inFull], xBinned[inBinned]) and np.array_equal(y[inFull], yBinned[inBinned]))
+
+@then('binning the spectrum keeps every harmonic of {fundamental:d} Hz')
+def step_impl(context, fundamental):
+    """
+    :param context: behave.runner.Context
+    :param fundamental: Hz
+    """
+    xHarmonics, yHarmonics = context.pAPI.calc.getHarmonics(fundamental, 0.01)
+    assert_that(len(xHarmonics))
+    x, y = SeriesCalc.binSpectrum(context.pAPI.calc, context.spectrumPlotElements, fundamental, 0.01)
+    assert_that(len(x) < len(context.pAPI.calc.xResult))
+    kept = np.isin(xHarmonics, x)
+    assert_that(np.all(kept) and np.array_equal(y[np.isin(x, xHarmonics)], yHarmonics))
+
+@then('the second spectrum has fewer points')
+def step_impl(context):
+    """
+    :param context: behave.runner.Context
+    """
+    assert_that(len(context.pAPI.traces[0][0]) < context.spectrumPoints)
+
+@then('the phase stability results agree within {tolerance:g}')
+def step_impl(context, tolerance):
+    """
+    :param context: behave.runner.Context
+    :param tolerance: relative tolerance
+    """
+    direct, fft = context.phaseResults
+    assert_that(np.array_equal(direct.x, fft.x) and np.array_equal(direct.N, fft.N))
+    assert_that(np.allclose(fft.y, direct.y, rtol = tolerance, atol = 0))
+
+@then('the lag sums of squares agree within {tolerance:g} for both methods')
+def step_impl(context, tolerance):
+    """
+    :param context: behave.runner.Context
+    :param tolerance: tolerance relative to the largest sum
+    """
+    phase = np.unwrap(np.asarray(context.phaseSeries, dtype = np.float64), period = 360)
+    lags = np.arange(1, len(phase) // 2)
+    direct, directCounts = lagDiffSumSquares(phase, lags, 'direct')
+    fft, fftCounts = lagDiffSumSquares(phase, lags, 'fft')
+    assert_that(np.array_equal(directCounts, fftCounts))
+    assert_that(np.max(np.abs(fft - direct)) <= tolerance * np.max(direct))
+
+@then('the results match calc_adev_phase at each tau with stride {stride}')
+def step_impl(context, stride):
+    """
+    :param context: behave.runner.Context
+    :param stride: 'm' for non-overlapping or '1' for overlapping
+    """
+    taus, devs, deverrs, ns = context.allanResult
+    phase = allantools.input_to_phase(context.allanData, context.allanRate, "freq")
+    for tau, dev, deverr, n in zip(taus, devs, deverrs, ns):
+        m = int(round(tau * context.allanRate))
+        expected = allantools.calc_adev_phase(phase, context.allanRate, m, m if stride == 'm' else 1)
+        assert_that(n == expected[2])
+        assert_that(np.isclose(dev, expected[0], rtol = 1e-12, atol = 0) and np.isclose(deverr, expected[1], rtol = 1e-12, atol = 0))
+
+@then('a tau too long for the data gives a RuntimeWarning')
+def step_impl(context):
+    """
+    :param context: behave.runner.Context
+    """
+    phase = allantools.input_to_phase(context.allanData, context.allanRate, "freq")
+    with warnings.catch_warnings(record = True) as caught:
+        warnings.simplefilter('always')
+        allantools.calc_adev_phase_many(phase, context.allanRate, [len(phase)])
+    assert_that(any(issubclass(warning.category, RuntimeWarning) for warning in caught))
+
+@then('the accumulated stability matches the full calculation at the same taus')
+def step_impl(context):
+    """
+    :param context: behave.runner.Context
+    """
+    accumulated = context.accumulated
+    full = context.fullResult.take(np.isin(context.fullResult.x, accumulated.x))
+    assert_that(np.array_equal(accumulated.x, full.x))
+    assert_that(np.array_equal(accumulated.N, full.N))
+    assert_that(np.allclose(accumulated.y, full.y, rtol = 1e-9, atol = 0))
+    assert_that(np.allclose(accumulated.yError, full.yError, rtol = 1e-9, atol = 0))
+
+@then('AmplitudeStability, PhaseStability, FFT and checkCompliance all give {complies}')
+def step_impl(context, complies):
+    """
+    :param context: behave.runner.Context
+    :param complies: 'True' or 'False'
+    """
+    assert_that(context.specChecks == [complies == 'True'] * len(context.specChecks))
+
+@then('the plotted data covers every sample and the temperature covers only its own samples')
+def step_impl(context):
+    """
+    :param context: behave.runner.Context
+    """
+    timeSeries = context.timeSeries
+    timeStamps = np.array(timeSeries.timeStamps, dtype = 'datetime64[us]')
+    dataSeries = np.asarray(timeSeries.dataSeries, dtype = np.float64)
+    M = len(timeSeries.temperatures1)
+    x, y, ((tx, ty), ) = decimateTraces(context.decimation, timeStamps, dataSeries, [timeSeries.temperatures1], 800)
+    assert_that(len(x) == len(y) and len(tx) == len(ty))
+    # the data reaches past the end of the temperature, which ends within its own samples:
+    assert_that(x[-1] > timeStamps[M - 1] and tx[-1] <= timeStamps[M - 1])
+    if context.decimation == 'none':
+        assert_that(np.array_equal(y, dataSeries) and len(ty) == M)
+    else:
+        assert_that(len(x) < len(dataSeries) and len(tx) < M)
+
+@then('the block reducers of {N:d} items in groups of {K:d} match the list implementations')
+def step_impl(context, N, K):
+    """
+    :param context: behave.runner.Context
+    :param N: number of items
+    :param K: number of items per group
+    """
+    inputArray = np.random.default_rng(N).normal(size = N).tolist()
+    blocks = listBlocks(inputArray, K)
+    averages = getAveragesArray(inputArray, K)
+    mins, maxs = getMinMaxArray(inputArray, K)
+    firsts = getFirstItemArray(inputArray, K)
+    assert_that(len(averages) == len(mins) == len(maxs) == len(firsts) == len(blocks))
+    assert_that(np.allclose(averages, [sum(block) / len(block) for block in blocks], rtol = 1e-12, atol = 0))
+    assert_that(mins.tolist() == [min(block) for block in blocks])
+    assert_that(maxs.tolist() == [max(block) for block in blocks])
+    assert_that(firsts.tolist() == [block[0] for block in blocks])
+
+@then('the harmonic mask of {fundamental:d} Hz within {window:g} Hz matches isHarmonic for every bin')
+def step_impl(context, fundamental, window):
+    """
+    :param context: behave.runner.Context
+    :param fundamental: Hz
+    :param window: Hz either side of each harmonic
+    """
+    fft = context.fft
+    mask = fft.getHarmonicMask(fundamental, window)
+    assert_that(mask.any())
+    assert_that(mask.tolist() == [fft.isHarmonic(f, fundamental, window) for f in fft.xResult])
+
+@then('RMSfromFFT matches the per-bin sum for bands of {widths} bins ignoring harmonics of {ignore}')
+def step_impl(context, widths, ignore):
+    """
+    :param context: behave.runner.Context
+    :param widths: comma-separated numbers of bins per band
+    :param ignore: fundamental Hz, or 'none'
+    """
+    fft = context.fft
+    ignoreHarmonicsOf = None if ignore == 'none' else int(ignore)
+    x = fft.xResult
+    y2 = [0 if ignoreHarmonicsOf and fft.isHarmonic(f, ignoreHarmonicsOf) else y for f, y in zip(x, fft.yResult)]
+    for width in [int(w) for w in widths.split(',')]:
+        for i in range(len(x) - width + 1):
+            for includeDC in (False, True):
+                expected = perBinRMS(fft, y2, x[i], x[i + width - 1], includeDC)
+                RMS = fft.RMSfromFFT(x[i], x[i + width - 1], includeDC, ignoreHarmonicsOf)
+                assert_that(np.isclose(RMS, expected, rtol = 1e-9, atol = 1e-15))
@@ -10,6 +10,50 @@ Feature: Validate PlotAPI
     Then the output file was created or updated
     And the image data can be retrieved
     
+    @fixture.plotAPI
+    Scenario Outline: Decimating a time series plot does not change the time series
+    Given a time series data file on disk
+    When the time series data is inserted
+    And the time series is plotted with temperatures and decimation "<method>"
+    Then the time series and its temperatures are unchanged
+    And the plot used decimation "<method>"
+
+    Examples: decimation methods
+    | method |
+    | minmax |
+    | lttb   |
+    | mean   |
+    | none   |
+
+    @fixture.plotAPI
+    Scenario Outline: Shorter temperatures do not shorten the plotted data
+    Given a time series data file on disk
+    When the time series data is inserted
+    And the time series is plotted with a temperature of half its length and decimation "<method>"
+    Then the plotted data covers every sample and the temperature covers only its own samples
+
+    Examples: decimation methods
+    | method |
+    | minmax |
+    | lttb   |
+    | mean   |
+    | none   |
+
+    @fixture.plotAPI
+    Scenario Outline: Interactive html plots of large traces
+    Given a time series data file on disk
+    And we specify units "W"
+    And we specify an html output file
+    When the time series data is inserted
+    And the <kind> plot is generated
+    Then the output file was created or updated
+    And the html file has a WebGL overview and the full resolution data
+
+    Examples: plot kinds
+    | kind           |
+    | time series    |
+    | power spectrum |
+
     @fixture.plotAPI
     Scenario: Test plotting a power spectrum
     Given a time series data file on disk
@@ -19,6 +63,34 @@ Feature: Validate PlotAPI
     And the power spectrum plot is generated
     Then the image data can be retrieved
     
+    @fixture.plotAPI
+    Scenario: Test plotting a segment-averaged power spectrum
+    Given a time series data file on disk
+    And we specify units "W"
+    When the time series data is inserted
+    And the power spectrum plot is generated
+    And the power spectrum plot is generated with averaging "2, 0.5, hann"
+    Then the image data can be retrieved
+    And the second spectrum has fewer points
+
+    @fixture.plotAPI
+    Scenario Outline: Plotting a spectrum in fractional-octave bins
+    Given a time series data file on disk
+    And we specify units "W"
+    When the time series data is inserted
+    And the power spectrum plot is generated
+    And the power spectrum plot is generated with binning "<binning>" and spec line "0.5, 1e-3, 1, 1e-3"
+    Then the image data can be retrieved
+    And the second spectrum has fewer points
+    And the binned spectrum is unchanged in the spec line range
+    And binning the spectrum keeps every harmonic of 1 Hz
+
+    Examples: binning
+    | binning |
+    | 24, max |
+    | 12, mean|
+    | 6, rms  |
+
     @fixture.plotAPI
     Scenario: Test plotting amplitude stability
     Given a time series data file on disk
@@ -36,3 +108,177 @@ Feature: Validate PlotAPI
     When the time series data is inserted
     And the phase stability plot is generated
     Then the image data can be retrieved
+
+    @fixture.plotAPI
+    Scenario: Phase stability from the FFT autocorrelation matches the direct calculation
+    Given a phase time series data file on disk
+    When the time series data is inserted
+    And the phase stability is calculated with method "direct"
+    And the phase stability is calculated with method "fft"
+    Then the phase stability results agree within 1e-9
+    And the lag sums of squares agree within 1e-9 for both methods
+
+    Scenario Outline: The harmonic mask and band RMS match the per-bin calculations
+    When the FFT of 2 seconds of noise sampled at 1000 Hz is calculated
+    Then the harmonic mask of 60 Hz within 3 Hz matches isHarmonic for every bin
+    And the harmonic mask of 50 Hz within 1.5 Hz matches isHarmonic for every bin
+    And RMSfromFFT matches the per-bin sum for bands of 1, 2, 7 bins ignoring harmonics of <ignore>
+
+    Examples: harmonics
+    | ignore |
+    | none   |
+    | 60     |
+
+    Scenario Outline: The block reducers match the list implementations
+    Then the block reducers of <N> items in groups of <K> match the list implementations
+
+    Examples: group sizes
+    | N  | K  |
+    | 12 | 4  |
+    | 10 | 3  |
+    | 7  | 1  |
+    | 5  | 8  |
+    | 6  | 0  |
+    | 6  | 6  |
+
+    @fixture.plotAPI
+    Scenario Outline: The vectorized Allan deviation kernel matches the per-tau kernel
+    Given a time series data file on disk
+    When the time series data is inserted
+    And the <function> is calculated with allantools for every tau
+    Then the results match calc_adev_phase at each tau with stride <stride>
+    And a tau too long for the data gives a RuntimeWarning
+
+    Examples: functions
+    | function | stride |
+    | adev     | m      |
+    | oadev    | 1      |
+
+    @fixture.plotAPI
+    Scenario: Amplitude stability accumulated chunk by chunk matches the full calculation
+    Given a time series data file on disk
+    When the time series data is inserted
+    And the amplitude stability is accumulated in 7 chunks
+    Then the accumulated stability matches the full calculation at the same taus
+
+    @fixture.plotAPI
+    Scenario: Phase stability accumulated chunk by chunk matches the full calculation
+    Given a phase time series data file on disk
+    When the time series data is inserted
+    And the phase stability is accumulated in 5 chunks
+    Then the accumulated stability matches the full calculation at the same taus
+
+    @fixture.plotAPI
+    Scenario Outline: Amplitude stability spec compliance does not depend on the tau grid
+    Given a time series data file on disk
+    And we specify units "W"
+    When the time series data is inserted
+    And the amplitude stability plot is generated with tau grid "all" and spec line "<spec>"
+    And the amplitude stability plot is generated with tau grid "<grid>" and spec line "<spec>"
+    Then the spec compliance is the same for both tau grids
+    And the second plot has fewer points
+
+    Examples: tau grids
+    | grid           | spec                    |
+    | octave         | 0.05, 5e-7, 100, 5e-7   |
+    | decade, 5      | 0.05, 5e-7, 100, 5e-7   |
+    | 0.1, 1, 10     | 300, 4e-6, 300, 4e-6    |
+
+    @fixture.plotAPI
+    Scenario Outline: A sparse tau grid still checks the intervals between its points
+    Given we specify units "W"
+    When a time series with noise 1e-6 and a 190 s oscillation of 3e-4 is inserted
+    And the amplitude stability plot is generated with tau grid "all" and spec line "<spec>"
+    And the amplitude stability plot is generated with tau grid "<grid>" and spec line "<spec>"
+    Then the spec compliance is the same for both tau grids
+    And the spec compliance is "<status>"
+    And the second plot has fewer points
+
+    Examples: tau grids
+    | grid           | spec                     | status   |
+    | octave         | 0.05, 5.6e-8, 100, 5.6e-8 | REJECTED |
+    | decade, 5      | 0.05, 5.6e-8, 100, 5.6e-8 | REJECTED |
+    | 1, 10, 100     | 50, 5.6e-8, 150, 5.6e-8   | REJECTED |
+    | octave         | 0.05, 1e-7, 100, 1e-7     | ACCEPTED |
+
+    @fixture.plotAPI
+    Scenario Outline: Batch spec compliance agrees with the plotted spec compliance
+    Given a time series data file on disk
+    And we specify units "W"
+    When the time series data is inserted
+    And the amplitude stability plot is generated with tau grid "all" and spec line "<spec>"
+    And the amplitude stability compliance is evaluated without plotting for spec line "<spec>"
+    Then the batch compliance matches the plotted compliance
+
+    Examples: spec lines
+    | spec                    |
+    | 0.05, 5e-7, 100, 5e-7   |
+    | 300, 4e-6, 300, 4e-6    |
+    | 0.05, 1, 100, 1         |
+    | 0.05, 6e-8, 300, 1e-6   |
+    | 10, 0.5, 300, 5         |
+
+    @fixture.plotAPI
+    Scenario Outline: Batch spec compliance agrees with the plotted phase stability spec compliance for sloped lines
+    Given a phase time series data file on disk
+    And we specify units "deg"
+    When the time series data is inserted
+    And the phase stability plot is generated with spec line "<spec>"
+    And the phase stability compliance is evaluated without plotting for spec line "<spec>"
+    Then the batch compliance matches the plotted compliance
+    And the spec compliance is "<status>"
+
+    Examples: spec lines
+    | spec                 | status   |
+    | 10, 0.5, 300, 5      | ACCEPTED |
+    | 10, 0.12, 300, 0.7   | ACCEPTED |
+    | 10, 0.12, 300, 0.62  | REJECTED |
+
+    @fixture.plotAPI
+    Scenario Outline: Every spec check interpolates as the compliance engine does
+    When a result with y "<y>" at x "<x>" is checked against spec line "<spec>"
+    Then AmplitudeStability, PhaseStability, FFT and checkCompliance all give <complies>
+
+    Examples: results
+    | x                       | y                      | spec              | complies |
+    | 10, 50, 100, 200, 300   | 0.4, 1, 2, 3, 4.5      | 10, 0.5, 300, 5   | True     |
+    | 10, 50, 100, 200, 300   | 0.4, 1, 2.5, 3, 4.5    | 10, 0.5, 300, 5   | False    |
+    | 10, 50, 100, 200, 300   | 0.4, 1, 2, 3, 4.5      | 10, 4.5, 300, 4.5 | True     |
+    | 10, 50, 100, 200, 300   | 0.4, 1, 2, 3, 4.6      | 10, 4.5, 300, 4.5 | False    |
+
+    @fixture.plotAPI
+    Scenario: Repeated stability plots reuse the cached calculation
+    Given a time series data file on disk
+    And we specify units "W"
+    When the time series data is inserted
+    And the amplitude stability plot is generated
+    And the amplitude stability plot is generated again
+    Then both plots have the same traces
+    And 1 calculation is cached for the time series
+    When the time series is deleted
+    Then 0 calculation is cached for the time series
+
+    @fixture.plotAPI
+    Scenario: Ensemble stability calculated in worker processes matches the serial calculation
+    Given a time series data file on disk
+    And we specify units "W"
+    When the time series data is inserted
+    And the amplitude stability of 3 copies is calculated with 1 worker
+    And the amplitude stability of 3 copies is calculated with 2 workers
+    Then the worker results match the serial results in order
+
+    @fixture.plotAPI
+    Scenario: Plots rendered in a batch are all written when the batch ends
+    Given a time series data file on disk
+    And we specify units "W"
+    When the time series data is inserted
+    And the time series, spectrum and stability plots are rendered in a batch
+    Then each batch output file was written with its render time
+
+    @fixture.plotAPI
+    Scenario: Unchanged plots are taken from the image cache
+    Given a time series data file on disk
+    And we specify units "W"
+    When the time series data is inserted
+    And the amplitude stability plot is generated twice
+    Then the second image was taken from the image cache without rendering
@@ -96,24 +96,26 @@ class BackEndIFProcessor():
             DataSource.UNITS: Units.DELTA_GAIN.value
         }
 
-        for i in range(8):            
-            outputName = f"{self.outputNames[i]}_{self.TITLE_SHORT}"
-            fileName = f"{self.outputNames[i]}_{self.FILENAME_SHORT}"
-            print(outputName)
-            dataSources[DataSource.DATA_SOURCE] = outputName
-            plotEls_SHORT[PlotEl.TITLE] = outputName
-            self.plotAPI.plotAmplitudeStability(self.timeSeries[i], dataSources, plotEls_SHORT, outputName = os.path.join(self.path, fileName + ".png"))
+        # render the plots concurrently, writing each file when done:
+        with self.plotAPI.renderer.batch():
+            for i in range(8):            
+                outputName = f"{self.outputNames[i]}_{self.TITLE_SHORT}"
+                fileName = f"{self.outputNames[i]}_{self.FILENAME_SHORT}"
+                print(outputName)
+                dataSources[DataSource.DATA_SOURCE] = outputName
+                plotEls_SHORT[PlotEl.TITLE] = outputName
+                self.plotAPI.plotAmplitudeStability(self.timeSeries[i], dataSources, plotEls_SHORT, outputName = os.path.join(self.path, fileName + ".png"))
 
-            taus, adev, aderr = AllanDev(self.CONFIG_SHORT, self.timeSeries[i].dataSeries)
+                taus, adev, aderr = AllanDev(self.CONFIG_SHORT, self.timeSeries[i].dataSeries)
         
-            outputName = f"{self.outputNames[i]}_{self.TITLE_MEDIUM}"
-            fileName = f"{self.outputNames[i]}_{self.FILENAME_MEDIUM}"
-            print(outputName)
-            dataSources[DataSource.DATA_SOURCE] = outputName
-            plotEls_MEDIUM[PlotEl.TITLE] = outputName
-            self.plotAPI.plotAmplitudeStability(self.timeSeriesMedium[i], dataSources, plotEls_MEDIUM, outputName = os.path.join(self.path, fileName + ".png"))
+                outputName = f"{self.outputNames[i]}_{self.TITLE_MEDIUM}"
+                fileName = f"{self.outputNames[i]}_{self.FILENAME_MEDIUM}"
+                print(outputName)
+                dataSources[DataSource.DATA_SOURCE] = outputName
+                plotEls_MEDIUM[PlotEl.TITLE] = outputName
+                self.plotAPI.plotAmplitudeStability(self.timeSeriesMedium[i], dataSources, plotEls_MEDIUM, outputName = os.path.join(self.path, fileName + ".png"))
 
-            taus, adev, aderr = AllanDev(self.CONFIG_MEDIUM, self.timeSeries[i].dataSeries)
+                taus, adev, aderr = AllanDev(self.CONFIG_MEDIUM, self.timeSeries[i].dataSeries)
        
         print("done.")
 
@@ -0,0 +1,11 @@
+'''
+Move all time series in the local database from the original one-row-per-sample layout to compressed blobs.
+Run from the directory containing AmpPhaseDataLib.ini
+'''
+from AmpPhaseDataLib.TimeSeriesAPI import TimeSeriesAPI
+
+if __name__ == '__main__':
+    tsAPI = TimeSeriesAPI()
+    print(f"Migrating time series in {tsAPI.localDatabaseFile}...")
+    migrated = tsAPI.migrateTimeSeriesStorage()
+    print(f"Migrated {len(migrated)} time series: {migrated}")
@@ -1,9 +1,9 @@
-from statistics import mean
-from .Common import getAveragesArray
 from .allantools import adev as allantools_adev
-import bisect
-import operator
-from math import sqrt
+from .CalcResult import CalcResult
+from . import SpecCompliance
+from .SpecCompliance import SpecLine
+from AmpPhaseDataLib.Constants import Units
+import numpy as np
 
 class AmplitudeStability(object):
     '''
@@ -19,28 +19,52 @@ class AmplitudeStability(object):
         '''
         Reset members to just-constructed state
         '''
-        self.xResult = None
-        self.yResult = None
-        self.yError = None
+        self.result = None
 
-    def calculate(self, dataSeries, tau0Seconds = 0.05, TMin = 0.05, TMax = 300, normalize = True, calcAdev = False):
+    @property
+    def xResult(self):
+        return self.result.x if self.result is not None else None
+
+    @property
+    def yResult(self):
+        return self.result.y if self.result is not None else None
+
+    @property
+    def yError(self):
+        return self.result.yError if self.result is not None else None
+
+    def setResult(self, result):
+        '''
+        Use a result calculated previously, such as from a cache, as if returned by calculate()
+        :param result: CalcResult
+        '''
+        self.__reset()
+        self.result = result
+
+    def calculate(self, dataSeries, tau0Seconds = 0.05, TMin = 0.05, TMax = 300, normalize = True, calcAdev = False,
+                  tauGrid = None, specRanges = None):
         '''
-        :param dataSeries: list of float, linear amplitudes to analyze
+        :param dataSeries: list or numpy array of float, linear amplitudes to analyze
         :param tau0Seconds: integration time of the dataSeries
         :param TMin: float shortest time differencing interval to plot
         :param TMax: float longest time differencing interval to plot
         :param normalize: If true, normalize to the mean amplitude
         :param calcAdev: If true, return ADEV instead of AVAR. 
-        :return True if successful, false otherwise
-                Updates self.xResult, self.yResult with computed Allan var trace.
+        :param tauGrid: which time differencing intervals to calculate.  See makeTauGrid()
+        :param specRanges: list of (TMin, TMax) ranges in which every interval is calculated whatever the tauGrid,
+                           such as the x ranges of spec lines.  See selectTauGrid() to plot only the tauGrid.
+        :return CalcResult if successful, otherwise None
+                Also stored in self.result, with its x, y, yError available as self.xResult, self.yResult, self.yError
         '''
         # clear anything kept from last run:
         self.__reset()
       
+        # use the caller's buffer directly when it is already a float64 array:
+        dataSeries = np.asarray(dataSeries, dtype = np.float64)
+
         # normalize the amplitudes to the mean because allantools doesn't do this:
         if normalize:
-            x0 = mean(dataSeries)
-            dataSeries = [x / x0 for x in dataSeries]
+            dataSeries = dataSeries / np.mean(dataSeries)
         
         # adjust TMax and TMin
         N = len(dataSeries)
@@ -61,30 +85,73 @@ class AmplitudeStability(object):
             maxK = N // minM
         
         # make list of taus to calculate for:
-        taus = [K * tau0Seconds for K in range(1, maxK)]
+        taus = [K * tau0Seconds for K in self.makeTauGrid(tau0Seconds, maxK, tauGrid, specRanges)]
         
         # non-overlapping ADEV using allantools 'freq' mode.
         # https://github.com/aewallin/allantools
         (taus, adev, aderr, adn) = allantools_adev(dataSeries, 1 / tau0Seconds, data_type = "freq", taus = taus)
         
-        # convert from numpy.ndarray to list:
-        self.xResult = taus.tolist()
-        
-        if calcAdev:
-            # return adevs and errors:
-            self.yResult = adev.tolist()
-            self.yError = aderr.tolist()
-        else:
+        if not calcAdev:
             # convert adevs and errors to variances:    
-            self.yResult = [y ** 2 for y in adev]
-            self.yError = [y ** 2 for y in aderr]
+            adev = np.square(adev)
+            aderr = np.square(aderr)
         
-#         print("last point: {0} with error {1} and N={2}".format(self.yResult[-1], self.yError[-1], adn[-1]))
-        return True
+        self.result = CalcResult(taus, adev, aderr, adn, tau0Seconds, xUnits = Units.SECONDS.value)
+        return self.result
     
+    def makeTauGrid(self, tau0Seconds, maxK, tauGrid = None, specRanges = None):
+        '''
+        Make the sorted list of multiples K of tau0Seconds to calculate for, 1 <= K < maxK
+        :param tau0Seconds: integration time of the dataSeries
+        :param maxK: int upper limit on K
+        :param tauGrid: None or 'all' for every K.
+                        'octave' for K = 1, 2, 4, 8...
+                        'decade' for about 10 points per decade, or 'decade, N' for about N points per decade.
+                        Otherwise a list of float intervals in seconds, or a string like "0.05, 1, 10, 100".
+        :param specRanges: list of (TMin, TMax) in seconds within which every K is included regardless of tauGrid,
+                           along with the multiples of tau0Seconds on either side, so that a spec line checked
+                           over that range gives the same result as for 'all'.
+        :return list of int K
+        '''
+        if maxK <= 1:
+            return []
+        if isinstance(tauGrid, str):
+            tauGrid = [item.strip().lower() for item in tauGrid.split(',')]
+            if tauGrid[0] not in ('all', 'octave', 'decade'):
+                tauGrid = [float(item) for item in tauGrid]
+        
+        if not tauGrid or tauGrid[0] == 'all':
+            return list(range(1, maxK))
+        elif tauGrid[0] == 'octave':
+            Ks = 2 ** np.arange(int(np.log2(maxK - 1)) + 1)
+        elif tauGrid[0] == 'decade':
+            perDecade = int(tauGrid[1]) if len(tauGrid) > 1 else 10
+            Ks = np.round(np.logspace(0, np.log10(maxK - 1), int(np.log10(maxK - 1) * perDecade) + 1))
+        else:
+            Ks = np.round(np.asarray(tauGrid, dtype = np.float64) / tau0Seconds)
+
+        # always include the endpoints so that the plotted range is the same:
+        Ks = set(Ks.astype(int).tolist()) | {1, maxK - 1}
+        for TMin, TMax in (specRanges or []):
+            Ks |= set(range(max(int(np.floor(TMin / tau0Seconds)), 1), min(int(np.ceil(TMax / tau0Seconds)) + 2, maxK)))
+        return sorted(K for K in Ks if 1 <= K < maxK)
+
+    def selectTauGrid(self, result, tauGrid = None):
+        '''
+        Select the points of a result which are on a tauGrid, such as to plot a result calculated with specRanges
+        :param result: CalcResult from calculate()
+        :param tauGrid: as for makeTauGrid()
+        :return CalcResult: the result itself if tauGrid is None or 'all', otherwise a new one
+        '''
+        if result is None or not len(result.x) or not tauGrid or str(tauGrid).strip().lower() == 'all':
+            return result
+        K = np.round(result.x / result.tau0Seconds).astype(int)
+        Ks = self.makeTauGrid(result.tau0Seconds, int(K[-1]) + 1, tauGrid)
+        return result.take(np.flatnonzero(np.isin(K, Ks)))
+
     def checkSpecLine(self, TMin, TMax, specMin, specMax):
         '''
-        Test whether the calculated AVAR/ADEV is below a given spec line.
+        Test whether the calculated AVAR/ADEV is below a given spec line, interpolated as by SpecCompliance.checkSpecLine()
         Must be called after calculate()
         :param TMin:  Lower time (x) limit of spec line
         :param TMax:  Upper time (x) limit of spec line
@@ -92,40 +159,4 @@ class AmplitudeStability(object):
         :param specMax: AVAR (y) value at TMax
         :return True/False
         '''
-        # find the time range spanned:
-        iLower, iUpper = self.__findTimeRange(TMin, TMax)
-        
-        # check for TMin == TMax or out of bounds:
-        if iUpper <= iLower:
-            iUpper = iLower + 1
-            
-        # exit early for single-point spec:
-        if iUpper == iLower + 1:
-            try:
-                return self.yResult[iLower] <= specMin
-            except:
-                return self.yResult[iLower - 1] <= specMin
-
-        # get the slope between the endpoints:        
-        slope = (specMax - specMin) / (iUpper - iLower - 1)
-
-        # compare result to spec, advancing the specY limit by slope at each step:
-        specY = specMin
-        for y in self.yResult[iLower:iUpper]:
-            if y > specY:
-                return False
-            else:
-                specY += slope
-        return True
-        
-    def __findTimeRange(self, TMin, TMax):
-        '''
-        Private helper to find the indices corresponding to the provided time differencing interval range.
-        :param TMin: lower time limit to find.
-        :param TMax: upper time limit for to find. Must be >= TMin.
-        :return (iLower, iUpper): tuple of the first and last+1 indexes of self.xResult.
-        '''
-        iLower = bisect.bisect_left(self.xResult, TMin) if TMin else 0
-        iUpper = bisect.bisect_right(self.xResult, TMax) if TMax else len(self.xResult)
-        return (iLower, iUpper)        
-        
\ No newline at end of file
+        return SpecCompliance.checkSpecLine(self.result, SpecLine([TMin, TMax], [specMin, specMax])).complies
@@ -0,0 +1,97 @@
+'''
+Compact result type returned by the calculators in Calculate
+'''
+import numpy as np
+import io
+
+class CalcResult(object):
+    '''
+    A calculated trace: x, y and optional yError as numpy arrays, with metadata about how it was made.
+    '''
+    __slots__ = ('x', 'y', 'yError', 'N', 'tau0Seconds', 'xUnits', 'yUnits', 'binSize')
+
+    def __init__(self, x, y, yError = None, N = None, tau0Seconds = None, xUnits = None, yUnits = None, binSize = None):
+        '''
+        Constructor
+        :param x: list or numpy array of float, ascending
+        :param y: list or numpy array of float corresponding to x
+        :param yError: optional list or numpy array of float +- error on y
+        :param N: optional list or numpy array of int number of samples or differences behind each y
+        :param tau0Seconds: integration time of the source data
+        :param xUnits: str units of x, like Units.SECONDS.value
+        :param yUnits: str units of y, if known
+        :param binSize: for spectra, the frequency spacing of x
+        '''
+        self.x = np.asarray(x, dtype = np.float64)
+        self.y = np.asarray(y, dtype = np.float64)
+        self.yError = np.asarray(yError, dtype = np.float64) if yError is not None else None
+        self.N = np.asarray(N) if N is not None else None
+        self.tau0Seconds = tau0Seconds
+        self.xUnits = xUnits
+        self.yUnits = yUnits
+        self.binSize = binSize
+
+    def findRange(self, xMin, xMax):
+        '''
+        Find the indices corresponding to the provided x range.
+        :param xMin: lower x limit to find.  If 0 or None, from the start.
+        :param xMax: upper x limit to find.  If 0 or None, to the end.  Must be >= xMin.
+        :return (iLower, iUpper): tuple of the first and last+1 indexes of x.
+        '''
+        iLower = int(np.searchsorted(self.x, xMin, side = 'left')) if xMin else 0
+        iUpper = int(np.searchsorted(self.x, xMax, side = 'right')) if xMax else len(self.x)
+        return (iLower, iUpper)
+
+    def take(self, indices):
+        '''
+        :param indices: numpy array of int or bool mask selecting points
+        :return a new CalcResult of the selected points, with the same metadata
+        '''
+        return CalcResult(self.x[indices], self.y[indices],
+                          yError = self.yError[indices] if self.yError is not None else None,
+                          N = self.N[indices] if self.N is not None and np.ndim(self.N) else self.N,
+                          tau0Seconds = self.tau0Seconds, xUnits = self.xUnits, yUnits = self.yUnits, binSize = self.binSize)
+
+    def toDict(self):
+        '''
+        :return dict of {'x', 'y', 'yError'} as lists, such as for serializing
+        '''
+        return {
+            'x': self.x.tolist(),
+            'y': self.y.tolist(),
+            'yError': self.yError.tolist() if self.yError is not None else []
+        }
+
+    def toBytes(self):
+        '''
+        :return bytes in .npz format, for storing in a cache.  See fromBytes()
+        '''
+        arrays = {'x': self.x, 'y': self.y}
+        if self.yError is not None:
+            arrays['yError'] = self.yError
+        if self.N is not None:
+            arrays['N'] = self.N
+        for name in ('tau0Seconds', 'xUnits', 'yUnits', 'binSize'):
+            value = getattr(self, name)
+            if value is not None:
+                arrays[name] = np.asarray(value)
+        buffer = io.BytesIO()
+        np.savez(buffer, **arrays)
+        return buffer.getvalue()
+
+    @classmethod
+    def fromBytes(cls, data):
+        '''
+        :param data: bytes made by toBytes()
+        :return CalcResult
+        '''
+        with np.load(io.BytesIO(data), allow_pickle = False) as arrays:
+            def scalar(name):
+                return arrays[name].item() if name in arrays.files else None
+            return cls(arrays['x'], arrays['y'],
+                       yError = arrays['yError'] if 'yError' in arrays.files else None,
+                       N = arrays['N'] if 'N' in arrays.files else None,
+                       tau0Seconds = scalar('tau0Seconds'),
+                       xUnits = scalar('xUnits'),
+                       yUnits = scalar('yUnits'),
+                       binSize = scalar('binSize'))
@@ -8,77 +8,86 @@ def diffSquared(inputArray):
     Takes inputArray and returns an array consisting of the differences
     between adjacent elements, squared.    
     '''
-    dX = []
-    for i in range(len(inputArray) - 1):
-        dX.append((inputArray[i + 1] - inputArray[i]) ** 2)
-    return dX
+    return np.square(np.diff(np.asarray(inputArray, dtype = np.float64)))
+
+def getBlocks(inputArray, K):
+    '''
+    returns a view of inputArray as an array of shape (..., M, K) of non-overlapping groups of K samples,
+    dropping any partial group at the end.  No data is copied if inputArray is already an ndarray.
+    :param inputArray: list or numpy array of shape (N,) or (C, N) for C columns of equal length
+    :param K: number of points per group, limited to 1 <= K <= N
+    '''
+    inputArray = np.asarray(inputArray)
+    # N is the size of the input data array:
+    N = inputArray.shape[-1]
+    # K is the number of points to group:
+    K = min(max(int(K), 1), max(N, 1))
+    # M is number of groups:
+    M = N // K
+    return inputArray[..., :M * K].reshape(inputArray.shape[:-1] + (M, K))
 
 def getAveragesArray(inputArray, K):
     '''
     returns averagesArray from inputArray, where each element of averagesArray
     contains the mean over non-overlapping groups of K samples of the inputArray.
     '''    
-    averagesArray = []
-    # N is the size of the input data array:
-    N = len(inputArray)
-    # K is the number of points to group and average:
-    K = int(K)
-    if K < 1:
-        K = 1
-    if K > N:
-        K = N
-    # M is number of groups:
-    M = N // K
-    for i in range(M):
-        i0 = i * K            
-        averagesArray.append(sum(inputArray[i0 : i0 + K]) / K)        
-    return averagesArray
+    return getBlocks(np.asarray(inputArray, dtype = np.float64), K).mean(axis = -1)
 
 def getMinMaxArray(inputArray, K):
     '''
     returns minArray and naxArray from inputArray, where each element of the output arrays
     contain the min or max over non-overlapping groups of K samples of the inputArray.    
     '''
-    minArray = []
-    maxArray = []
-    # N is the size of the input data array:
-    N = len(inputArray)
-    # K is the number of points to group and average:
-    if K < 1:
-        K = 1
-    if K > N:
-        K = N
-    # M is number of groups:
-    M = N // K
-    for i in range(M):
-        i0 = i * K            
-        minArray.append(min(inputArray[i0 : i0 + K]))
-        maxArray.append(max(inputArray[i0 : i0 + K]))        
-    return minArray, maxArray
+    blocks = getBlocks(inputArray, K)
+    return blocks.min(axis = -1), blocks.max(axis = -1)
 
 def getFirstItemArray(inputArray, K):
     '''
     returns firstItems from inputArray, where each element of firstItems
     contains the first element from each non-overlapping group of K samples of the inputArray.
     '''
-    firstItems = []
-     # N is the size of the input data array:
-    N = len(inputArray)
-    # K is the number of points to group and average:
-    if K < 1:
-        K = 1
-    if K > N:
-        K = N
-    # M is number of groups:
-    M = N // K
-    for i in range(M):
-        i0 = i * K            
-        firstItems.append(inputArray[i0])
-    return firstItems
+    return getBlocks(inputArray, K)[..., 0]
+
+def lagDiffSumSquares(inputArray, lags, method = 'direct'):
+    '''
+    For each K in lags, returns the sum over i of (inputArray[i + K] - inputArray[i]) ** 2
+    and the number of differences summed, N = len(inputArray) - K.
+    :param inputArray: list or numpy array of float
+    :param lags: list or numpy array of int lags, each 0 < K < len(inputArray)
+    :param method: 'direct' takes the differences for each lag as a single array operation.
+                   'fft' computes all lags at once from the autocorrelation and cumulative sums of squares.
+                   It is faster for many lags on long arrays, but agrees with 'direct' only to rounding error.
+    :return (sums, counts): numpy arrays of float and int corresponding to lags
+    '''
+    x = np.asarray(inputArray, dtype = np.float64)
+    lags = np.asarray(lags, dtype = np.int64)
+    M = len(x)
+    counts = M - lags
+    if method == 'fft':
+        # differences don't depend on the mean, and removing it keeps the products well-conditioned:
+        x = x - x.mean()
+        # sum(x[i] * x[i + K]) for all K, zero-padded to avoid circular wrap-around:
+        nfft = 1 << int(2 * M - 1).bit_length()
+        spectrum = np.fft.rfft(x, nfft)
+        autocorr = np.fft.irfft(spectrum * np.conj(spectrum), nfft)[:M]
+        # sum(x[i] ** 2) for i < M - K plus sum(x[i] ** 2) for i >= K:
+        cumSquares = np.concatenate(([0.0], np.cumsum(x * x)))
+        sums = cumSquares[counts] + (cumSquares[M] - cumSquares[lags]) - 2.0 * autocorr[lags]
+        # rounding can leave tiny negative values where the true sum is zero:
+        np.maximum(sums, 0.0, out = sums)
+    elif method == 'direct':
+        sums = np.empty(len(lags))
+        diff = np.empty(M)
+        for i, K in enumerate(lags):
+            d = np.subtract(x[K:], x[:M - K], out = diff[:M - K])
+            sums[i] = np.dot(d, d)
+    else:
+        raise ValueError('unknown method: {}'.format(method))
+    return sums, counts
 
 def unwrapPhase(inputArray, period = 2 * np.pi):
     '''
     Unwrap phase in the provided inputArray
     :param inputArray:
     '''
-    return np.unwrap(inputArray, period = period).tolist()
+    return np.unwrap(np.asarray(inputArray, dtype = np.float64), period = period)
@@ -0,0 +1,172 @@
+'''
+Reduce long time series to about as many points as can be seen in a plot.
+Each method takes x values and one or more y columns and returns new, shorter arrays;
+the inputs are never modified.  Buckets cover every sample, including any partial bucket at the end.
+Methods are looked up by name in DECIMATORS, and others may be added with registerDecimator().
+'''
+from typing import Callable, Dict, List, Tuple
+import numpy as np
+import warnings
+
+MINMAX = 'minmax'   # the samples with the min and max of the first column in each bucket: keeps spikes and the envelope
+LTTB = 'lttb'       # Largest-Triangle-Three-Buckets: one sample per bucket chosen to preserve the visual shape
+MEAN = 'mean'       # the mean of x and each column in each bucket: smooths noise
+NONE = 'none'       # no reduction
+
+DEFAULT_METHOD = MINMAX
+
+def getBucketSize(N: int, numBuckets: int) -> int:
+    '''
+    :param N: number of samples
+    :param numBuckets: desired number of buckets
+    :return number of samples per bucket so that there are at most numBuckets, the last possibly partial
+    '''
+    return max(-(-N // max(int(numBuckets), 1)), 1)
+
+def getPaddedBlocks(inputArray: np.ndarray, K: int, fill) -> np.ndarray:
+    '''
+    Like Common.getBlocks() but padding the last group with fill rather than dropping it
+    :param inputArray: numpy array of shape (N,)
+    :param K: number of points per group
+    :param fill: value for the padding
+    :return numpy array of shape (M, K) where M = ceil(N / K)
+    '''
+    N = len(inputArray)
+    M = -(-N // K)
+    if M * K == N:
+        return inputArray.reshape(M, K)
+    padded = np.full(M * K, fill, dtype = inputArray.dtype)
+    padded[:N] = inputArray
+    return padded.reshape(M, K)
+
+def toNumeric(x: np.ndarray) -> np.ndarray:
+    '''
+    :param x: numpy array of numbers or datetime64
+    :return x as float64, with datetime64 as microseconds
+    '''
+    if x.dtype.kind == 'M':
+        return x.astype('datetime64[us]').astype(np.int64).astype(np.float64)
+    return x.astype(np.float64, copy = False)
+
+def minMaxIndices(x: np.ndarray, y: np.ndarray, numPoints: int) -> np.ndarray:
+    '''
+    Select the samples with the min and max y in each of numPoints / 2 buckets, in time order
+    :return numpy array of int indices
+    '''
+    N = len(y)
+    K = getBucketSize(N, numPoints // 2)
+    offsets = np.arange(0, N, K)
+    # pad so that the padding is never selected:
+    iMin = getPaddedBlocks(y, K, np.inf).argmin(axis = 1) + offsets
+    iMax = getPaddedBlocks(y, K, -np.inf).argmax(axis = 1) + offsets
+    # keep the pair in the order they occur:
+    return np.stack((np.minimum(iMin, iMax), np.maximum(iMin, iMax)), axis = 1).ravel()
+
+def lttbIndices(x: np.ndarray, y: np.ndarray, numPoints: int) -> np.ndarray:
+    '''
+    Select one sample per bucket by Largest-Triangle-Three-Buckets (Steinarsson 2013).
+    The first and last samples are always kept.  The triangle areas of all candidates are
+    computed as arrays; only the choice of each bucket's apex depends on the one before.
+    :return numpy array of int indices
+    '''
+    N = len(y)
+    if numPoints < 3 or N <= numPoints:
+        return np.arange(N)
+    x = toNumeric(x)
+    y = y.astype(np.float64, copy = False)
+    # buckets of the interior samples:
+    K = getBucketSize(N - 2, numPoints - 2)
+    bx = getPaddedBlocks(x[1:-1], K, np.nan)
+    by = getPaddedBlocks(y[1:-1], K, np.nan)
+    counts = np.full(len(bx), K)
+    counts[-1] = (N - 2) - K * (len(bx) - 1)
+    # third point of each triangle: the average of the next bucket, or the last sample:
+    with warnings.catch_warnings():
+        # buckets of all NaN data give NaN:
+        warnings.simplefilter('ignore', RuntimeWarning)
+        cx = np.append(np.nanmean(bx[1:], axis = 1), x[-1])
+        cy = np.append(np.nanmean(by[1:], axis = 1), y[-1])
+    # twice the triangle area with apex A is |a + b * Ax + c * Ay| for each candidate B:
+    a = bx * cy[:, None] - cx[:, None] * by
+    b = by - cy[:, None]
+    c = cx[:, None] - bx
+    indices = np.empty(len(bx) + 2, dtype = np.int64)
+    indices[0] = 0
+    indices[-1] = N - 1
+    ax = x[0]
+    ay = y[0]
+    for i in range(len(bx)):
+        area = np.abs(a[i, :counts[i]] + b[i, :counts[i]] * ax + c[i, :counts[i]] * ay)
+        j = int(np.nanargmax(area)) if not np.all(np.isnan(area)) else 0
+        ax = bx[i, j]
+        ay = by[i, j]
+        indices[i + 1] = 1 + i * K + j
+    return indices
+
+def decimateByIndex(selector: Callable) -> Callable:
+    '''
+    Make a decimator which takes the same samples from x and every column, chosen by selector from the first column
+    :param selector: function(x, y, numPoints) returning int indices
+    :return decimator function as for DECIMATORS
+    '''
+    def decimator(x: np.ndarray, columns: List[np.ndarray], numPoints: int) -> Tuple[np.ndarray, List[np.ndarray]]:
+        indices = selector(x, columns[0], numPoints)
+        return x[indices], [column[indices] for column in columns]
+    return decimator
+
+def meanDecimator(x: np.ndarray, columns: List[np.ndarray], numPoints: int) -> Tuple[np.ndarray, List[np.ndarray]]:
+    '''
+    Average x and every column over each of numPoints buckets
+    '''
+    N = len(x)
+    K = getBucketSize(N, numPoints)
+    starts = np.arange(0, N, K)
+    counts = np.diff(np.append(starts, N))
+    def means(array):
+        return np.add.reduceat(array, starts) / counts
+    # average x relative to the first, for precision with datetime64:
+    xNumeric = toNumeric(x)
+    xMeans = means(xNumeric - xNumeric[0]) + xNumeric[0]
+    if x.dtype.kind == 'M':
+        xMeans = np.round(xMeans).astype(np.int64).astype('datetime64[us]').astype(x.dtype)
+    return xMeans, [means(column) for column in columns]
+
+# decimator functions by name.  Each is function(x, columns, numPoints) -> (x, columns)
+DECIMATORS: Dict[str, Callable] = {
+    MINMAX: decimateByIndex(minMaxIndices),
+    LTTB: decimateByIndex(lttbIndices),
+    MEAN: meanDecimator,
+}
+
+def registerDecimator(name: str, decimator: Callable):
+    '''
+    Add or replace a decimation method
+    :param name: str to select it, as in PlotEl.DECIMATION
+    :param decimator: function(x, columns, numPoints) -> (x, columns), returning new arrays
+    '''
+    DECIMATORS[name.strip().lower()] = decimator
+
+def decimate(method: str, x, columns: List, numPoints: int) -> Tuple[np.ndarray, List[np.ndarray]]:
+    '''
+    Reduce x and the columns to about numPoints samples
+    :param method: name in DECIMATORS, or NONE
+    :param x: list or numpy array of x values, numbers or datetime64
+    :param columns: list of lists or numpy arrays of y values, each the same length as x.  The first is used to select samples.
+    :param numPoints: about how many samples to return.  Series no longer than this are returned unchanged.
+    :return (x, columns) as new numpy arrays
+    :raise ValueError if the method is unknown or the lengths do not match
+    '''
+    x = np.array(x)
+    if x.dtype == object:
+        # such as a list of datetime:
+        x = x.astype('datetime64[us]')
+    columns = [np.array(column, dtype = np.float64) for column in columns]
+    if any(len(column) != len(x) for column in columns):
+        raise ValueError('decimate: columns must be the same length as x')
+    method = (method or NONE).strip().lower()
+    if method == NONE or not columns or not numPoints or len(x) <= numPoints:
+        return x, columns
+    decimator = DECIMATORS.get(method, None)
+    if decimator is None:
+        raise ValueError('decimate: unknown method "{}"'.format(method))
+    return decimator(x, columns, int(numPoints))
@@ -1,9 +1,12 @@
 '''
 Use the Fast Fourier Transform functions from numpy.fft 
 '''
+from Calculate.CalcResult import CalcResult
+from Calculate import SpecCompliance
+from Calculate.SpecCompliance import SpecLine
+from AmpPhaseDataLib.Constants import Units
 import numpy as np
-import bisect
-from math import sqrt, fabs
+from math import sqrt
 
 
 
@@ -22,21 +25,50 @@ class FFT(object):
         '''
         Reset members to just-constructed state
         '''
-        self.xResult = None
-        self.yResult = None
-        self.binSize = None
+        self.result = None
+        self.numSegments = None
+        # cached by (fundamental, window), or None for no mask:
+        self.harmonicMasks = {}
+        self.cumulativePower = {}
         
-    def calculate(self, dataSeries, tau0Seconds):
+    @property
+    def xResult(self):
+        return self.result.x if self.result is not None else None
+
+    @property
+    def yResult(self):
+        return self.result.y if self.result is not None else None
+
+    @property
+    def binSize(self):
+        return self.result.binSize if self.result is not None else None
+
+    def setResult(self, result):
+        '''
+        Use a result calculated previously, such as from a cache, as if returned by calculate()
+        :param result: CalcResult
+        '''
+        self.__reset()
+        self.result = result
+
+    def calculate(self, dataSeries, tau0Seconds, segmentSeconds = None, overlap = 0.5, window = 'hann'):
         '''
         calculate the real FFT of the dataSeries
         :param dataSeries:  list of float
         :param tau0Seconds: float sampling interval
-        :return bool success
+        :param segmentSeconds: if given, average the spectra of segments of this length (Welch's method)
+                               instead of taking one FFT of the whole dataSeries.
+        :param overlap: fraction 0 <= overlap < 1 by which consecutive segments overlap
+        :param window: name of the window applied to each segment. See WINDOWS.
+        :return CalcResult if successful, otherwise None
+                Also stored in self.result, with its x, y and binSize available as self.xResult, self.yResult, self.binSize
         '''
         self.__reset()
         n = len(dataSeries)
         if n < 1 or tau0Seconds <= 0:
-            return False
+            return None
+        if segmentSeconds:
+            return self.__calculateWelch(dataSeries, tau0Seconds, segmentSeconds, overlap, window)
         fSampling = 1 / tau0Seconds
         # real FFT, normalized amplitude:
         fourierTransform = np.fft.rfft(dataSeries) / n
@@ -45,30 +77,70 @@ class FFT(object):
         # make array of bin numbers:
         binNums = np.arange(len(fourierTransform))
         # scale bin numbers to frequencies:
-        self.binSize = (fSampling / n)
-        frequencies = binNums * self.binSize
-        # return frequencies as xResult:
-        self.xResult = frequencies.tolist();
-        # return amplitude spectral density as yResult:
-        self.yResult = abs(fourierTransform).tolist()
-        return True
+        binSize = (fSampling / n)
+        frequencies = binNums * binSize
+        # return frequencies as x and amplitude spectral density as y:
+        self.result = CalcResult(frequencies, np.abs(fourierTransform), tau0Seconds = tau0Seconds, 
+                                 xUnits = Units.HZ.value, binSize = binSize)
+        return self.result
+
+    # window functions by name, taking the segment length:
+    WINDOWS = {
+        'rect': np.ones,
+        'hann': np.hanning,
+        'hamming': np.hamming,
+        'blackman': np.blackman
+    }
+
+    # number of segments transformed together, bounding memory to a multiple of the segment length:
+    SEGMENTS_PER_BATCH = 64
+
+    def __calculateWelch(self, dataSeries, tau0Seconds, segmentSeconds, overlap, window):
+        '''
+        Private implementation of calculate() averaging the power of windowed, overlapping segments.
+        yResult is scaled like the single FFT, so that RMSfromFFT() gives the RMS of the dataSeries:
+        the window's equivalent noise bandwidth is corrected for, so the noise level is preserved but
+        a pure tone appears lower by the window's coherent gain.
+        The mean is removed before windowing so that it does not leak into the low bins, and is reported as the DC bin.
+        '''
+        if window not in self.WINDOWS or not 0 <= overlap < 1:
+            return None
+        dataSeries = np.asarray(dataSeries, dtype = np.float64)
+        n = len(dataSeries)
+        # points per segment and step between segments:
+        nSeg = min(max(int(round(segmentSeconds / tau0Seconds)), 2), n)
+        step = max(int(round(nSeg * (1 - overlap))), 1)
+        win = self.WINDOWS[window](nSeg)
+        # window power, for the equivalent noise bandwidth correction:
+        winPower = np.dot(win, win)
+        
+        mean = dataSeries.mean()
+        segments = np.lib.stride_tricks.sliding_window_view(dataSeries, nSeg)[::step]
+        self.numSegments = len(segments)
+        sumPower = np.zeros(nSeg // 2 + 1)
+        for i in range(0, self.numSegments, self.SEGMENTS_PER_BATCH):
+            batch = (segments[i : i + self.SEGMENTS_PER_BATCH] - mean) * win
+            spectra = np.fft.rfft(batch, axis = 1)
+            sumPower += np.sum(spectra.real ** 2 + spectra.imag ** 2, axis = 0)
+
+        # mean power per bin, scaled so that a rect window over one segment matches the single FFT:
+        spectrum = 2 * np.sqrt(sumPower / (self.numSegments * nSeg * winPower))
+        spectrum[0] = abs(mean)
+        binSize = 1 / (tau0Seconds * nSeg)
+        self.result = CalcResult(np.arange(len(spectrum)) * binSize, spectrum, tau0Seconds = tau0Seconds, 
+                                 xUnits = Units.HZ.value, binSize = binSize)
+        return self.result
     
     def checkFFTSpec(self, minFreqHz, maxFreqHz, specLimit):
         '''
-        Test whether the calculated spectrum is below a given spec line.
+        Test whether the calculated spectrum is below a given spec line, as by SpecCompliance.checkSpecLine()
         Must be called after calculate()
         :param minFreqHz: lower frequency limit for the spec.
         :param maxFreqHz: upper frequency limit for the spec.  Must be >= minFreqHz.
         :param specLimit: maximum linear FFT value allowed in the range.
         :return True/False meets the spec
         '''
-        # find the first and last bins to include in the calculation:
-        iLower, iUpper = self.__findFreqRange(minFreqHz, maxFreqHz)
-        
-        for y in self.yResult[iLower:iUpper]:
-            if y > specLimit:
-                return False
-        return True
+        return SpecCompliance.checkSpecLine(self.result, SpecLine([minFreqHz, maxFreqHz], [specLimit, specLimit])).complies
 
     def isHarmonic(self, freq, fundamental = 60, window = 3):
         '''
@@ -91,10 +163,45 @@ class FFT(object):
             return True
         return False 
 
+    def getHarmonicMask(self, fundamental = 60, window = 3):
+        '''
+        Vectorized isHarmonic() over all the bins of xResult.  Computed once per (fundamental, window).
+        Must be called after calculate()
+        :param fundamental: int frequency Hz
+        :param window: offset Hz. How many Hz away is still considered part of the harmonic
+        :return numpy array of bool corresponding to xResult
+        '''
+        key = (int(fundamental), window)
+        mask = self.harmonicMasks.get(key, None)
+        if mask is None:
+            fund = key[0]
+            freq = self.xResult
+            harm1 = (np.trunc(freq) // fund) * fund
+            harm0 = harm1 - fund
+            harm2 = harm1 + fund
+            mask = (harm0 > 0) & ((harm0 - window) <= freq) & (freq <= (harm0 + window))
+            mask |= (harm1 > 0) & ((harm1 - window) <= freq) & (freq <= (harm1 + window))
+            mask |= ((harm2 - window) <= freq) & (freq <= (harm2 + window))
+            self.harmonicMasks[key] = mask
+        return mask
+
+    def getHarmonics(self, fundamental = 60, window = 3):
+        '''
+        Get the bins which are harmonics of the fundamental, such as for highlighting on a plot.
+        Must be called after calculate()
+        :param fundamental: int frequency Hz
+        :param window: offset Hz. How many Hz away is still considered part of the harmonic
+        :return (xArray, yArray): numpy arrays of the matching frequencies and values
+        '''
+        mask = self.getHarmonicMask(fundamental, window)
+        return self.xResult[mask], self.yResult[mask]
+
     def RMSfromFFT(self, minFreqHz = 0, maxFreqHz = 0, includeDC = False, ignoreHarmonicsOf = None, ignoreHarmonicsWindow = 3):
         '''
         Calculate the RMS noise in the specified bandwidth using the FFT outputs from calculate() 
         Must be called after calculate()
+        The first query for each ignoreHarmonicsOf and ignoreHarmonicsWindow makes a cumulative sum
+        of the bins' powers, so each further query takes constant time.
         :param minFreqHz: Lowest frequency to include. If 0, may include the DC term.
         :param maxFreqHz: Highest frequency to include. If 0, include all frequencies. Must be >= minFreqHz.
         :param includeDC: If True, add the DC term to the RMS, otherwise dont include it even if minFreqHz == 0
@@ -104,29 +211,26 @@ class FFT(object):
         # find the first and last bins to include in the calculation:
         iLower, iUpper = self.__findFreqRange(minFreqHz, maxFreqHz)
         
-        # filter out harmonics if specified:
-        if ignoreHarmonicsOf:
-            y2 = []
-            for f, y in zip(self.xResult, self.yResult):
-                if self.isHarmonic(f, ignoreHarmonicsOf, ignoreHarmonicsWindow):
-                    y2.append(0)
-                else:
-                    y2.append(y)
-        else:
-            y2 = self.yResult
+        # cumulative sums of the bins' powers, with harmonics filtered out if specified:
+        key = (int(ignoreHarmonicsOf), ignoreHarmonicsWindow) if ignoreHarmonicsOf else None
+        cumPower = self.cumulativePower.get(key, None)
+        if cumPower is None:
+            # bin / sqrt(2) : convert linear FTT to RMS
+            # ** 2 : to take the sum of squares
+            power = np.square(self.yResult) / 2
+            if key:
+                power[self.getHarmonicMask(*key)] = 0
+            cumPower = np.concatenate(([0.0], np.cumsum(power)))
+            self.cumulativePower[key] = cumPower
+        # power of a single bin:
+        binPower = lambda i: cumPower[i + 1] - cumPower[i]
             
-        # we will sum the squares of the bins after converting each bin to RMS:
-        #   bin / sqrt(2) : convert linear FTT to RMS
-        #   RMS * 0.5 : for the two endPoint bins
-        #   ** 2 : to take the sum of squares
-        f = lambda y, endPoint: (y * (0.5 if endPoint else 1) / sqrt(2)) ** 2
-        
         # sum the squares of all the non endPoint bins:
-        sumSq = sum([f(y, False) for y in y2[iLower + 1 : iUpper - 1]] )
-        # add in the lower endPoint bin if it is not the [0] DC bin:
-        sumSq += f(y2[iLower], True) if (iLower > 0) else 0
+        sumSq = cumPower[max(iUpper - 1, iLower + 1)] - cumPower[iLower + 1]
+        # add in the lower endPoint bin if it is not the [0] DC bin, RMS * 0.5 for endPoint bins:
+        sumSq += binPower(iLower) * 0.25 if (iLower > 0) else 0
         # add in the upper endPoint bin:
-        sumSq += f(y2[iUpper-1], True)
+        sumSq += binPower(iUpper - 1) * 0.25
         # take the sqrt to get the overall RMS:
         RMS = sqrt(sumSq)
         # If we want to include the DC bin, just add it in.  It has already been effectively /2 in calculate():
@@ -151,7 +255,4 @@ class FFT(object):
         :param maxFreqHz: upper frequency limit for to find. If 0, include all frequencies. Must be >= minFreqHz.
         :return (iLower, iUpper): tuple of the first and last+1 indexes of self.xResult.
         '''
-        iLower = bisect.bisect_left(self.xResult, minFreqHz) if minFreqHz else 0
-        iUpper = bisect.bisect_right(self.xResult, maxFreqHz) if maxFreqHz else len(self.xResult)
-        return (iLower, iUpper)
-        
\ No newline at end of file
+        return self.result.findRange(minFreqHz, maxFreqHz)
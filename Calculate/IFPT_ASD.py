@@ -1,5 +1,5 @@
 """
-This script, along with allantools.py are deployed to the ALMA BE IFP Test set
+This script, along with allantools.py and Common.py are deployed to the ALMA BE IFP Test set
 """
 
 import numpy as np
@@ -7,6 +7,10 @@ try:
     from allantools import adev as allantools_adev
 except:
     from .allantools import adev as allantools_adev
+try:
+    from Common import getAveragesArray
+except:
+    from .Common import getAveragesArray
     
 def AllanDev(config, data):
     """Allan standard deviation to be called from IFP Testset LabVIEW code
@@ -29,8 +33,8 @@ def AllanDev(config, data):
     t_stop = config[3]
 
     # normalize
-    x0 = np.mean(data)
-    data = [x / x0 for x in data]
+    data = np.asarray(data, dtype = np.float64)
+    data = data / np.mean(data)
 
     # boxcar average data:
     if delta_t < tau:
@@ -65,24 +69,3 @@ def AllanDev(config, data):
     
     # convert from numpy.ndarray to list:
     return (taus.tolist(), adev.tolist(), aderr.tolist())
-    
-def getAveragesArray(inputArray, K):
-    '''
-    returns averagesArray from inputArray, where each element of averagesArray
-    contains the mean over non-overlapping groups of K samples of the inputArray.
-    '''    
-    averagesArray = []
-    # N is the size of the input data array:
-    N = len(inputArray)
-    # K is the number of points to group and average:
-    K = int(K)
-    if K < 1:
-        K = 1
-    if K > N:
-        K = N
-    # M is number of groups:
-    M = N // K
-    for i in range(M):
-        i0 = i * K            
-        averagesArray.append(sum(inputArray[i0 : i0 + K]) / K)        
-    return averagesArray
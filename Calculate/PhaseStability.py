@@ -1,6 +1,9 @@
-from Calculate.Common import getAveragesArray, unwrapPhase
-from math import sqrt
-import bisect
+from Calculate.Common import getAveragesArray, lagDiffSumSquares, unwrapPhase
+from Calculate.CalcResult import CalcResult
+from Calculate import SpecCompliance
+from Calculate.SpecCompliance import SpecLine
+from AmpPhaseDataLib.Constants import Units
+import numpy as np
 
 class PhaseStability(object):
     '''
@@ -23,19 +26,39 @@ class PhaseStability(object):
         '''
         Reset members to just-constructed state
         '''
-        self.xResult = None
-        self.yResult = None  
-        self.yError = None  
+        self.result = None
         self.freqRFGHz = None
 
-    def calculate(self, dataSeries, tau0Seconds = 1.0, TMin = 10.0, TMax = 300.0, freqRFGHz = None):
+    @property
+    def xResult(self):
+        return self.result.x if self.result is not None else None
+
+    @property
+    def yResult(self):
+        return self.result.y if self.result is not None else None
+
+    @property
+    def yError(self):
+        return self.result.yError if self.result is not None else None
+
+    def setResult(self, result):
+        '''
+        Use a result calculated previously, such as from a cache, as if returned by calculate()
+        :param result: CalcResult
+        '''
+        self.__reset()
+        self.result = result
+
+    def calculate(self, dataSeries, tau0Seconds = 1.0, TMin = 10.0, TMax = 300.0, freqRFGHz = None, method = 'direct'):
         '''
         :param dataSeries:  list of float degrees phases to analyze
         :param tau0Seconds: integration time of the dataSeries
         :param TMin: float shortest time differencing interval to plot
         :param TMax: float longest time differencing interval to plot
         :param freqRFGHz:  if provided, the Allan dev yResult will be returned in fs rather than degreees
-        :return True if successful, otherwise False
+        :param method: 'direct' or 'fft'.  See Calculate.Common.lagDiffSumSquares
+        :return CalcResult if successful, otherwise None
+                Also stored in self.result, with its x, y, yError available as self.xResult, self.yResult, self.yError
         '''
         # clear anything kept from last run:
         self.__reset()
@@ -46,7 +69,7 @@ class PhaseStability(object):
 
         # if we have less than 2 * NMin samples, abort:
         if len(dataSeries) < (2 * NMin):
-            return False
+            return None
 
         # compute new TMin rounded down to whole tau0 intervals:
         TMin = tau0Seconds * NMin        
@@ -72,19 +95,14 @@ class PhaseStability(object):
 
         NMax = int(TMax / TMin)
    
-        self.xResult = []
-        self.yResult = []
-        self.yError = []
-        for K in range(NMin, NMax):
-            # calculate T for this iteration and save to the output time array:
-            self.xResult.append(K * TMin)
-            # calculate ADev for this iteration and save to the output Allan array:
-            adev, aderr, adn = self.ADev(averagesArray, K)
-            self.yResult.append(adev)
-            self.yError.append(aderr)
-        return True
+        # compute all the intervals in one call:
+        lags = np.arange(NMin, NMax)
+        adev, aderr, adn = self.ADev(averagesArray, lags, method)
+        self.result = CalcResult(lags * TMin, adev, aderr, adn, tau0Seconds, xUnits = Units.SECONDS.value,
+                                 yUnits = Units.FS.value if self.freqRFGHz else Units.DEG.value)
+        return self.result
         
-    def ADev(self, inputArray, K):
+    def ADev(self, inputArray, K, method = 'direct'):
         '''
         Returns the 2-point Allan standard deviation of an inputArray
         ADev = sqrt(0.5 * < [phi.tau(t + T) - phi.tau(t)] ^ 2 >) where
@@ -93,36 +111,29 @@ class PhaseStability(object):
         If freqRFGHz>0 compute devs converted to fs at the given frequency.
         
         :param inputArray: list of float to calculate the statistic on
-        :param K: distance offset within the list for this iteration
-        :return (adev, aderr, adn):  The Allan deviation, the error bar size, and the number of differences used
+        :param K: distance offset within the list for this iteration, or an array of offsets
+        :param method: 'direct' or 'fft'.  See Calculate.Common.lagDiffSumSquares
+        :return (adev, aderr, adn):  The Allan deviation, the error bar size, and the number of differences used.
+                                     Numpy arrays corresponding to K if K is an array.
         '''
         # conversion factor for fs per degree:
-        fsDeg = None
+        fsDeg = 1.0
         if self.freqRFGHz:
             period = 1.0 / (float(self.freqRFGHz) * 1.0e9)
             fsDeg = (period * 1.0e15) / 360.0        
         
-        M = len(inputArray)
-        N = 0
-        total = 0
-        for aIndex in range(M - K):
-            # accumulate a sum of squares of differences...
-            diff = inputArray[aIndex] - inputArray[aIndex + K]
-            # optionally converted to fs:
-            if (fsDeg):
-                diff *= fsDeg
-            total += diff ** 2.0
-            N += 1
+        total, N = lagDiffSumSquares(inputArray, np.atleast_1d(K), method)
         
-        # and multiply by 0.5, divide by the number of differences, take the square root for standard deviation: 
-        adev = sqrt(0.5 * total / N)        
-        aderr = adev / sqrt(N)
-        adn = N
-        return (adev, aderr, adn)
+        # multiply by 0.5, divide by the number of differences, take the square root for standard deviation: 
+        adev = np.sqrt(0.5 * total / N) * fsDeg
+        aderr = adev / np.sqrt(N)
+        if np.ndim(K) == 0:
+            return (float(adev[0]), float(aderr[0]), int(N[0]))
+        return (adev, aderr, N)
     
     def checkSpecLine(self, TMin, TMax, specMin, specMax):
         '''
-        Test whether the calculated AVAR is below a given spec line.
+        Test whether the calculated AVAR is below a given spec line, interpolated as by SpecCompliance.checkSpecLine()
         Must be called after calculate()
         :param TMin:  Lower time (x) limit of spec line
         :param TMax:  Upper time (x) limit of spec line
@@ -130,36 +141,4 @@ class PhaseStability(object):
         :param specMax: ADEV (y) value at TMax
         :return True/False
         '''
-        # find the time range spanned:
-        iLower, iUpper = self.__findTimeRange(TMin, TMax)
-        
-        # check for TMin == TMax or out of bounds:
-        if iUpper <= iLower:
-            iUpper = iLower + 1
-            
-        # exit early for single-point spec:
-        if iUpper == iLower + 1:
-            return self.yResult[iLower] <= specMin
-
-        # get the slope between the endpoints:        
-        slope = (specMax - specMin) / (iUpper - iLower - 1)
-
-        # compare result to spec, advancing the specY limit by slope at each step:
-        specY = specMin
-        for y in self.yResult[iLower:iUpper]:
-            if y > specY:
-                return False
-            else:
-                specY += slope
-        return True
-
-    def __findTimeRange(self, TMin, TMax):
-        '''
-        Private helper to find the indices corresponding to the provided time range.
-        :param TMin: lower time limit to find.
-        :param TMax: upper time limit for to find. Must be >= TMin.
-        :return (iLower, iUpper): tuple of the first and last+1 indexes of self.xResult.
-        '''
-        iLower = bisect.bisect_left(self.xResult, TMin) if TMin else 0
-        iUpper = bisect.bisect_right(self.xResult, TMax) if TMax else len(self.xResult)
-        return (iLower, iUpper)    
\ No newline at end of file
+        return SpecCompliance.checkSpecLine(self.result, SpecLine([TMin, TMax], [specMin, specMax])).complies
@@ -0,0 +1,165 @@
+'''
+Compare calculated results to piecewise spec lines, without plotting.
+'''
+from Calculate.CalcResult import CalcResult
+import numpy as np
+
+class SpecLine(object):
+    '''
+    A spec line made of one or more (x, y) points, interpolated in log-log space between them.
+    Either axis falls back to linear interpolation if it has values <= 0.
+    Results above the line, anywhere in its x range, fail the spec.
+    '''
+    __slots__ = ('x', 'y', 'logX', 'logY', 'name')
+
+    def __init__(self, x, y, logX = True, logY = True, name = None):
+        '''
+        Constructor
+        :param x: list of float, ascending.  Repeat an x to make a step; the lower limit applies at the step.
+        :param y: list of float limits corresponding to x
+        :param logX: if True and all x > 0, interpolate in log(x)
+        :param logY: if True and all y > 0, interpolate in log(y)
+        :param name: optional label, such as from SPEC1_NAME
+        '''
+        self.x = np.atleast_1d(np.asarray(x, dtype = np.float64))
+        self.y = np.atleast_1d(np.asarray(y, dtype = np.float64))
+        if not len(self.x) or len(self.x) != len(self.y):
+            raise ValueError('SpecLine requires matching, non-empty x and y')
+        if np.any(np.diff(self.x) < 0):
+            raise ValueError('SpecLine x must be ascending')
+        self.logX = bool(logX and np.all(self.x > 0))
+        self.logY = bool(logY and np.all(self.y > 0))
+        self.name = name
+
+    @classmethod
+    def fromStr(cls, spec, logX = True, logY = True, name = None):
+        '''
+        Parse a spec line like those in SpecLines
+        :param spec: str "x1, y1, x2, y2[, x3, y3...]" or a single point "x, y".
+                     Also accepts the RMS form "f1, f2, limit" as a flat line from f1 to f2.
+        :return SpecLine
+        '''
+        values = [float(item) for item in spec.split(',')]
+        if len(values) == 3:
+            return cls([values[0], values[1]], [values[2], values[2]], logX, logY, name)
+        if len(values) < 2 or len(values) % 2:
+            raise ValueError('SpecLine.fromStr: expected x, y pairs: "{}"'.format(spec))
+        return cls(values[0::2], values[1::2], logX, logY, name)
+
+    @property
+    def xMin(self):
+        return float(self.x[0])
+
+    @property
+    def xMax(self):
+        return float(self.x[-1])
+
+    def limits(self, x):
+        '''
+        Interpolate the spec limit at each x
+        :param x: float or numpy array of float, within [xMin, xMax]
+        :return numpy array of float limits
+        '''
+        x = np.atleast_1d(np.asarray(x, dtype = np.float64))
+        if len(self.x) == 1:
+            return np.full(len(x), self.y[0])
+        xp = self.x
+        if self.logX:
+            x = np.log10(np.maximum(x, np.finfo(np.float64).tiny))
+            xp = np.log10(xp)
+        # find the segment each side of x, so that the lower limit applies at any step:
+        last = len(xp) - 2
+        return np.minimum(self.__interpolate(x, xp, np.clip(np.searchsorted(xp, x, side = 'left') - 1, 0, last)),
+                          self.__interpolate(x, xp, np.clip(np.searchsorted(xp, x, side = 'right') - 1, 0, last)))
+
+    def __interpolate(self, x, xp, segment):
+        '''
+        Private helper to interpolate along the given segments.
+        Flat segments give exactly their y value.
+        '''
+        x0 = xp[segment]
+        dx = xp[segment + 1] - x0
+        t = np.clip(np.divide(x - x0, dx, out = np.zeros(len(x)), where = dx > 0), 0, 1)
+        y0 = self.y[segment]
+        y1 = self.y[segment + 1]
+        if self.logY:
+            return y0 * np.power(y1 / y0, t)
+        return y0 + t * (y1 - y0)
+
+class SpecCheck(object):
+    '''
+    The outcome of comparing a result to one SpecLine.
+    margin is the largest excess of y over the limit, in decades if the spec is log in y, else in y units.
+    Negative margin means the spec is met with room to spare.
+    '''
+    __slots__ = ('specLine', 'complies', 'margin', 'worstX', 'worstY', 'worstLimit', 'numPoints')
+
+    def __init__(self, specLine, complies, margin = None, worstX = None, worstY = None, worstLimit = None, numPoints = 0):
+        '''
+        Constructor
+        :param specLine: the SpecLine checked
+        :param complies: True/False
+        :param margin: float, see above.  None if no points were checked
+        :param worstX: x of the point with the largest margin
+        :param worstY: y of the point with the largest margin
+        :param worstLimit: spec limit at worstX
+        :param numPoints: number of result points compared
+        '''
+        self.specLine = specLine
+        self.complies = complies
+        self.margin = margin
+        self.worstX = worstX
+        self.worstY = worstY
+        self.worstLimit = worstLimit
+        self.numPoints = numPoints
+
+def checkSpecLine(result: CalcResult, specLine: SpecLine) -> SpecCheck:
+    '''
+    Test whether the result y is below the spec line at every result x in its range.
+    If no result x falls in the range, as for a single-point spec, the first result at or after xMin is used,
+    or the last result if there is none.
+    :param result: CalcResult to check
+    :param specLine: SpecLine to check against
+    :return SpecCheck
+    '''
+    if result is None or not len(result.y):
+        return SpecCheck(specLine, False)
+
+    # find the x range spanned:
+    iLower, iUpper = result.findRange(specLine.xMin, specLine.xMax)
+    iLower = min(iLower, len(result.y) - 1)
+    if iUpper <= iLower:
+        iUpper = iLower + 1
+        limits = specLine.y[:1]
+    else:
+        limits = specLine.limits(result.x[iLower:iUpper])
+
+    # compare, in log space if the spec is:
+    y = result.y[iLower:iUpper]
+    if specLine.logY:
+        with np.errstate(divide = 'ignore', invalid = 'ignore'):
+            excess = np.log10(np.maximum(y, 0)) - np.log10(limits)
+    else:
+        excess = y - limits
+    excess = np.where(np.isnan(y), np.inf, excess)
+    worst = int(np.argmax(excess))
+    return SpecCheck(specLine,
+                     complies = bool(y[worst] <= limits[worst]),
+                     margin = float(excess[worst]),
+                     worstX = float(result.x[iLower + worst]),
+                     worstY = float(y[worst]),
+                     worstLimit = float(limits[worst]),
+                     numPoints = iUpper - iLower)
+
+def checkCompliance(result: CalcResult, specLines):
+    '''
+    Test the result against several spec lines
+    :param result: CalcResult to check
+    :param specLines: list of SpecLine or str as for SpecLine.fromStr
+    :return (complies, checks): complies is True if all pass, False if any fail, None if there were no spec lines;
+                                checks is the list of SpecCheck in the order of specLines.
+    '''
+    checks = [checkSpecLine(result, SpecLine.fromStr(s) if isinstance(s, str) else s) for s in specLines]
+    if not checks:
+        return (None, checks)
+    return (all(check.complies for check in checks), checks)
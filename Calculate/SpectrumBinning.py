@@ -0,0 +1,66 @@
+'''
+Reduce a spectrum to fractional-octave bins for plotting on a log frequency axis.
+At low frequencies, where a bin holds at most one FFT bin, the spectrum is unchanged;
+at high frequencies many FFT bins are combined into each point.
+'''
+from typing import Optional, Tuple
+import numpy as np
+
+MAX = 'max'     # the largest value in each bin, at its frequency: keeps spurs and peaks
+MEAN = 'mean'   # the mean value, at the mean frequency
+RMS = 'rms'     # the root-mean-square value, at the mean frequency: keeps the RMS over any band of whole bins
+
+STATISTICS = (MAX, MEAN, RMS)
+DEFAULT_STATISTIC = MAX
+
+def logFrequencyBin(x, y, binsPerOctave: float, statistic: str = DEFAULT_STATISTIC,
+                    keepMask: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+    '''
+    Combine the points of a spectrum falling in each 1/binsPerOctave octave
+    :param x: list or numpy array of frequencies, ascending
+    :param y: list or numpy array of spectral density corresponding to x
+    :param binsPerOctave: such as 3 for third-octave bins, 24 for finer
+    :param statistic: MAX, MEAN or RMS
+    :param keepMask: optional numpy array of bool corresponding to x.  These points are kept as they are
+                     and not combined with their neighbors.  Points at x <= 0 are always kept.
+    :return (x, y) new numpy arrays
+    :raise ValueError if the statistic is unknown or binsPerOctave <= 0
+    '''
+    statistic = statistic.strip().lower()
+    if statistic not in STATISTICS:
+        raise ValueError('logFrequencyBin: unknown statistic "{}"'.format(statistic))
+    if binsPerOctave <= 0:
+        raise ValueError('logFrequencyBin: binsPerOctave must be > 0')
+    x = np.asarray(x, dtype = np.float64)
+    y = np.asarray(y, dtype = np.float64)
+    N = len(x)
+    if N < 2:
+        return x.copy(), y.copy()
+
+    keep = x <= 0
+    if keepMask is not None:
+        keep |= np.asarray(keepMask, dtype = bool)
+
+    # bin number of each point, counting from the lowest positive frequency:
+    positive = x[~keep]
+    f0 = positive.min() if len(positive) else 1.0
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+        bins = np.floor(binsPerOctave * np.log2(np.where(keep, f0, x) / f0)).astype(np.int64)
+
+    # a group starts where the bin changes and on either side of every kept point:
+    start = np.ones(N, dtype = bool)
+    start[1:] = (bins[1:] != bins[:-1]) | keep[1:] | keep[:-1]
+    starts = np.flatnonzero(start)
+    counts = np.diff(np.append(starts, N))
+
+    if statistic == MAX:
+        # the first point in each group equal to its largest value, ignoring NaN, or the start of a group of all NaN:
+        isMax = y == np.repeat(np.fmax.reduceat(y, starts), counts)
+        iMax = np.minimum.reduceat(np.where(isMax, np.arange(N), N), starts)
+        iMax = np.where(iMax < N, iMax, starts)
+        return x[iMax], y[iMax]
+
+    xMean = np.add.reduceat(x, starts) / counts
+    if statistic == MEAN:
+        return xMean, np.add.reduceat(y, starts) / counts
+    return xMean, np.sqrt(np.add.reduceat(np.square(y), starts) / counts)
@@ -0,0 +1,222 @@
+'''
+Incremental Allan statistics for live display during a measurement.
+Samples are added chunk by chunk and running sums of squared differences are kept
+for octave-spaced intervals, so that the work per chunk is proportional to the chunk size
+and the state does not grow with the length of the measurement.
+'''
+from Calculate.CalcResult import CalcResult
+from AmpPhaseDataLib.Constants import Units
+import numpy as np
+
+class AmplitudeStabilityAccumulator(object):
+    '''
+    Non-overlapping Allan variance or deviation at intervals tau0 * 2^j, as computed by AmplitudeStability.
+    Each level j holds the last complete average of 2^j samples, and any unpaired average
+    waiting to be combined into level j + 1.
+    '''
+    def __init__(self, tau0Seconds = 0.05, TMin = 0.05, TMax = 300, normalize = True, calcAdev = False):
+        '''
+        Constructor
+        :param tau0Seconds: integration time of the samples
+        :param TMin: float shortest time differencing interval to report
+        :param TMax: float longest time differencing interval to report
+        :param normalize: If true, normalize to the mean amplitude
+        :param calcAdev: If true, report ADEV instead of AVAR.
+        '''
+        self.tau0Seconds = tau0Seconds
+        self.TMin = TMin
+        self.TMax = TMax
+        self.normalize = normalize
+        self.calcAdev = calcAdev
+        # number of octave levels with 2^j * tau0Seconds <= TMax:
+        self.numLevels = max(int(np.floor(np.log2(max(TMax / tau0Seconds, 1)))) + 1, 1)
+        self.__reset()
+
+    def __reset(self):
+        '''
+        Reset members to just-constructed state
+        '''
+        self.result = None
+        self.numPoints = 0
+        self.total = 0.0
+        self.last = [None] * self.numLevels
+        self.pending = [None] * self.numLevels
+        self.sumSquares = np.zeros(self.numLevels)
+        self.counts = np.zeros(self.numLevels, dtype = np.int64)
+
+    @property
+    def xResult(self):
+        return self.result.x if self.result is not None else None
+
+    @property
+    def yResult(self):
+        return self.result.y if self.result is not None else None
+
+    @property
+    def yError(self):
+        return self.result.yError if self.result is not None else None
+
+    def reset(self):
+        '''
+        Discard all samples added so far
+        '''
+        self.__reset()
+
+    def add(self, dataSeries):
+        '''
+        Add samples following those already added
+        :param dataSeries: single or list or numpy array of float, linear amplitudes
+        '''
+        values = np.atleast_1d(np.asarray(dataSeries, dtype = np.float64))
+        self.numPoints += len(values)
+        self.total += values.sum()
+        for j in range(self.numLevels):
+            if not len(values):
+                break
+            # differences between consecutive averages at this level:
+            seq = values if self.last[j] is None else np.concatenate(([self.last[j]], values))
+            diff = np.diff(seq)
+            self.sumSquares[j] += np.dot(diff, diff)
+            self.counts[j] += len(diff)
+            self.last[j] = values[-1]
+            # pair up the averages to make the next level, holding back any odd one:
+            seq = values if self.pending[j] is None else np.concatenate(([self.pending[j]], values))
+            if len(seq) % 2:
+                self.pending[j] = seq[-1]
+                seq = seq[:-1]
+            else:
+                self.pending[j] = None
+            values = (seq[0::2] + seq[1::2]) / 2
+
+    def calculate(self):
+        '''
+        Compute the curve from the samples added so far
+        :return CalcResult as for AmplitudeStability, or None if there are not yet enough samples
+        '''
+        self.result = None
+        # at least two differences are required, as for allantools.remove_small_ns:
+        taus = self.tau0Seconds * 2.0 ** np.arange(self.numLevels)
+        use = (self.counts > 1) & (taus >= self.TMin * (1 - 1e-9))
+        if not use.any():
+            return None
+        counts = self.counts[use]
+        adev = np.sqrt(0.5 * self.sumSquares[use] / counts)
+        if self.normalize:
+            adev /= abs(self.total / self.numPoints)
+        aderr = adev / np.sqrt(counts)
+        if not self.calcAdev:
+            adev = np.square(adev)
+            aderr = np.square(aderr)
+        self.result = CalcResult(taus[use], adev, aderr, counts, self.tau0Seconds, xUnits = Units.SECONDS.value)
+        return self.result
+
+class PhaseStabilityAccumulator(object):
+    '''
+    2-point Allan standard deviation of phase at intervals T = TMin * 2^j, as computed by PhaseStability.
+    Samples are unwrapped and averaged over TMin as they arrive, and only the last TMax / TMin
+    averages are kept for taking the differences.
+    '''
+    def __init__(self, tau0Seconds = 1.0, TMin = 10.0, TMax = 300.0, freqRFGHz = None):
+        '''
+        Constructor
+        :param tau0Seconds: integration time of the samples
+        :param TMin: float shortest time differencing interval to report
+        :param TMax: float longest time differencing interval to report
+        :param freqRFGHz:  if provided, the Allan dev yResult will be returned in fs rather than degreees
+        '''
+        self.tau0Seconds = tau0Seconds
+        # number of whole tau0 intervals in TMin, and TMin rounded down to match:
+        self.NMin = max(int(TMin / tau0Seconds), 1)
+        self.TMin = tau0Seconds * self.NMin
+        self.TMax = TMax
+        self.freqRFGHz = freqRFGHz if freqRFGHz and freqRFGHz > 0.0 else None
+        # octave-spaced lags in units of TMin:
+        NMax = int(TMax / self.TMin)
+        self.lags = [1 << j for j in range(max(NMax, 1).bit_length()) if (1 << j) < NMax]
+        self.__reset()
+
+    def __reset(self):
+        '''
+        Reset members to just-constructed state
+        '''
+        self.result = None
+        self.lastPhase = None
+        self.partial = np.zeros(0)
+        self.numAverages = 0
+        self.history = np.zeros(0)
+        self.sumSquares = np.zeros(len(self.lags))
+        self.counts = np.zeros(len(self.lags), dtype = np.int64)
+
+    @property
+    def xResult(self):
+        return self.result.x if self.result is not None else None
+
+    @property
+    def yResult(self):
+        return self.result.y if self.result is not None else None
+
+    @property
+    def yError(self):
+        return self.result.yError if self.result is not None else None
+
+    def reset(self):
+        '''
+        Discard all samples added so far
+        '''
+        self.__reset()
+
+    def add(self, dataSeries):
+        '''
+        Add samples following those already added
+        :param dataSeries: single or list or numpy array of float degrees phase
+        '''
+        values = np.atleast_1d(np.asarray(dataSeries, dtype = np.float64))
+        if not len(values):
+            return
+        # unwrap continuing from the last sample of the previous chunk:
+        if self.lastPhase is not None:
+            values = np.unwrap(np.concatenate(([self.lastPhase], values)), period = 360)[1:]
+        else:
+            values = np.unwrap(values, period = 360)
+        self.lastPhase = values[-1]
+
+        # average over TMin, holding back any partial group:
+        values = np.concatenate((self.partial, values))
+        M = len(values) // self.NMin
+        self.partial = values[M * self.NMin:]
+        averages = values[:M * self.NMin].reshape(M, self.NMin).mean(axis = 1)
+        if not M:
+            return
+        self.numAverages += M
+
+        # differences at each lag which end on one of the new averages:
+        seq = np.concatenate((self.history, averages))
+        first = len(self.history)
+        for i, K in enumerate(self.lags):
+            start = max(first, K)
+            diff = seq[start:] - seq[start - K : len(seq) - K]
+            self.sumSquares[i] += np.dot(diff, diff)
+            self.counts[i] += len(diff)
+        if self.lags:
+            self.history = seq[-self.lags[-1]:]
+
+    def calculate(self):
+        '''
+        Compute the curve from the samples added so far
+        :return CalcResult as for PhaseStability, or None if there are not yet enough samples
+        '''
+        self.result = None
+        # as for PhaseStability, the longest interval is limited by the data duration:
+        NMax = int(min(self.TMax, self.numAverages * self.TMin) / self.TMin)
+        use = (self.counts > 0) & (np.asarray(self.lags, dtype = np.int64) < NMax)
+        if not use.any():
+            return None
+        fsDeg = 1.0
+        if self.freqRFGHz:
+            period = 1.0 / (float(self.freqRFGHz) * 1.0e9)
+            fsDeg = (period * 1.0e15) / 360.0
+        counts = self.counts[use]
+        adev = np.sqrt(0.5 * self.sumSquares[use] / counts) * fsDeg
+        self.result = CalcResult(np.asarray(self.lags)[use] * self.TMin, adev, adev / np.sqrt(counts), counts, self.tau0Seconds,
+                                 xUnits = Units.SECONDS.value, yUnits = Units.FS.value if self.freqRFGHz else Units.DEG.value)
+        return self.result
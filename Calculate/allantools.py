@@ -7,6 +7,7 @@ Extracted from https://github.com/aewallin/allantools
 """
 
 import numpy as np
+import warnings
 
 def adev(data, rate=1.0, data_type="phase", taus=None):
     """ Allan deviation.
@@ -67,16 +68,93 @@ def adev(data, rate=1.0, data_type="phase", taus=None):
     """
     phase = input_to_phase(data, rate, data_type)
     (phase, m, taus_used) = tau_generator(phase, rate, taus)
+    (ad, ade, adn) = calc_adev_phase_many(phase, rate, m, overlapping=False)
+    return remove_small_ns(taus_used, ad, ade, adn)
+
+def oadev(data, rate=1.0, data_type="phase", taus=None):
+    """ Overlapping Allan deviation.
+        General purpose - most widely used - first choice
+
+    .. math::
 
-    ad = np.zeros_like(taus_used)
-    ade = np.zeros_like(taus_used)
-    adn = np.zeros_like(taus_used)
+        \\sigma^2_{OADEV}(m\\tau_0) = { 1 \\over 2 (m \\tau_0 )^2 (N-2m) }
+        \\sum_{n=1}^{N-2m} ( {x}_{n+2m} - 2x_{n+1m} + x_{n} )^2
 
-    for idx, mj in enumerate(m):  # loop through each tau value m(j)
-        (ad[idx], ade[idx], adn[idx]) = calc_adev_phase(phase, rate, mj, mj)
+    where :math:`\\sigma^2_x(m\\tau_0)` is the overlapping Allan
+    deviation at an averaging time of :math:`\\tau=m\\tau_0`, and
+    :math:`x_n` is the time-series of phase observations, spaced by the
+    measurement interval :math:`\\tau_0`, with length :math:`N`.
 
+    Parameters and returns are the same as for adev()
+
+    References
+    ----------
+    * NIST [SP1065]_ eqn (11) page 16.
+    """
+    phase = input_to_phase(data, rate, data_type)
+    (phase, m, taus_used) = tau_generator(phase, rate, taus)
+    (ad, ade, adn) = calc_adev_phase_many(phase, rate, m, overlapping=True)
     return remove_small_ns(taus_used, ad, ade, adn)
 
+def calc_adev_phase_many(phase, rate, m, overlapping=False):
+    """ Vectorized form of calc_adev_phase() for all averaging factors m
+
+    Each second difference x[n+2m] - 2x[n+m] + x[n] is taken over views of the
+    phase array, into one preallocated buffer, and summed by a dot product,
+    so no per-tau copies of the phase data are made.
+
+    This still makes one pass per m, so the scaling is that of calling
+    calc_adev_phase() for each m: non-overlapping, each m costs N/m, about
+    N log(M) for all m together; overlapping, each m costs N - 2m, which is
+    N times the number of taus.  Only the constant factor is reduced.
+
+    Parameters
+    ----------
+    phase: np.array
+        Phase data in seconds.
+    rate: float
+        The sampling rate for phase or frequency, in Hz
+    m: np.array
+        averaging factors, we evaluate at tau = m*tau0
+    overlapping: bool
+        False for adev() with stride = m, True for oadev() with stride = 1
+
+    Returns
+    -------
+    (devs, deverrs, ns): tuple
+        Arrays of computed values corresponding to m.
+        Where the data is too short for m, dev = 0 and n = 1, as for calc_adev_phase()
+    """
+    phase = np.asarray(phase, dtype=np.float64)
+    m = np.asarray(m).astype(np.int64)
+    N = len(phase)
+    devs = np.zeros(len(m))
+    ns = np.ones(len(m))
+    buf = np.empty(N)
+
+    for idx, mj in enumerate(m.tolist()):
+        if overlapping:
+            # stride 1: all N - 2m second differences:
+            x = phase
+            lag = mj
+        else:
+            # stride m: every m'th point, lag 1 within the view:
+            x = phase[::mj]
+            lag = 1
+        n = len(x) - 2 * lag
+        if n <= 0:
+            warnings.warn("Data array length is too small: %i" % N, RuntimeWarning)
+            continue
+        v = buf[:n]
+        np.multiply(x[lag:n + lag], -2.0, out=v)
+        v += x[2 * lag:]
+        v += x[:n]
+        devs[idx] = np.sqrt(np.dot(v, v) / (2.0 * n)) / mj * rate
+        ns[idx] = n
+
+    deverrs = devs / np.sqrt(ns)
+    return devs, deverrs, ns
+
 def calc_adev_phase(phase, rate, mj, stride):
     """  Main algorithm for adev() (stride=mj) and oadev() (stride=1)
 
@@ -116,7 +194,7 @@ def calc_adev_phase(phase, rate, mj, stride):
     n = min(len(d0), len(d1), len(d2))
 
     if n == 0:
-        RuntimeWarning("Data array length is too small: %i" % len(phase))
+        warnings.warn("Data array length is too small: %i" % len(phase), RuntimeWarning)
         n = 1
 
     v_arr = d2[:n] - 2 * d1[:n] + d0[:n]
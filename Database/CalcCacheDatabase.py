@@ -0,0 +1,112 @@
+'''
+Persistent cache of calculation results in the local SQLite database.
+Used by TimeSeriesDatabase.
+'''
+import time
+
+class CalcCacheDatabase(object):
+    '''
+    Stores calculation results as binary data, by a key made by the caller.
+    Each entry may refer to the TimeSeriesHeader it was calculated from, in which case it is
+    deleted along with the time series and invalidated whenever the time series is modified.
+    When the total size exceeds maxBytes, the least recently used entries are deleted.
+    '''
+    DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+    def __init__(self, driver, maxBytes = DEFAULT_MAX_BYTES):
+        '''
+        Constructor
+        :param driver: DriverSQLite connection shared with TimeSeriesDatabase
+        :param maxBytes: total size of results to keep.  0 disables the cache.
+        '''
+        self.db = driver
+        self.maxBytes = max(int(maxBytes), 0)
+        self.createTable()
+
+    def createTable(self):
+        '''
+        Create the CalcCache table if it does not already exist.
+        '''
+        self.db.execute("SELECT count(*) FROM sqlite_master WHERE type='table' AND name='CalcCache';")
+        if not self.db.fetchone()[0]:
+            self.db.execute("""CREATE TABLE CalcCache (
+                                cacheKey TEXT PRIMARY KEY,
+                                fkHeader INTEGER,
+                                lastUsed INTEGER,
+                                size INTEGER,
+                                result BLOB,
+                                FOREIGN KEY (fkHeader)
+                                    REFERENCES TimeSeriesHeader(keyId)
+                                    ON DELETE CASCADE
+                                );
+                            """)
+            self.db.execute("""CREATE INDEX calcCacheHeader ON CalcCache (fkHeader);""")
+            self.db.execute("""CREATE INDEX calcCacheLastUsed ON CalcCache (lastUsed);""")
+            self.db.commit()
+
+    def get(self, cacheKey):
+        '''
+        Retrieve a result and mark it as recently used
+        :param cacheKey: str
+        :return bytes or None if not found
+        '''
+        if not self.maxBytes:
+            return None
+        self.db.execute("SELECT result FROM CalcCache WHERE cacheKey = ?;", (cacheKey, ))
+        row = self.db.fetchone()
+        if not row:
+            return None
+        self.db.execute("UPDATE CalcCache SET lastUsed = ? WHERE cacheKey = ?;", (time.time_ns(), cacheKey), commit = True)
+        return bytes(row[0])
+
+    def put(self, cacheKey, result, timeSeriesId = None):
+        '''
+        Store a result, replacing any with the same key, then evict the least recently used beyond maxBytes
+        :param cacheKey: str
+        :param result: bytes
+        :param timeSeriesId: int of the time series it was calculated from, or None
+        '''
+        if not self.maxBytes or len(result) > self.maxBytes:
+            return
+        # refer to the header only if it exists here:
+        self.db.execute("""INSERT OR REPLACE INTO CalcCache (cacheKey, fkHeader, lastUsed, size, result)
+                           VALUES (?, (SELECT keyId FROM TimeSeriesHeader WHERE keyId = ?), ?, ?, ?);""",
+                        (cacheKey, timeSeriesId, time.time_ns(), len(result), result))
+        self.evict(commit = False)
+        self.db.commit()
+
+    def evict(self, commit = True):
+        '''
+        Delete the least recently used results until the total size is within maxBytes
+        :param commit: if False, leave the transaction open for the caller
+        '''
+        self.db.execute("""DELETE FROM CalcCache WHERE cacheKey IN (
+                               SELECT cacheKey FROM (
+                                   SELECT cacheKey, SUM(size) OVER (ORDER BY lastUsed DESC, cacheKey) AS total FROM CalcCache)
+                               WHERE total > ?);""", (self.maxBytes, ))
+        if commit:
+            self.db.commit()
+
+    def invalidate(self, timeSeriesId = None, commit = True):
+        '''
+        Delete the results calculated from a time series, or all results
+        :param timeSeriesId: int, or None for all
+        :param commit: if False, leave the transaction open for the caller
+        '''
+        if timeSeriesId is None:
+            self.db.execute("DELETE FROM CalcCache;")
+        else:
+            self.db.execute("DELETE FROM CalcCache WHERE fkHeader = ?;", (timeSeriesId, ))
+        if commit:
+            self.db.commit()
+
+    def count(self, timeSeriesId = None):
+        '''
+        :param timeSeriesId: int, or None for all
+        :return number of results cached
+        '''
+        if timeSeriesId is None:
+            self.db.execute("SELECT count(*) FROM CalcCache;")
+        else:
+            self.db.execute("SELECT count(*) FROM CalcCache WHERE fkHeader = ?;", (timeSeriesId, ))
+        return self.db.fetchone()[0]
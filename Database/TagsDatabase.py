@@ -14,7 +14,7 @@ class TagsDatabase(object):
         '''
         self.driver = driver
         
-    def setTags(self, fkId, targetTable, fkColName, tagDictionary):
+    def setTags(self, fkId, targetTable, fkColName, tagDictionary, commit = True):
         '''
         implement set/update/delete tags
         Tag name keys evaluating to False are ignored.
@@ -23,6 +23,7 @@ class TagsDatabase(object):
         :param targetTable:   what tags table to update
         :param fkColName:     name of the foreign key column in targetTable
         :param tagDictionary: dictionary of tag names and values.
+        :param commit:        if False, leave the transaction open for the caller
         '''
 
         if not fkId:
@@ -61,7 +62,8 @@ class TagsDatabase(object):
             q += ");"
             self.driver.execute(q, commit = False)
             
-        self.driver.commit()
+        if commit:
+            self.driver.commit()
         
     def getTags(self, fkId, targetTable, fkColName, tagNames):
         '''
@@ -98,4 +100,32 @@ class TagsDatabase(object):
         for tagName, tagValue in records:
             result[tagName] = str(tagValue) if tagValue is not None else None
         return result
-    
\ No newline at end of file
+    
+    def getTagsMany(self, fkIds, targetTable, fkColName, tagNames):
+        '''
+        Implement retrieve tag values for several parent objects in one query
+        :param fkIds: list of integer ids of the objects to query
+        :param targetTable:   what tags table to query
+        :param fkColName:     name of the foreign key column in targetTable
+        :param tagNames: list of strings or None, indicating fetch all tags
+        :return dictionary of {fkId : {tagName, tagValue}} having an entry for every id in fkIds.
+        '''
+        if tagNames is not None and not isinstance(tagNames, list):
+            raise ValueError('tagNames must be a list.')
+        
+        result = {int(fkId) : {} for fkId in fkIds}
+        if not result:
+            return result
+        
+        q = "SELECT `{0}`, tagName, tagValue FROM `{1}` WHERE `{0}` IN ({2})".format(
+            fkColName, targetTable, ",".join(str(fkId) for fkId in result.keys()))
+        
+        if tagNames:
+            q += " AND tagName IN ({0})".format(",".join("'{0}'".format(str(tagName)) for tagName in tagNames))
+        q += ";"
+        
+        self.driver.execute(q)
+        records = self.driver.fetchall()
+        for fkId, tagName, tagValue in records:
+            result[fkId][tagName] = str(tagValue) if tagValue is not None else None
+        return result
@@ -1,9 +1,12 @@
 import ALMAFE.database.DriverSQLite as driver
 import Database.TagsDatabase as TagsDB
+from Database.CalcCacheDatabase import CalcCacheDatabase
 from Utility import ParseTimeStamp
 from datetime import datetime, timedelta
 from itertools import zip_longest
 from typing import List, Optional, Union
+import numpy as np
+import zlib
 
 class TimeSeriesHeader(object):
     def __init__(self, timeSeriesId, startTime, tau0Seconds):
@@ -18,21 +21,115 @@ class TimeSeries(object):
         self.temperatures1 = temperatures1
         self.temperatures2 = temperatures2
 
+class MinMaxEnvelope(object):
+    '''
+    Reduces a time series, presented in consecutive chunks, to the min and max over groups of K points.
+    Each group becomes two points at the timeStamp of its first point.  
+    Temperatures are taken from the first point of each group.  A partial group at the end is discarded.
+    '''
+    def __init__(self, K):
+        '''
+        Constructor
+        :param K: number of points per group
+        '''
+        self.K = max(int(K), 1)
+        self.pending = None
+        self.reduced = []
+
+    def add(self, dataSeries, timeStamps, temperatures1, temperatures2):
+        '''
+        Add the next chunk of numpy arrays.  Temperatures may be empty.
+        '''
+        chunk = (dataSeries, timeStamps, temperatures1, temperatures2)
+        if self.pending:
+            chunk = tuple(np.concatenate((p, c)) for p, c in zip(self.pending, chunk))
+        numGroups = len(chunk[0]) // self.K
+        end = numGroups * self.K
+        if numGroups:
+            groups = chunk[0][:end].reshape(numGroups, self.K)
+            self.reduced.append((groups.min(axis = 1), groups.max(axis = 1), chunk[1][:end:self.K],
+                                 chunk[2][:end:self.K] if len(chunk[2]) == len(chunk[0]) else chunk[2][:0],
+                                 chunk[3][:end:self.K] if len(chunk[3]) == len(chunk[0]) else chunk[3][:0]))
+        # keep the remainder for the next call:
+        self.pending = tuple(c[end:] for c in chunk)
+
+    def result(self) -> TimeSeries:
+        '''
+        :return TimeSeries of the reduced arrays, with each min and max interleaved
+        '''
+        if not self.reduced:
+            return TimeSeries(np.empty(0), np.empty(0, dtype = 'datetime64[us]'), np.empty(0), np.empty(0))
+        mins, maxs, times, temps1, temps2 = (np.concatenate(r) for r in zip(*self.reduced))
+        dataSeries = np.empty(2 * len(mins))
+        dataSeries[0::2] = mins
+        dataSeries[1::2] = maxs
+        return TimeSeries(dataSeries, 
+                          np.repeat(times, 2).astype('datetime64[us]'), 
+                          np.repeat(temps1, 2), 
+                          np.repeat(temps2, 2))
+
 class TimeSeriesDatabase(object):
     '''
     Helper class for storing and loading time series in the local database.
+    
+    Two storage layouts are supported:
+    STORAGE_ROWS:  the original layout, one row per sample in the TimeSeries table.
+    STORAGE_BLOBS: chunks of up to BLOB_CHUNK_POINTS samples per row in the TimeSeriesBlobs table.
+                   Each column is a zlib-compressed little-endian array: float64 for data and temperatures,
+                   int64 epoch-microseconds for timeStamps, stored as differences from the previous point.
+    New data is written in the configured storageFormat.  Both layouts are read transparently.
     '''
+    STORAGE_ROWS = 'rows'
+    STORAGE_BLOBS = 'blobs'
+    BLOB_CHUNK_POINTS = 65536
+    COMPRESSION_LEVEL = 1
+
+    # SQLite pragmas applied when the connection is opened.  May be overridden from the [SQLite] section of AmpPhaseDataLib.ini.
+    # page_size is applied first because it only has effect on a new database file, before journal_mode = WAL:
+    DEFAULT_PRAGMAS = {
+        'page_size' : '4096',
+        'journal_mode' : 'WAL',
+        'synchronous' : 'NORMAL',
+        'cache_size' : '-65536',
+        'mmap_size' : '268435456',
+        'busy_timeout' : '5000'
+    }
 
-    def __init__(self, localDatabaseFile):
+    def __init__(self, localDatabaseFile, storageFormat = STORAGE_BLOBS, pragmas = None, calcCacheBytes = CalcCacheDatabase.DEFAULT_MAX_BYTES):
         '''
         Constructor
         :param localDatabaseFile: Filename of local database.
+        :param storageFormat: STORAGE_BLOBS or STORAGE_ROWS for writing new data
+        :param pragmas: dict of {name : value} to override DEFAULT_PRAGMAS
+        :param calcCacheBytes: size limit of the CalcCache table.  0 disables it.
         '''
+        if storageFormat not in (self.STORAGE_ROWS, self.STORAGE_BLOBS):
+            raise ValueError('Invalid storageFormat: {}'.format(storageFormat))
+        self.storageFormat = storageFormat
         self.CHUNK_SIZE = 1000 # max records to load at a time
         connectionInfo = { 'localDatabaseFile' : localDatabaseFile }
         self.db = driver.DriverSQLite(connectionInfo)
+        self.applyPragmas(pragmas)
         self.createLocalDatabase()
         self.tagsDb = TagsDB.TagsDatabase(self.db)
+        self.calcCacheDb = CalcCacheDatabase(self.db, calcCacheBytes)
+
+    def applyPragmas(self, pragmas = None):
+        '''
+        Apply the storage profile to the open connection.
+        :param pragmas: dict of {name : value} to override DEFAULT_PRAGMAS
+        :raise ValueError if a name is not in DEFAULT_PRAGMAS or a value is not a plain word or number
+        '''
+        settings = dict(self.DEFAULT_PRAGMAS)
+        if pragmas:
+            settings.update(pragmas)
+        for name, value in settings.items():
+            value = str(value).strip()
+            if name not in self.DEFAULT_PRAGMAS or not value.lstrip('-').isalnum():
+                raise ValueError('Invalid SQLite pragma: {} = {}'.format(name, value))
+            self.db.execute("PRAGMA {0} = {1};".format(name, value))
+            # journal_mode returns a row:
+            self.db.fetchall()
 
     def createLocalDatabase(self):
         '''
@@ -63,6 +160,26 @@ class TimeSeriesDatabase(object):
                                 );
                             """)
             self.db.execute("""CREATE INDEX tsHeader ON TimeSeries (fkHeader);""")
+
+        # find or create TimeSeriesBlobs table:
+        self.db.execute("SELECT count(*) FROM sqlite_master WHERE type='table' AND name='TimeSeriesBlobs';")
+        if not self.db.fetchone()[0]:
+            self.db.execute("""CREATE TABLE TimeSeriesBlobs (
+                                fkHeader INTEGER,
+                                firstIndex INTEGER,
+                                numPoints INTEGER,
+                                firstTime INTEGER,
+                                lastTime INTEGER,
+                                seriesData BLOB,
+                                temperatures1 BLOB,
+                                temperatures2 BLOB,
+                                timeStamps BLOB,
+                                FOREIGN KEY (fkHeader) 
+                                    REFERENCES TimeSeriesHeader(keyId)
+                                    ON DELETE CASCADE
+                                );
+                            """)
+            self.db.execute("""CREATE INDEX blobHeader ON TimeSeriesBlobs (fkHeader, firstIndex);""")
                               
         self.db.execute("SELECT count(*) FROM sqlite_master WHERE type='table' AND name='TimeSeriesTags';")
         if not self.db.fetchone()[0]:
@@ -79,11 +196,12 @@ class TimeSeriesDatabase(object):
         
         self.db.commit()
     
-    def insertTimeSeriesHeader(self, startTime:Optional[datetime], tau0Seconds:Optional[float]):
+    def insertTimeSeriesHeader(self, startTime:Optional[datetime], tau0Seconds:Optional[float], commit = True):
         '''
         Insert a time series header record and return its keyId
         :param startTime:   datetime start time of the measurement 
         :param tau0Seconds: float sampling interval of the measurement
+        :param commit:      if False, leave the transaction open for the caller
         :return timeSeriesId: int keyId of the new header record or None if error.
         '''
         stStr = "'" + startTime.strftime(self.db.TIMESTAMP_FORMAT) + "'" if startTime else "NULL"
@@ -92,7 +210,8 @@ class TimeSeriesDatabase(object):
             return None;
         self.db.execute("SELECT last_insert_rowid()")
         timeSeriesId = self.db.fetchone()[0]
-        self.db.commit()
+        if commit:
+            self.db.commit()
         return timeSeriesId
     
     def updateTimeSeriesHeader(self, timeSeriesId, startTime, tau0Seconds):
@@ -106,29 +225,172 @@ class TimeSeriesDatabase(object):
         if not timeSeriesId:
             raise ValueError('Invalid timeSeriesId.')
         self.db.execute("UPDATE TimeSeriesHeader SET startTime = '{0}', tau0Seconds = {1} WHERE keyId = {2};".format(startTime, str(tau0Seconds), timeSeriesId))
+        self.calcCacheDb.invalidate(timeSeriesId, commit = False)
         self.db.commit()
         return timeSeriesId
     
-    def insertTimeSeries(self, timeSeries: TimeSeries):
+    def insertTimeSeries(self, timeSeries: TimeSeries, commit = True):
         '''
         Insert a time series associated
+        Data is appended in the configured storageFormat, 
+          unless the series already has data in the other layout.
+        :param commit: if False, leave the transaction open for the caller
+        :return True if successful
         '''
         if not timeSeries.tsId:
             raise ValueError('Invalid timeSeries tsId.')
         
-        self.db.execute('pragma journal_mode=memory')
+        # any results calculated from the data so far are out of date:
+        self.calcCacheDb.invalidate(timeSeries.tsId, commit = False)
+
+        if self.__hasRows(timeSeries.tsId) or \
+                (self.storageFormat == self.STORAGE_ROWS and not self.__hasBlobs(timeSeries.tsId)):
+            return self.__insertRows(timeSeries, commit)
+        else:
+            return self.__insertBlobs(timeSeries, commit)
+
+    def insertTimeSeriesWithHeader(self, timeSeries: TimeSeries, tagDictionary = None):
+        '''
+        Insert the header, tags, and data of a complete time series in a single transaction.
+        :param timeSeries: having startTime and tau0Seconds set.  Its tsId is updated.
+        :param tagDictionary: dictionary of tag names and values.
+        :return timeSeriesId: int keyId of the new header record or None if error, in which case nothing is stored.
+        '''
+        timeSeriesId = self.insertTimeSeriesHeader(timeSeries.startTime, timeSeries.tau0Seconds, commit = False)
+        if not timeSeriesId:
+            self.db.rollback()
+            return None
+        timeSeries.tsId = timeSeriesId
+        if tagDictionary:
+            self.tagsDb.setTags(timeSeriesId, 'TimeSeriesTags', 'fkHeader', tagDictionary, commit = False)
+        if not self.insertTimeSeries(timeSeries, commit = False):
+            self.db.rollback()
+            timeSeries.tsId = 0
+            return None
+        self.db.commit()
+        return timeSeriesId
+
+    def __hasRows(self, timeSeriesId):
+        '''
+        :return True if the series has any data in the TimeSeries table
+        '''
+        self.db.execute("SELECT 1 FROM TimeSeries WHERE fkHeader = ? LIMIT 1;", (timeSeriesId, ))
+        return bool(self.db.fetchone())
+
+    def __hasBlobs(self, timeSeriesId):
+        '''
+        :return True if the series has any data in the TimeSeriesBlobs table
+        '''
+        self.db.execute("SELECT 1 FROM TimeSeriesBlobs WHERE fkHeader = ? LIMIT 1;", (timeSeriesId, ))
+        return bool(self.db.fetchone())
+
+    def __insertBlobs(self, timeSeries: TimeSeries, commit = True):
+        '''
+        Private implementation of insertTimeSeries() for STORAGE_BLOBS
+        :param timeSeries: data to append after any blobs already stored
+        :param commit: if False, leave the transaction open for the caller
+        :return True if successful
+        '''
+        dataSeries = np.asarray(timeSeries.dataSeries, dtype = np.float64)
+        numPoints = len(dataSeries)
+        if not numPoints:
+            return True
+        
+        # continue from the last point already stored:
+        self.db.execute("SELECT COALESCE(SUM(numPoints), 0) FROM TimeSeriesBlobs WHERE fkHeader = ?;", (timeSeries.tsId, ))
+        firstIndex = self.db.fetchone()[0]
+        
+        # timeStamps as epoch-microseconds, generating any not provided from startTime and tau0Seconds:
+        timeStamps = np.asarray(timeSeries.timeStamps, dtype = 'datetime64[us]').astype(np.int64)
+        if len(timeStamps) < numPoints:
+            startTime = np.datetime64(timeSeries.startTime, 'us').astype(np.int64)
+            tau0 = round(timeSeries.tau0Seconds * 1e6) if timeSeries.tau0Seconds else 0
+            generated = startTime + (firstIndex + np.arange(numPoints, dtype = np.int64)) * tau0
+            generated[:len(timeStamps)] = timeStamps
+            timeStamps = generated
+        else:
+            timeStamps = timeStamps[:numPoints]
+        
+        temperatures1 = self.__padTemperatures(timeSeries.temperatures1, numPoints)
+        temperatures2 = self.__padTemperatures(timeSeries.temperatures2, numPoints)
+        
+        q = """INSERT INTO TimeSeriesBlobs (fkHeader, firstIndex, numPoints, firstTime, lastTime, 
+                    seriesData, temperatures1, temperatures2, timeStamps) 
+                VALUES (?,?,?,?,?,?,?,?,?)"""
+        records = []
+        for start in range(0, numPoints, self.BLOB_CHUNK_POINTS):
+            stop = min(start + self.BLOB_CHUNK_POINTS, numPoints)
+            times = timeStamps[start:stop]
+            records.append((timeSeries.tsId, firstIndex + start, stop - start, int(times[0]), int(times[-1]),
+                            self.__packArray(dataSeries[start:stop]),
+                            self.__packArray(temperatures1[start:stop]),
+                            self.__packArray(temperatures2[start:stop]),
+                            self.__packArray(np.diff(times, prepend = 0))))
+        
+        if not self.db.executemany(q, records, commit = False):
+            self.db.rollback()
+            return False
+        if commit:
+            self.db.commit()
+        return True
+
+    def __padTemperatures(self, temperatures, numPoints):
+        '''
+        Align a temperatures column with dataSeries so that each chunk gets the temperatures for its own points
+        :param temperatures: list or array, possibly shorter than dataSeries
+        :param numPoints: length of dataSeries
+        :return float64 array of numPoints, padded with NaN, or empty if there are no temperatures
+        '''
+        temperatures = np.asarray(temperatures, dtype = np.float64)
+        if not len(temperatures):
+            return temperatures
+        if len(temperatures) >= numPoints:
+            return temperatures[:numPoints]
+        padded = np.full(numPoints, np.nan)
+        padded[:len(temperatures)] = temperatures
+        return padded
+
+    def __packArray(self, array):
+        '''
+        :param array: numpy array of float64 or int64
+        :return compressed bytes, or None if the array is empty
+        '''
+        if not len(array):
+            return None
+        return zlib.compress(array.astype(array.dtype.newbyteorder('<'), copy = False).tobytes(), self.COMPRESSION_LEVEL)
+
+    def __unpackArray(self, blob, dtype):
+        '''
+        :param blob: compressed bytes from __packArray() or None
+        :param dtype: np.float64 or np.int64
+        :return numpy array, empty if blob is None
+        '''
+        if not blob:
+            return np.empty(0, dtype = dtype)
+        return np.frombuffer(zlib.decompress(blob), dtype = np.dtype(dtype).newbyteorder('<')).astype(dtype, copy = False)
+
+    def __insertRows(self, timeSeries: TimeSeries, commit = True):
+        '''
+        Private implementation of insertTimeSeries() for STORAGE_ROWS
+        :param commit: if False, leave the transaction open for the caller
+        :return True if successful
+        '''
        
         q0 = """INSERT INTO TimeSeries (fkHeader, timeStamp, seriesData, temperatures1, temperatures2) 
                 VALUES (?,?,?,?,?)"""
 
         # timeDelta and timeCount are for generating timeStamps if not provided
-        timeDelta = timedelta(seconds = timeSeries.tau0Seconds)
+        timeDelta = timedelta(seconds = timeSeries.tau0Seconds or 0)
         timeCount = timeSeries.startTime
         error = False
         maxRec = 100000
         # loop on data arrays:        
         records = []
-        for TS, data, temp1, temp2 in zip_longest(timeSeries.timeStamps, timeSeries.dataSeries, timeSeries.temperatures1, timeSeries.temperatures2):
+        timeStamps = timeSeries.timeStamps
+        if isinstance(timeStamps, np.ndarray):
+            # datetime64[us].tolist() yields datetime objects:
+            timeStamps = timeStamps.tolist()
+        for TS, data, temp1, temp2 in zip_longest(timeStamps, timeSeries.dataSeries, timeSeries.temperatures1, timeSeries.temperatures2):
                 
             # timeStamp:
             tss = TS.strftime(self.db.TIMESTAMP_FORMAT) if TS else timeCount.strftime(self.db.TIMESTAMP_FORMAT)
@@ -150,13 +412,13 @@ class TimeSeriesDatabase(object):
             if not self.db.executemany(q0, records, commit = False):
                 error = True
         
+        if error:
+            self.db.rollback()
+            return False
         # no error seen, commit the transaction:
-        if not error:
+        if commit:
             self.db.commit()
-        else:
-            self.db.rollback()
-        
-        self.db.execute('pragma journal_mode=delete')
+        return True
 
     def retrieveTimeSeriesHeader(self, timeSeriesId):
         '''
@@ -175,52 +437,344 @@ class TimeSeriesDatabase(object):
             result = TimeSeriesHeader(timeSeriesId, tsParser.parseTimeStamp(row[0]), float(row[1]))
         return result
     
-    def retrieveTimeSeries(self, timeSeriesId):
+    def retrieveTimeSeriesHeaders(self, timeSeriesIds):
+        '''
+        Retrieve several header rows in one query.
+        :param timeSeriesIds: list of keyId of headers to fetch
+        :return dict of {timeSeriesId : TimeSeriesHeader} for the headers found
+        '''
+        ids = [int(tsId) for tsId in timeSeriesIds if tsId]
+        if not ids:
+            return {}
+        tsParser = ParseTimeStamp.ParseTimeStamp()
+        self.db.execute("SELECT keyId, startTime, tau0Seconds FROM TimeSeriesHeader WHERE keyId IN ({0});".format(
+            ",".join("?" * len(ids))), tuple(ids))
+        
+        result = {}
+        for keyId, startTime, tau0Seconds in self.db.fetchall():
+            result[keyId] = TimeSeriesHeader(keyId, tsParser.parseTimeStamp(startTime), float(tau0Seconds))
+        return result
+
+    def retrieveTimeSeriesMany(self, timeSeriesIds):
+        '''
+        Retrieve the data for several time series with a fixed number of queries, from whichever storage layout holds each.
+        :param timeSeriesIds: list of keyId of the corresponding header records
+        :return dict of {timeSeriesId : TimeSeries object} for the time series having data
+        '''
+        ids = [int(tsId) for tsId in timeSeriesIds if tsId]
+        if not ids:
+            return {}
+        inList = ",".join("?" * len(ids))
+        
+        # which series are stored as blobs:
+        self.db.execute("SELECT DISTINCT fkHeader FROM TimeSeriesBlobs WHERE fkHeader IN ({0});".format(inList), tuple(ids))
+        blobIds = set(row[0] for row in self.db.fetchall())
+        rowIds = [tsId for tsId in ids if tsId not in blobIds]
+        
+        result = {}
+        if blobIds:
+            # one ordered scan over all chunks of all blob series:
+            self.db.execute("""SELECT fkHeader, seriesData, temperatures1, temperatures2, timeStamps FROM TimeSeriesBlobs 
+                               WHERE fkHeader IN ({0}) ORDER BY fkHeader, firstIndex;""".format(",".join("?" * len(blobIds))), 
+                            tuple(blobIds))
+            chunks = {}
+            row = self.db.fetchone()
+            while row:
+                tsId, data, temp1, temp2, times = row
+                chunks.setdefault(tsId, []).append((self.__unpackArray(data, np.float64),
+                                                    np.cumsum(self.__unpackArray(times, np.int64)),
+                                                    self.__unpackArray(temp1, np.float64),
+                                                    self.__unpackArray(temp2, np.float64)))
+                row = self.db.fetchone()
+            for tsId, parts in chunks.items():
+                data, times, temps1, temps2 = (np.concatenate(p) for p in zip(*parts))
+                result[tsId] = TimeSeries(data, times.astype('datetime64[us]'), temps1, temps2)
+        
+        if rowIds:
+            # one ordered scan over all rows of all row series:
+            self.db.execute("""SELECT fkHeader, timeStamp, seriesData, temperatures1, temperatures2 FROM TimeSeries 
+                               WHERE fkHeader IN ({0}) ORDER BY fkHeader, rowid;""".format(",".join("?" * len(rowIds))), 
+                            tuple(rowIds))
+            columns = {}
+            records = self.db.fetchmany(self.CHUNK_SIZE)
+            while records:
+                for tsId, TS, data, temp1, temp2 in records:
+                    timeStamps, dataSeries, temperatures1, temperatures2 = columns.setdefault(tsId, ([], [], [], []))
+                    timeStamps.append(TS)
+                    dataSeries.append(data)
+                    if temp1:
+                        temperatures1.append(temp1)
+                    if temp2:
+                        temperatures2.append(temp2)
+                records = self.db.fetchmany(self.CHUNK_SIZE)
+            tsParser = ParseTimeStamp.ParseTimeStamp()
+            for tsId, (timeStamps, dataSeries, temperatures1, temperatures2) in columns.items():
+                result[tsId] = TimeSeries(dataSeries, tsParser.parseTimeStampColumn(timeStamps), temperatures1, temperatures2)
+        return result
+
+    def retrieveTimeSeries(self, timeSeriesId, first = 0, last = None, timeRange = None, decimate = None):
         '''
-        Retrieve the selected time series data
+        Retrieve the selected time series data, from whichever storage layout holds it
         :param timeSeriesId: keyId of the corresponding header record
+        :param first: index of the first point to retrieve
+        :param last: index after the last point to retrieve, or None for the end
+        :param timeRange: optional (start, end) datetimes.  Only points within start <= t <= end are retrieved.
+                          Either may be None for an open range.  Combined with first and last by intersection.
+        :param decimate: if given, reduce the selection to about this many groups of points.
+                         Each group becomes two points, its min and max, at the timeStamp of its first point.
+                         Temperatures are taken from the first point of each group.  A partial group at the end is discarded.
         :return TimeSeries object if successful, else None
+                timeStamps is a numpy array of datetime64[us].  From STORAGE_BLOBS the other series are numpy arrays too.
         '''
         if not timeSeriesId:
             raise ValueError('Invalid timeSeriesId.')
         
+        first = max(first or 0, 0)
+        if timeRange is None:
+            timeRange = (None, None)
+        
+        if self.__hasBlobs(timeSeriesId):
+            return self.__retrieveBlobs(timeSeriesId, first, last, timeRange, decimate)
+        else:
+            return self.__retrieveRows(timeSeriesId, first, last, timeRange, decimate)
+
+    @staticmethod
+    def __groupSize(numPoints, decimate):
+        '''
+        :return number of points K to combine so that numPoints is reduced to about decimate groups
+        '''
+        return max(numPoints // decimate, 1)
+
+    def __blobSelection(self, timeSeriesId, first, last, timeRange):
+        '''
+        Build the WHERE clause selecting the blob chunks which overlap the requested range
+        :return (str, tuple of params), (int or None, int or None) time range in epoch-microseconds
+        '''
+        where = "fkHeader = ? AND firstIndex + numPoints > ?"
+        params = [timeSeriesId, first]
+        if last is not None:
+            where += " AND firstIndex < ?"
+            params.append(last)
+        t0, t1 = [int(np.datetime64(t, 'us').astype(np.int64)) if t else None for t in timeRange]
+        if t0 is not None:
+            where += " AND lastTime >= ?"
+            params.append(t0)
+        if t1 is not None:
+            where += " AND firstTime <= ?"
+            params.append(t1)
+        return where, tuple(params), (t0, t1)
+
+    @staticmethod
+    def __trimChunk(firstIndex, numPoints, times, first, last, t0, t1):
+        '''
+        Find the part of a blob chunk which is in the requested range
+        :param times: int64 epoch-microsecond timestamps of the chunk, only needed if t0 or t1 given
+        :return (lo, hi) indexes within the chunk
+        '''
+        lo = max(first - firstIndex, 0)
+        hi = numPoints if last is None else min(last - firstIndex, numPoints)
+        if t0 is not None:
+            lo = max(lo, int(np.searchsorted(times, t0, 'left')))
+        if t1 is not None:
+            hi = min(hi, int(np.searchsorted(times, t1, 'right')))
+        return lo, max(hi, lo)
+
+    def __countBlobs(self, timeSeriesId, first, last, timeRange):
+        '''
+        Count the points in the requested range, decoding timestamps only for chunks on the boundary of timeRange
+        '''
+        where, params, (t0, t1) = self.__blobSelection(timeSeriesId, first, last, timeRange)
+        self.db.execute("""SELECT firstIndex, numPoints, 
+                               CASE WHEN firstTime < ? OR lastTime > ? THEN timeStamps END 
+                           FROM TimeSeriesBlobs WHERE """ + where + ";", 
+                        (t0 if t0 is not None else -2**63, t1 if t1 is not None else 2**63 - 1) + params)
+        count = 0
+        for firstIndex, numPoints, times in self.db.fetchall():
+            if times:
+                times = np.cumsum(self.__unpackArray(times, np.int64))
+            lo, hi = self.__trimChunk(firstIndex, numPoints, times, first, last, 
+                                      t0 if times is not None else None, t1 if times is not None else None)
+            count += hi - lo
+        return count
+
+    def __retrieveBlobs(self, timeSeriesId, first, last, timeRange, decimate):
+        '''
+        Private implementation of retrieveTimeSeries() for STORAGE_BLOBS
+        Chunks are decoded one at a time so that decimating never holds the whole series in memory.
+        '''
+        envelope = None
+        if decimate:
+            numPoints = self.__countBlobs(timeSeriesId, first, last, timeRange)
+            envelope = MinMaxEnvelope(self.__groupSize(numPoints, decimate))
+
+        where, params, (t0, t1) = self.__blobSelection(timeSeriesId, first, last, timeRange)
+        self.db.execute("""SELECT firstIndex, numPoints, seriesData, temperatures1, temperatures2, timeStamps
+                           FROM TimeSeriesBlobs WHERE """ + where + " ORDER BY firstIndex;", params)
+        
         dataSeries = []
         temperatures1 = []
         temperatures2 = []
         timeStamps = []
+        found = False
+        haveTemps = [False, False]
+        row = self.db.fetchone()
+        while row:
+            found = True
+            firstIndex, numPoints, data, temp1, temp2, times = row
+            times = np.cumsum(self.__unpackArray(times, np.int64))
+            lo, hi = self.__trimChunk(firstIndex, numPoints, times, first, last, t0, t1)
+            temps = [self.__unpackArray(temp1, np.float64), self.__unpackArray(temp2, np.float64)]
+            for i in range(2):
+                # a chunk streamed before any temperatures were known is NaN-filled to stay aligned:
+                if len(temps[i]):
+                    haveTemps[i] = True
+                else:
+                    temps[i] = np.full(numPoints, np.nan)
+            chunk = (self.__unpackArray(data, np.float64)[lo:hi], 
+                     times[lo:hi],
+                     temps[0][lo:hi], 
+                     temps[1][lo:hi])
+            if envelope:
+                envelope.add(*chunk)
+            else:
+                dataSeries.append(chunk[0])
+                timeStamps.append(chunk[1])
+                temperatures1.append(chunk[2])
+                temperatures2.append(chunk[3])
+            row = self.db.fetchone()
         
-        #object for parsing the timeStamp column:
-        tsParser = ParseTimeStamp.ParseTimeStamp()
+        if not found:
+            return None
+        if envelope:
+            result = envelope.result()
+        else:
+            result = TimeSeries(np.concatenate(dataSeries), 
+                                np.concatenate(timeStamps).astype('datetime64[us]'), 
+                                np.concatenate(temperatures1), 
+                                np.concatenate(temperatures2))
+        if not haveTemps[0]:
+            result.temperatures1 = np.empty(0)
+        if not haveTemps[1]:
+            result.temperatures2 = np.empty(0)
+        return result
+
+    def __rowSelection(self, timeSeriesId, first, last, timeRange):
+        '''
+        Build a query selecting the requested rows in order
+        :return (str, tuple of params)
+        '''
+        columns = "rowid AS r, timeStamp, seriesData, temperatures1, temperatures2"
+        params = [timeSeriesId]
+        if not timeRange[0] and not timeRange[1]:
+            # index range only:
+            q = "SELECT " + columns + " FROM TimeSeries WHERE fkHeader = ? ORDER BY rowid LIMIT ? OFFSET ?"
+            params += [-1 if last is None else max(last - first, 0), first]
+            return q, tuple(params)
+        
+        # number all rows of the series so that first and last are independent of timeRange:
+        q = "SELECT r, timeStamp, seriesData, temperatures1, temperatures2 FROM (SELECT " + columns + \
+            ", ROW_NUMBER() OVER (ORDER BY rowid) - 1 AS i FROM TimeSeries WHERE fkHeader = ?) WHERE i >= ?"
+        params.append(first)
+        if last is not None:
+            q += " AND i < ?"
+            params.append(last)
+        # TIMESTAMP_FORMAT strings compare in time order:
+        if timeRange[0]:
+            q += " AND timeStamp >= ?"
+            params.append(timeRange[0].strftime(self.db.TIMESTAMP_FORMAT))
+        if timeRange[1]:
+            q += " AND timeStamp <= ?"
+            params.append(timeRange[1].strftime(self.db.TIMESTAMP_FORMAT))
+        q += " ORDER BY r"
+        return q, tuple(params)
+
+    def __retrieveRows(self, timeSeriesId, first = 0, last = None, timeRange = (None, None), decimate = None):
+        '''
+        Private implementation of retrieveTimeSeries() for STORAGE_ROWS
+        Decimation is done by the database.
+        '''
+        dataSeries = []
+        temperatures1 = []
+        temperatures2 = []
+        timeStamps = []
         
-        self.db.execute("SELECT timeStamp, seriesData, temperatures1, temperatures2 FROM TimeSeries WHERE fkHeader = '{0}'".format(timeSeriesId))
+        selection, params = self.__rowSelection(timeSeriesId, first, last, timeRange)
+        if decimate:
+            self.db.execute("SELECT COUNT(*) FROM (" + selection + ");", params)
+            K = self.__groupSize(self.db.fetchone()[0], decimate)
+            # number the selected rows from 0, then take min and max over each group of K.  
+            # the timeStamp and temperatures come from the first row, where n % K = 0:
+            self.db.execute("""WITH sel AS (""" + selection + """),
+                               num AS (SELECT ROW_NUMBER() OVER (ORDER BY r) - 1 AS n, * FROM sel)
+                               SELECT MAX(CASE WHEN n % ? = 0 THEN timeStamp END), MIN(seriesData), MAX(seriesData),
+                                   MAX(CASE WHEN n % ? = 0 THEN temperatures1 END), 
+                                   MAX(CASE WHEN n % ? = 0 THEN temperatures2 END)
+                               FROM num GROUP BY n / ? HAVING COUNT(*) = ? ORDER BY n / ?;""", 
+                            params + (K, K, K, K, K, K))
+        else:
+            self.db.execute(selection + ";", params)
         
         records = self.db.fetchmany(self.CHUNK_SIZE)
-        firstTime = True
         while records:
-            for TS, data, temp1, temp2 in records:
-                if firstTime:
-                    # parse the first TS string and cache the format string:
-                    timeStamp = tsParser.parseTimeStamp(TS)
-                    firstTime = False
-                else:
-                    # parse subsequent TS strings using the cached format:
-                    timeStamp = tsParser.parseTimeStampWithFormatString(TS, tsParser.lastTimeStampFormat)
-                timeStamps.append(timeStamp)
-                dataSeries.append(data)
-                if temp1:
-                    temperatures1.append(temp1)
-                if temp2:
-                    temperatures2.append(temp2)
+            if decimate:
+                for TS, dataMin, dataMax, temp1, temp2 in records:
+                    timeStamps += [TS, TS]
+                    dataSeries += [dataMin, dataMax]
+                    if temp1:
+                        temperatures1 += [temp1, temp1]
+                    if temp2:
+                        temperatures2 += [temp2, temp2]
+            else:
+                for _, TS, data, temp1, temp2 in records:
+                    timeStamps.append(TS)
+                    dataSeries.append(data)
+                    if temp1:
+                        temperatures1.append(temp1)
+                    if temp2:
+                        temperatures2.append(temp2)
             records = self.db.fetchmany(self.CHUNK_SIZE)
         if dataSeries:
+            # decode the whole timeStamp column at once:
+            timeStamps = ParseTimeStamp.ParseTimeStamp().parseTimeStampColumn(timeStamps)
             return TimeSeries(dataSeries, timeStamps, temperatures1, temperatures2)
         else:
             return None
 
+    def migrateToBlobs(self, timeSeriesId = None):
+        '''
+        Move time series data from the STORAGE_ROWS layout to STORAGE_BLOBS.
+        Each time series is migrated in its own transaction.
+        :param timeSeriesId: int of the time series to migrate, or None for all
+        :return list of timeSeriesId migrated
+        '''
+        if timeSeriesId:
+            ids = [timeSeriesId] if self.__hasRows(timeSeriesId) else []
+        else:
+            self.db.execute("SELECT DISTINCT fkHeader FROM TimeSeries;")
+            ids = [row[0] for row in self.db.fetchall()]
+        
+        migrated = []
+        for tsId in ids:
+            header = self.retrieveTimeSeriesHeader(tsId)
+            rows = self.__retrieveRows(tsId)
+            if not header or not rows:
+                continue
+            rows.tsId = tsId
+            rows.startTime = header.startTime
+            rows.tau0Seconds = header.tau0Seconds
+            if not self.__insertBlobs(rows, commit = False):
+                continue
+            if not self.db.execute("DELETE FROM TimeSeries WHERE fkHeader = ?;", (tsId, )):
+                self.db.rollback()
+                continue
+            self.db.commit()
+            migrated.append(tsId)
+        return migrated
+
     def deleteTimeSeries(self, timeSeriesId):
         '''
         Delete a time series header and all of its associated data and tags.
-        Rows in TimeSeries and TimeSeriesTags tables are deleted by CASCADE.
+        Rows in TimeSeries, TimeSeriesBlobs, TimeSeriesTags, and CalcCache tables are deleted by CASCADE.
         :param timeSeriesId:  int of the time series to update
         '''
         q = "DELETE FROM TimeSeriesHeader WHERE keyId = {0}".format(timeSeriesId)
@@ -241,6 +795,15 @@ class TimeSeriesDatabase(object):
             raise ValueError('Invalid timeSeriesId.')
         self.tagsDb.setTags(timeSeriesId, 'TimeSeriesTags', 'fkHeader', tagDictionary)
         
+    def getTagsMany(self, timeSeriesIds, tagNames):
+        '''
+        Retrieve tag values on several time series in one query:
+        :param timeSeriesIds: list of integer id of the time series to query
+        :param tagNames: list of strings
+        :return dictionary of {timeSeriesId : {tagName, tagValue}}
+        '''
+        return self.tagsDb.getTagsMany([tsId for tsId in timeSeriesIds if tsId], 'TimeSeriesTags', 'fkHeader', tagNames)
+
     def getTags(self, timeSeriesId, tagNames):
         '''
         Retrieve tag values on the specified time series:
@@ -3,6 +3,10 @@ Plot.Plotly.Common:  functions used in more than one plot
 '''
 import plotly.graph_objects as go
 from AmpPhaseDataLib.Constants import PlotEl
+from Plot.Plotly.Renderer import getRenderer
+from Plot.Plotly.ImageCache import getImageCache
+from Plot.Plotly.HtmlOutput import isHtmlOutput, makeHtml
+from Calculate import Decimate
 
 def addSpecLines(fig, plotElements):
     '''
@@ -138,11 +142,16 @@ def addComplianceString(fig, compliance):
 def makePlotOutput(fig, plotElements, outputName = None, show = False):
     '''
     Common Plotly implementation for producing plot output
+    The .PNG is taken from the shared ImageCache if the same figure was rendered before,
+    otherwise it is made by the shared Renderer and stored in the cache.
+    Inside a Renderer.batch() block a new image is rendered and written to outputName in the background,
+    and its imageData is found in the batch jobs.
     :param fig: plotly.graph_objects.Figure
     :param plotElements: dict of {PlotEl : str}
-    :param outputName: optional filename where to write the plot .PNG file
+    If outputName is a .html file, an interactive page is made instead, see HtmlOutput.
+    :param outputName: optional filename where to write the plot .PNG or .html file
     :param show: if True, displays the plot using the default renderer.
-    :return binary imageData
+    :return binary imageData, or None if batching and not cached.  For .html, the page as utf-8 bytes.
     '''
     # show interactive:
     if show:
@@ -154,11 +163,34 @@ def makePlotOutput(fig, plotElements, outputName = None, show = False):
     height = int(plotElements.get(PlotEl.IMG_HEIGHT, "500"))
     plotElements[PlotEl.IMG_HEIGHT] = str(height) 
 
-    imageData = fig.to_image(format = "png", width = width, height = height)
-    
-    # save to file, if requested:
-    if outputName:
+    # or .html output, with an overview of two points per pixel:
+    if isHtmlOutput(outputName):
+        imageData = makeHtml(fig, plotElements, 2 * width, plotElements.get(PlotEl.DECIMATION, Decimate.DEFAULT_METHOD)).encode('utf-8')
         with open(outputName, 'wb') as file:
             file.write(imageData)
-            
+        return imageData
+
+    # use the cached image, if any:
+    cache = getImageCache()
+    cacheKey = cache.makeKey(fig, "png", width, height) if cache.isEnabled() else None
+    if cacheKey:
+        imageData = cache.get(cacheKey)
+        if imageData is not None:
+            # save to file, if requested:
+            if outputName:
+                with open(outputName, 'wb') as file:
+                    file.write(imageData)
+            return imageData
+
+    # render, saving to file if requested:
+    renderer = getRenderer()
+    job = renderer.submit(fig, format = "png", width = width, height = height, outputName = outputName)
+    if renderer.isBatching():
+        if cacheKey:
+            # store in the cache when the worker is done:
+            job.future.add_done_callback(lambda future: cache.put(cacheKey, job.imageData) if job.error is None else None)
+        return None
+    imageData = job.result()
+    if cacheKey:
+        cache.put(cacheKey, imageData)
     return imageData
@@ -0,0 +1,181 @@
+'''
+Plot.Plotly.HtmlOutput:  interactive .html output for large plots, viewable without a server.
+Traces with many points are drawn with WebGL (Scattergl).  The page first shows a decimated overview;
+the full-resolution data is embedded as base64 typed arrays and swapped in for the visible range when zooming.
+'''
+from AmpPhaseDataLib.Constants import PlotEl
+from Calculate import Decimate
+import plotly.graph_objects as go
+import numpy as np
+import base64
+import hashlib
+import json
+
+# traces with more points than this are drawn with Scattergl:
+GL_THRESHOLD = 1000
+
+# most points per trace to draw after zooming; larger ranges are reduced by min and max in the browser:
+MAX_ZOOM_POINTS = 200000
+
+def isHtmlOutput(outputName) -> bool:
+    '''
+    :param outputName: filename or None
+    :return True if outputName is a .html or .htm file
+    '''
+    return bool(outputName) and str(outputName).lower().endswith(('.html', '.htm'))
+
+def encodeArray(array: np.ndarray):
+    '''
+    Encode a float array for embedding.  float32 is used when it represents every value exactly.
+    :param array: numpy array of float
+    :return dict of {'dtype': 'float32' or 'float64', 'data': base64 str of the little-endian bytes}
+    '''
+    array = np.asarray(array, dtype = np.float64)
+    single = array.astype('<f4')
+    if np.array_equal(single, array, equal_nan = True):
+        return {'dtype': 'float32', 'data': base64.b64encode(single.tobytes()).decode('ascii')}
+    return {'dtype': 'float64', 'data': base64.b64encode(array.astype('<f8').tobytes()).decode('ascii')}
+
+def toPlotX(x: np.ndarray):
+    '''
+    :param x: numpy array of numbers, datetime64, or datetime objects
+    :return (numpy array of float, isDate) where dates are milliseconds since the epoch, as plotly uses
+    '''
+    if x.dtype == object:
+        x = x.astype('datetime64[us]')
+    if x.dtype.kind == 'M':
+        return (x.astype('datetime64[us]').astype(np.int64) / 1000.0, True)
+    return (x.astype(np.float64), False)
+
+def makeHtml(fig, plotElements, overviewPoints: int = 1600, method: str = Decimate.DEFAULT_METHOD) -> str:
+    '''
+    Make a self-contained .html page for the figure.  The figure is changed to show the overview.
+    :param fig: plotly.graph_objects.Figure
+    :param plotElements: dict of {PlotEl : str}
+    :param overviewPoints: about how many points of each large trace to show before zooming
+    :param method: Decimate method for the overview
+    :return str html
+    '''
+    arrays = {}     # encoded arrays by hash, so that traces sharing x store it once
+    fullData = {}   # {trace index : {'x': key, 'y': key, 'axis': 'x' or 'x2'...}}
+
+    def addArray(array):
+        encoded = encodeArray(array)
+        key = hashlib.blake2b(encoded['data'].encode('ascii'), digest_size = 10).hexdigest()
+        arrays[key] = encoded
+        return key
+
+    traces = list(fig.data)
+    for index, trace in enumerate(traces):
+        if trace.type != 'scatter' or trace.x is None or trace.y is None or len(trace.y) <= GL_THRESHOLD:
+            continue
+        props = trace.to_plotly_json()
+        props.pop('type', None)
+        props.pop('uid', None)
+        # traces with other per-point arrays, such as error bars, are kept at full resolution:
+        keepFull = any(isinstance(props.get(name, {}).get('array', None), (list, tuple, np.ndarray)) for name in ('error_x', 'error_y'))
+        x = np.asarray(trace.x)
+        y = np.asarray(trace.y, dtype = np.float64)
+        if method != Decimate.NONE and not keepFull and len(x) == len(y) and len(y) > overviewPoints:
+            xPlot, isDate = toPlotX(x)
+            fullData[index] = {'x': addArray(xPlot), 'y': addArray(y), 'axis': trace.xaxis or 'x'}
+            x, (y, ) = Decimate.decimate(method, x, [y], overviewPoints)
+            props['x'] = x
+            props['y'] = y
+            if isDate:
+                # so that the axis stays a date axis when given milliseconds:
+                fig.layout[axisName(trace.xaxis or 'x')].type = 'date'
+        try:
+            traces[index] = go.Scattergl(**props)
+        except ValueError:
+            # a property not supported by Scattergl; keep it as Scatter:
+            traces[index] = go.Scatter(**props)
+    fig.data = []
+    fig.add_traces(traces)
+
+    postScript = ZOOM_SCRIPT.replace('__ARRAYS__', json.dumps(arrays)) \
+                            .replace('__FULL__', json.dumps({str(i): v for i, v in fullData.items()})) \
+                            .replace('__MAX_POINTS__', str(MAX_ZOOM_POINTS))
+    return fig.to_html(full_html = True, include_plotlyjs = True, post_script = postScript,
+                       default_width = "{}px".format(plotElements.get(PlotEl.IMG_WIDTH, "800")),
+                       default_height = "{}px".format(plotElements.get(PlotEl.IMG_HEIGHT, "500")))
+
+def axisName(axis: str) -> str:
+    '''
+    :param axis: trace axis reference like 'x' or 'x2'
+    :return layout attribute name like 'xaxis' or 'xaxis2'
+    '''
+    return 'xaxis' + axis[1:]
+
+# Runs in the page after the plot is made.  {plot_id} is filled in by plotly.
+ZOOM_SCRIPT = '''
+(function() {
+    var gd = document.getElementById('{plot_id}');
+    var encoded = __ARRAYS__;
+    var full = __FULL__;
+    var maxPoints = __MAX_POINTS__;
+    var decoded = {};
+    function decode(key) {
+        if (!(key in decoded)) {
+            var raw = atob(encoded[key].data);
+            var bytes = new Uint8Array(raw.length);
+            for (var i = 0; i < raw.length; i++) bytes[i] = raw.charCodeAt(i);
+            decoded[key] = encoded[key].dtype === 'float32' ? new Float32Array(bytes.buffer) : new Float64Array(bytes.buffer);
+        }
+        return decoded[key];
+    }
+    var indices = Object.keys(full).map(Number);
+    if (!indices.length) return;
+    var overview = {};
+    indices.forEach(function(i) { overview[i] = {x: gd.data[i].x, y: gd.data[i].y}; });
+    function lowerBound(x, value) {
+        var lo = 0, hi = x.length;
+        while (lo < hi) { var mid = (lo + hi) >> 1; if (x[mid] < value) lo = mid + 1; else hi = mid; }
+        return lo;
+    }
+    function visibleRange(axis) {
+        if (axis.autorange) return null;
+        var r = axis.range.map(function(v) {
+            if (axis.type === 'date') return axis.r2l(v);
+            if (axis.type === 'log') return Math.pow(10, v);
+            return v;
+        });
+        return [Math.min(r[0], r[1]), Math.max(r[0], r[1])];
+    }
+    function reduce(x, y, first, last) {
+        // min and max of each bucket, in order:
+        var n = last - first, buckets = Math.floor(maxPoints / 2), k = Math.ceil(n / buckets);
+        var xs = [], ys = [];
+        for (var b = first; b < last; b += k) {
+            var end = Math.min(b + k, last), iMin = b, iMax = b;
+            for (var j = b + 1; j < end; j++) {
+                if (y[j] < y[iMin]) iMin = j;
+                if (y[j] > y[iMax]) iMax = j;
+            }
+            var lo = Math.min(iMin, iMax), hi = Math.max(iMin, iMax);
+            xs.push(x[lo], x[hi]); ys.push(y[lo], y[hi]);
+        }
+        return {x: xs, y: ys};
+    }
+    var updating = false;
+    gd.on('plotly_relayout', function() {
+        if (updating) return;
+        var xs = [], ys = [];
+        indices.forEach(function(i) {
+            var range = visibleRange(gd._fullLayout['xaxis' + full[i].axis.substring(1)]);
+            if (!range) {
+                xs.push(overview[i].x); ys.push(overview[i].y);
+                return;
+            }
+            var x = decode(full[i].x), y = decode(full[i].y);
+            // include one point beyond each edge so the lines reach the edges:
+            var first = Math.max(lowerBound(x, range[0]) - 1, 0);
+            var last = Math.min(lowerBound(x, range[1]) + 1, x.length);
+            var part = (last - first) > maxPoints ? reduce(x, y, first, last) : {x: x.subarray(first, last), y: y.subarray(first, last)};
+            xs.push(part.x); ys.push(part.y);
+        });
+        updating = true;
+        Plotly.restyle(gd, {x: xs, y: ys}, indices).then(function() { updating = false; }, function() { updating = false; });
+    });
+})();
+'''
@@ -0,0 +1,158 @@
+'''
+Plot.Plotly.ImageCache:  on-disk cache of rendered plot images.
+Images are stored as files named by a hash of the figure JSON, size, and format, so a figure
+which has not changed is returned without rendering it again.
+'''
+from typing import Optional
+import plotly
+import configparser
+import hashlib
+import tempfile
+import threading
+import os
+
+class ImageCache(object):
+    '''
+    Stores image files in a directory, up to maxBytes in total.
+    When the total size exceeds maxBytes, the least recently used images are deleted.
+    The modification time of each file records when it was last used.
+    '''
+    DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+    DEFAULT_DIRECTORY = os.path.join(tempfile.gettempdir(), "AmpPhasePlotImageCache")
+
+    def __init__(self, directory: Optional[str] = None, maxBytes: Optional[int] = None):
+        '''
+        Constructor
+        :param directory: where to store the images.  Default from the [ImageCache] section of AmpPhaseDataLib.ini, else in the temp directory.
+        :param maxBytes: total size of images to keep.  0 disables the cache.  Default from AmpPhaseDataLib.ini, else 256 MB.
+        '''
+        config = configparser.ConfigParser()
+        config.read("AmpPhaseDataLib.ini")
+        if directory is None:
+            directory = config.get('ImageCache', 'directory', fallback = self.DEFAULT_DIRECTORY)
+        if maxBytes is None:
+            maxBytes = config.getint('ImageCache', 'maxBytes', fallback = self.DEFAULT_MAX_BYTES)
+        self.directory = directory
+        self.maxBytes = max(int(maxBytes), 0)
+        self.hits = 0
+        self.misses = 0
+        # images are stored from the Renderer worker threads:
+        self.lock = threading.Lock()
+
+    def isEnabled(self) -> bool:
+        '''
+        :return True if maxBytes is not 0
+        '''
+        return self.maxBytes > 0
+
+    def makeKey(self, fig, format = "png", width = None, height = None) -> str:
+        '''
+        :param fig: plotly.graph_objects.Figure
+        :param format: image format
+        :param width: in pixels
+        :param height: in pixels
+        :return str hash of everything the image depends on
+        '''
+        digest = hashlib.blake2b(digest_size = 20)
+        digest.update("{}:{}:{}:{}:".format(plotly.__version__, format, width, height).encode())
+        digest.update(fig.to_json(validate = False, remove_uids = True).encode())
+        return digest.hexdigest()
+
+    def get(self, cacheKey: str) -> Optional[bytes]:
+        '''
+        Retrieve an image and mark it as recently used
+        :param cacheKey: str from makeKey()
+        :return bytes or None if not found
+        '''
+        if not self.maxBytes:
+            return None
+        fileName = self.__fileName(cacheKey)
+        try:
+            with open(fileName, 'rb') as file:
+                imageData = file.read()
+            os.utime(fileName)
+        except OSError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return imageData
+
+    def put(self, cacheKey: str, imageData: bytes):
+        '''
+        Store an image, replacing any with the same key, then evict the least recently used beyond maxBytes
+        :param cacheKey: str from makeKey()
+        :param imageData: bytes
+        '''
+        if not self.maxBytes or not imageData or len(imageData) > self.maxBytes:
+            return
+        with self.lock:
+            os.makedirs(self.directory, exist_ok = True)
+            fileName = self.__fileName(cacheKey)
+            # write then rename so that a partly written image is never read:
+            tempName = "{}.{}.tmp".format(fileName, threading.get_ident())
+            with open(tempName, 'wb') as file:
+                file.write(imageData)
+            os.replace(tempName, fileName)
+            self.evict()
+
+    def evict(self):
+        '''
+        Delete the least recently used images until the total size is within maxBytes
+        '''
+        entries = self.__entries()
+        total = sum(entry.stat().st_size for entry in entries)
+        if total <= self.maxBytes:
+            return
+        for entry in sorted(entries, key = lambda entry: entry.stat().st_mtime_ns):
+            try:
+                total -= entry.stat().st_size
+                os.remove(entry.path)
+            except OSError:
+                pass
+            if total <= self.maxBytes:
+                break
+
+    def clear(self):
+        '''
+        Delete all of the cached images
+        '''
+        with self.lock:
+            for entry in self.__entries():
+                try:
+                    os.remove(entry.path)
+                except OSError:
+                    pass
+
+    def count(self) -> int:
+        '''
+        :return number of images cached
+        '''
+        return len(self.__entries())
+
+    def __fileName(self, cacheKey):
+        '''
+        Private helper to make the path for a cache key
+        '''
+        return os.path.join(self.directory, cacheKey + ".img")
+
+    def __entries(self):
+        '''
+        Private helper to list the cached image files
+        '''
+        try:
+            with os.scandir(self.directory) as scan:
+                return [entry for entry in scan if entry.name.endswith(".img") and entry.is_file()]
+        except OSError:
+            return []
+
+# ImageCache shared by makePlotOutput():
+sharedImageCache = None
+
+def getImageCache() -> ImageCache:
+    '''
+    :return the shared ImageCache, created when first needed
+    '''
+    global sharedImageCache
+    if sharedImageCache is None:
+        sharedImageCache = ImageCache()
+    return sharedImageCache
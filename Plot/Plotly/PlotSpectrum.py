@@ -44,7 +44,7 @@ class PlotSpectrum(object):
         :param x2Array: list of x coordinates to plot for 2nd trace
         :param y2Array: list of y coordinates to plot for 2nd trace, corresponding 1:1 with x2Array
         :param plotElements: dict of {PLotEl : str} to supplement or replace any defaults or loaded from database.
-        :param outputName: Filename where to write the plot .PNG file, optional.
+        :param outputName: Filename where to write the plot .PNG or .html file, optional.
         :param show: if True, displays the plot using the default renderer.
         :return True/False;  Updates plotElements
         '''
@@ -89,16 +89,16 @@ class PlotSpectrum(object):
         self.traces = [(xArray, yArray, [], legend)] 
         
         # check for highlight points:
-        if x2Array and y2Array:
+        if x2Array is not None and y2Array is not None and len(x2Array) and len(y2Array):
             legend2 = plotElements.get(PlotEl.FFT_LEGEND2, '')
             self.traces.append((x2Array, y2Array, [], legend2))
         
         # Plot title:
-        title = makeTitle([timeSeries.tsId], plotElements)
+        title = makeTitle([timeSeries.tsId], dataSources, plotElements)
         plotElements[PlotEl.TITLE] = title
         
         # Make plot footer strings:
-        makeFooters([timeSeries.tsId], plotElements, timeSeries.startTime)
+        makeFooters([timeSeries.tsId], dataSources, plotElements, timeSeries.startTime)
         
         # Generate the plot:
         return self.__plot(plotElements, outputName, show)
@@ -5,8 +5,9 @@ from Plot.Plotly.Common import addFooters, addSpecLines, makePlotOutput
 import plotly.graph_objects as go
 from math import log10, floor, ceil
 from numpy import logspace
+import numpy as np
 from sys import float_info
-from typing import Dict, List
+from typing import Dict, List, Union
 
 class PlotStability(object):
     '''
@@ -50,9 +51,9 @@ class PlotStability(object):
     def addTrace(self, 
             timeSeries,
             dataSources: Dict[DataSource, str],
-            xArray: List[float], 
-            yArray: List[float], 
-            yError: List[float], 
+            xArray: Union[List[float], np.ndarray], 
+            yArray: Union[List[float], np.ndarray], 
+            yError: Union[List[float], np.ndarray], 
             plotElements: Dict[PlotEl, str] = None) -> bool:
         '''
         Add a trace to a STABILITY plot in-progress.
@@ -122,14 +123,14 @@ class PlotStability(object):
                 name = f"AVAR [{yUnits}]"
 
         # append to self.traces:
-        trace = (xArray, yArray, yError if yError else [], name)
+        trace = (xArray, yArray, yError if yError is not None else [], name)
         self.traces.append(trace)
         
         # update overall dimensions:
-        self.minXY[0] = min(self.minXY[0], min(xArray))
-        self.minXY[1] = min(self.minXY[1], min(yArray))
-        self.maxXY[0] = max(self.maxXY[0], max(xArray))
-        self.maxXY[1] = max(self.maxXY[1], max(yArray))
+        self.minXY[0] = min(self.minXY[0], float(np.min(xArray)))
+        self.minXY[1] = min(self.minXY[1], float(np.min(yArray)))
+        self.maxXY[0] = max(self.maxXY[0], float(np.max(xArray)))
+        self.maxXY[1] = max(self.maxXY[1], float(np.max(yArray)))
         
         # Save the timeSeriesId:
         self.timeSeriesIds.append(timeSeries.tsId)
@@ -140,7 +141,7 @@ class PlotStability(object):
         Make plot title, axes labels, and footers;  Render the plot.
         Updates self.imageData with the finished plot
         :param startTime:  Of the measurement(s)
-        :param outputName: Filename where to write the plot .PNG file, optional.
+        :param outputName: Filename where to write the plot .PNG or .html file, optional.
         :param show: If true, display in the default renderer.
         :return True/False; updates self.imageData and plotElements
         '''
@@ -227,7 +228,7 @@ class PlotStability(object):
             fig.add_trace(go.Scatter(x = trace[0], y = trace[1], mode = 'lines', name = trace[3]))
             
             # add error bars:
-            if showErrorBars and trace[2]:
+            if showErrorBars and len(trace[2]):
                 # calculate the indexes of tau to use for error bars:
                 space = logspace(0, log10(len(trace[0])), 11)
                 errorBarsX = [trace[0][floor(x - 1)] for x in space]
@@ -1,12 +1,13 @@
 from AmpPhaseDataLib.TimeSeries import TimeSeries
 from AmpPhaseDataLib.Constants import DataKind, DataSource, PlotEl, Units
-from Calculate.Common import getMinMaxArray, getFirstItemArray
+from Calculate import Decimate
 from Plot.Common import makeTitle, makeFooters
 from Plot.Plotly.Common import addFooters, makePlotOutput
+from Plot.Plotly.HtmlOutput import isHtmlOutput
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import numpy as np
-from typing import Dict
+from typing import Dict, List, Tuple
 
 class PlotTimeSeries():
     '''
@@ -31,7 +32,7 @@ class PlotTimeSeries():
             plotElements: Dict[PlotEl, str] = None, 
             outputName: str = None, 
             show: bool = False, 
-            xResolution: int = 1000,
+            xResolution: int = None,
             unwrapPhase = False) -> bool:
         '''
         Create a TIME_SERIES plot
@@ -39,9 +40,10 @@ class PlotTimeSeries():
         :param timeSeries: the raw data to plot
         :param dataSources: data source attributes of the timeSeries
         :param plotElements: dict of {PLotEl : str} to supplement or replace any defaults or loaded from database.
-        :param outputName: Filename where to write the plot .PNG file, optional.
+        :param outputName: Filename where to write the plot .PNG or .html file, optional.
         :param show: if True, displays the plot using the default renderer.
-        :param xResolution: reduce the number of data points actually rendered to this many, by boxcar max and min.
+        :param xResolution: reduce the number of data points actually rendered to about this many, by the DECIMATION method.
+                            Default is two per pixel of IMG_WIDTH.  0 to plot every point.
         :return True/False;  Updates plotElements
         '''
         # initialize default plotElements [https://docs.python.org/3/reference/compound_stmts.html#index-30]:
@@ -63,10 +65,10 @@ class PlotTimeSeries():
         units = dataSources.get(DataSource.UNITS, None)
         defaultLegend = f"{dataKind.value} [{units}]" if units else None
         legends = [dataSources.get(DataSource.SUBSYSTEM, defaultLegend if defaultLegend else dataKind.value)]
-        if timeSeries.temperatures1:
+        if len(timeSeries.temperatures1):
             legend = plotElements.get(PlotEl.Y2_LEGEND1, 'Temperature sensor 1')
             legends.append(legend)
-        if timeSeries.temperatures2:
+        if len(timeSeries.temperatures2):
             legend = plotElements.get(PlotEl.Y2_LEGEND2, 'Temperature sensor 2')
             legends.append(legend)
                     
@@ -91,28 +93,24 @@ class PlotTimeSeries():
         
         # get timestamps and data, possibly with unit conversions:        
         timeStamps = timeSeries.getTimeStamps(requiredUnits = xUnits)
-        if not timeStamps:
+        if not len(timeStamps):
             return False
         dataSeries = timeSeries.getDataSeries(yUnits)
-        if not dataSeries:
+        if not len(dataSeries):
             return False
         
+        # temperatures to plot with the data.  Decimation makes new arrays so the timeSeries is not changed:
+        temperatures = [t for t in (timeSeries.temperatures1, timeSeries.temperatures2) if len(t)]
+
         # reduce to approximately xResolution, to save plotting time:
-        if xResolution:
-            # get the number of groups to combine:
-            K = len(dataSeries) // xResolution
-            minArray, maxArray = getMinMaxArray(dataSeries, K)
-            # interleave minArray, maxArray:
-            dataSeries = [None]*(len(minArray)+len(maxArray))
-            dataSeries[::2] = minArray
-            dataSeries[1::2] = maxArray
-            # reduce timestamps and temperatures by the same group size K.
-            # because len(dataSeries) is now about 2 * xResoltion, repeat each element twice in the arrays: 
-            timeStamps = np.repeat(getFirstItemArray(timeStamps, K), 2).tolist()
-            if timeSeries.temperatures1:
-                timeSeries.temperatures1 = np.repeat(getFirstItemArray(timeSeries.temperatures1, K), 2).tolist()
-            if timeSeries.temperatures2:
-                timeSeries.temperatures2 = np.repeat(getFirstItemArray(timeSeries.temperatures2, K), 2).tolist()
+        method = plotElements.get(PlotEl.DECIMATION, Decimate.DEFAULT_METHOD)
+        plotElements[PlotEl.DECIMATION] = method
+        if xResolution is None:
+            xResolution = 2 * int(plotElements.get(PlotEl.IMG_WIDTH, "800"))
+        if not xResolution or isHtmlOutput(outputName):
+            # for .html output, makePlotOutput() makes the overview and keeps the full resolution data:
+            method = Decimate.NONE
+        timeStamps, dataSeries, temperatureTraces = decimateTraces(method, timeStamps, dataSeries, temperatures, xResolution)
 
         # add the trace(s), compute temperature trace spans:
         y2min = None
@@ -120,15 +118,10 @@ class PlotTimeSeries():
         fig = make_subplots(specs=[[{"secondary_y": True}]])
         fig.add_trace(go.Scatter(x = timeStamps, y = dataSeries, mode = 'lines', name = legends[0]), secondary_y=False)
         
-        if timeSeries.temperatures1:
-            fig.add_trace(go.Scatter(x = timeStamps, y = timeSeries.temperatures1, mode = 'lines', name = legends[1]), secondary_y=True)
-            y2min = min(timeSeries.temperatures1)
-            y2max = max(timeSeries.temperatures1)
-        if timeSeries.temperatures2:
-            fig.add_trace(go.Scatter(x = timeStamps, y = timeSeries.temperatures2, mode = 'lines', name = legends[2]), secondary_y=True)
-            if y2min:
-                y2min = min(y2min, min(timeSeries.temperatures2))
-                y2max = max(y2max, max(timeSeries.temperatures2))
+        for (x, temperature), legend in zip(temperatureTraces, legends[1:]):
+            fig.add_trace(go.Scatter(x = x, y = temperature, mode = 'lines', name = legend), secondary_y=True)
+            y2min = min(y2min, np.nanmin(temperature)) if y2min is not None else np.nanmin(temperature)
+            y2max = max(y2max, np.nanmax(temperature)) if y2max is not None else np.nanmax(temperature)
         
         # force show legend even if only one trace:
         fig.update_layout(showlegend = True)
@@ -160,7 +153,7 @@ class PlotTimeSeries():
 
         # Y2 axis label:
         y2AxisLabel = plotElements.get(PlotEl.Y2_AXIS_LABEL, None)
-        if not y2AxisLabel and timeSeries.temperatures1:
+        if not y2AxisLabel and len(timeSeries.temperatures1):
             y2AxisLabel = "temperature [" + y2Units + "]"
         if y2AxisLabel:
             fig.update_yaxes(title_text = y2AxisLabel, showgrid=False, ticks="outside", secondary_y=True)
@@ -196,3 +189,29 @@ class PlotTimeSeries():
         # make and show plot:
         self.imageData = makePlotOutput(fig, plotElements, outputName, show)
         return True
+
+def decimateTraces(method: str, timeStamps, dataSeries, temperatures: List, xResolution: int) -> Tuple[np.ndarray, np.ndarray, List[Tuple[np.ndarray, np.ndarray]]]:
+    '''
+    Reduce the time series and its temperatures to plot.  Every data sample is covered.
+    Temperatures the same length as the data are reduced with the same samples or groups.
+    Any of another length are reduced on their own, against the timestamps of the samples they have.
+    :param method: Decimate method
+    :param timeStamps: list or numpy array of x values
+    :param dataSeries: list or numpy array of float corresponding to timeStamps
+    :param temperatures: list of lists or numpy arrays of float, each from the start of the time series
+    :param xResolution: about how many points to plot
+    :return (timeStamps, dataSeries, [(x, temperature)...]) as new numpy arrays
+    '''
+    N = min(len(timeStamps), len(dataSeries))
+    together = [t for t in temperatures if len(t) == N]
+    x, columns = Decimate.decimate(method, timeStamps[:N], [dataSeries[:N]] + together, xResolution)
+    together = iter(columns[1:])
+    temperatureTraces = []
+    for temperature in temperatures:
+        if len(temperature) == N:
+            temperatureTraces.append((x, next(together)))
+        else:
+            M = min(len(temperature), N)
+            tx, (ty, ) = Decimate.decimate(method, timeStamps[:M], [temperature[:M]], xResolution)
+            temperatureTraces.append((tx, ty))
+    return x, columns[0], temperatureTraces
@@ -0,0 +1,236 @@
+'''
+Plot.Plotly.Renderer:  static image export for Plotly figures through a pool of warm Kaleido renderers.
+Each worker thread has its own Kaleido scope, which keeps its Chromium process running between figures,
+so only the first figure per worker pays the startup cost.
+Used by makePlotOutput(); applications can also render a batch of figures concurrently.
+'''
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+from contextlib import contextmanager
+from typing import List, Optional
+import plotly.graph_objects as go
+import plotly.io as pio
+import configparser
+import queue
+import time
+
+try:
+    from kaleido.scopes.plotly import PlotlyScope
+except ImportError:
+    PlotlyScope = None
+
+class RenderJob(object):
+    '''
+    One figure to render and, once done, its image and timing.
+    seconds is the time taken by the renderer; queuedSeconds is the time waiting for a free worker.
+    '''
+    __slots__ = ('figure', 'format', 'width', 'height', 'outputName', 'imageData', 'seconds', 'queuedSeconds', 'error', 'future', 'submitted')
+
+    def __init__(self, figure, format = "png", width = None, height = None, outputName = None):
+        '''
+        Constructor
+        :param figure: dict from plotly.graph_objects.Figure.to_dict()
+        :param format: 'png', 'jpeg', 'webp', 'svg' or 'pdf'
+        :param width: in pixels or None for the renderer default
+        :param height: in pixels or None for the renderer default
+        :param outputName: optional filename where to write the image
+        '''
+        self.figure = figure
+        self.format = format
+        self.width = width
+        self.height = height
+        self.outputName = outputName
+        self.imageData = None
+        self.seconds = None
+        self.queuedSeconds = None
+        self.error = None
+        self.future = None
+        self.submitted = time.perf_counter()
+
+    def result(self):
+        '''
+        Wait for the job to finish
+        :return binary imageData
+        :raise the exception from rendering, if it failed
+        '''
+        if self.future is not None:
+            self.future.result()
+        if self.error is not None:
+            raise self.error
+        return self.imageData
+
+class Renderer(object):
+    '''
+    Renders figures on a small pool of worker threads, each with its own warm Kaleido scope.
+    If Kaleido is not installed, figures are rendered by plotly.io.to_image() on a single worker.
+    '''
+    DEFAULT_NUM_WORKERS = 2
+    HISTORY_SIZE = 1000
+
+    def __init__(self, numWorkers: Optional[int] = None, warmUp: Optional[bool] = None):
+        '''
+        Constructor
+        :param numWorkers: number of figures to render at once.  Default from the [Renderer] section of AmpPhaseDataLib.ini, else 2.
+        :param warmUp: if True, start all of the renderers now rather than when first needed.  Default from AmpPhaseDataLib.ini, else False.
+        '''
+        config = configparser.ConfigParser()
+        config.read("AmpPhaseDataLib.ini")
+        if numWorkers is None:
+            numWorkers = config.getint('Renderer', 'numWorkers', fallback = self.DEFAULT_NUM_WORKERS)
+        if warmUp is None:
+            warmUp = config.getboolean('Renderer', 'warmUp', fallback = False)
+        self.numWorkers = max(int(numWorkers), 1) if PlotlyScope is not None else 1
+        # render times in seconds of the most recent figures, oldest first:
+        self.latencies = deque(maxlen = self.HISTORY_SIZE)
+        self.pool = None
+        self.scopes = None
+        self.batchJobs = None
+        if warmUp:
+            self.warmUp()
+
+    def close(self):
+        '''
+        Stop the worker threads and their renderers, if started.
+        '''
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+        self.scopes = None
+
+    def warmUp(self):
+        '''
+        Start every worker's renderer by rendering a trivial figure on each of them at once
+        '''
+        fig = go.Figure(go.Scatter(x = [0, 1], y = [0, 1]))
+        for job in self.renderMany([fig] * self.numWorkers, width = 10, height = 10):
+            job.result()
+
+    def submit(self, fig, format = "png", width = None, height = None, outputName = None) -> RenderJob:
+        '''
+        Start rendering a figure on the next free worker.
+        The figure is copied first, so the caller may go on to change it.
+        :param fig: plotly.graph_objects.Figure
+        :param format: 'png', 'jpeg', 'webp', 'svg' or 'pdf'
+        :param width: in pixels
+        :param height: in pixels
+        :param outputName: optional filename where the worker writes the image
+        :return RenderJob: call its result() to wait for the imageData
+        '''
+        job = RenderJob(fig.to_dict(), format, width, height, outputName)
+        job.future = self.__getPool().submit(self.__render, job)
+        if self.batchJobs is not None:
+            self.batchJobs.append(job)
+        return job
+
+    def render(self, fig, format = "png", width = None, height = None, outputName = None) -> bytes:
+        '''
+        Render a single figure and wait for it
+        Parameters as for submit()
+        :return binary imageData
+        '''
+        return self.submit(fig, format, width, height, outputName).result()
+
+    def renderMany(self, figs: List[go.Figure], format = "png", width = None, height = None, outputNames = None) -> List[RenderJob]:
+        '''
+        Render a batch of figures concurrently and wait for all of them
+        :param figs: list of plotly.graph_objects.Figure
+        :param format: as for submit(), applied to all
+        :param width: as for submit(), applied to all
+        :param height: as for submit(), applied to all
+        :param outputNames: optional list of filenames corresponding to figs
+        :return list of RenderJob in the order of figs, with imageData, seconds, and error set
+        '''
+        if outputNames is None:
+            outputNames = [None] * len(figs)
+        jobs = [self.submit(fig, format, width, height, outputName) for fig, outputName in zip(figs, outputNames)]
+        for job in jobs:
+            job.future.result()
+        return jobs
+
+    @contextmanager
+    def batch(self):
+        '''
+        Collect the figures submitted in a with block, such as by makePlotOutput(), and wait for them all at the end:
+
+            with renderer.batch() as jobs:
+                plotAPI.plotAmplitudeStability(..., outputName = "a.png")
+                plotAPI.plotAmplitudeStability(..., outputName = "b.png")
+
+        Inside the block makePlotOutput() does not wait, so the figures render while the next ones are calculated.
+        :return list of RenderJob, complete after the block
+        :raise the first rendering error after all jobs have finished
+        '''
+        if self.batchJobs is not None:
+            # nested: the outer batch waits for everything
+            yield self.batchJobs
+            return
+        self.batchJobs = jobs = []
+        try:
+            yield jobs
+        finally:
+            self.batchJobs = None
+            for job in jobs:
+                job.future.result()
+        for job in jobs:
+            if job.error is not None:
+                raise job.error
+
+    def isBatching(self) -> bool:
+        '''
+        :return True inside a batch() block
+        '''
+        return self.batchJobs is not None
+
+    def __render(self, job: RenderJob):
+        '''
+        Private worker implementation: render the job with a scope checked out from the pool, then write the output file.
+        Exceptions are kept in job.error.
+        '''
+        start = time.perf_counter()
+        job.queuedSeconds = start - job.submitted
+        try:
+            if PlotlyScope is None:
+                job.imageData = pio.to_image(job.figure, format = job.format, width = job.width, height = job.height, validate = False)
+            else:
+                scope = self.scopes.get()
+                try:
+                    job.imageData = scope.transform(job.figure, format = job.format, width = job.width, height = job.height)
+                finally:
+                    self.scopes.put(scope)
+            job.seconds = time.perf_counter() - start
+            self.latencies.append(job.seconds)
+            if job.outputName:
+                with open(job.outputName, 'wb') as file:
+                    file.write(job.imageData)
+        except Exception as e:
+            job.error = e
+        finally:
+            # the figure dict can be large and is no longer needed:
+            job.figure = None
+
+    def __getPool(self):
+        '''
+        Private helper to start the workers and create their scopes when first needed.
+        The first worker shares the scope configured by plotly.io, the others are configured the same way.
+        '''
+        if self.pool is None:
+            self.scopes = queue.Queue()
+            if PlotlyScope is not None:
+                shared = pio.kaleido.scope
+                self.scopes.put(shared)
+                for _ in range(self.numWorkers - 1):
+                    self.scopes.put(PlotlyScope(plotlyjs = shared.plotlyjs, mathjax = shared.mathjax))
+            self.pool = ThreadPoolExecutor(max_workers = self.numWorkers, thread_name_prefix = "Renderer")
+        return self.pool
+
+# Renderer shared by makePlotOutput():
+sharedRenderer = None
+
+def getRenderer() -> Renderer:
+    '''
+    :return the shared Renderer, created when first needed
+    '''
+    global sharedRenderer
+    if sharedRenderer is None:
+        sharedRenderer = Renderer()
+    return sharedRenderer
@@ -1,7 +1,12 @@
 from datetime import datetime
 import dateutil.parser
+import numpy as np
 import copy
 import sys
+import re
+
+# a trailing UTC offset such as 'Z', '+02:00', or '-0500', which numpy would convert to UTC:
+ZONE_SUFFIX = re.compile(r'(Z|[+-]\d\d:?\d\d)\s*$')
 
 class ParseTimeStamp(object):
     '''
@@ -78,6 +83,42 @@ class ParseTimeStamp(object):
             self.lastTimeStampFormat = timeStampFormat
             return timeStamp
 
+    def parseTimeStampColumn(self, timeStampStrings):
+        '''
+        Parse a whole column of timestamp strings at once, such as read from the database.
+        ISO-like strings "YYYY-MM-DD HH:MM:SS[.ffffff]" are decoded in bulk by numpy.
+        If any string does not match, is empty, or has a UTC offset suffix, 
+          falls back to parsing each row as parseTimeStamp() does.
+        Offsets are dropped, keeping the local time as written, as when timestamps are stored in the database.
+        :param timeStampStrings: list or array of str
+        :return numpy array of datetime64[us], NaT where a string can't be parsed
+        '''
+        if not any(map(ZONE_SUFFIX.search, map(str, timeStampStrings))):
+            try:
+                timeStamps = np.array(timeStampStrings, dtype = 'datetime64[us]')
+                if not np.isnat(timeStamps).any():
+                    return timeStamps
+            except ValueError:
+                pass
+        
+        # per-row path: parse the first string and cache the format for the rest:
+        timeStamps = []
+        timeStampFormat = None
+        for timeStampString in timeStampStrings:
+            if not timeStampString:
+                timeStamps.append(None)
+                continue
+            timeStamp = False
+            if timeStampFormat:
+                timeStamp = self.parseTimeStampWithFormatString(timeStampString, timeStampFormat)
+            if not timeStamp:
+                timeStamp = self.parseTimeStamp(timeStampString)
+                timeStampFormat = self.lastTimeStampFormat
+            if timeStamp and timeStamp.tzinfo:
+                timeStamp = timeStamp.replace(tzinfo = None)
+            timeStamps.append(timeStamp if timeStamp else None)
+        return np.array(timeStamps, dtype = 'datetime64[us]')
+
 def makeTimeStamp(timeStamp = None):
     '''
     initialized a timestamp from provided, or now() if nont provided